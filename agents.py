@@ -0,0 +1,124 @@
+import spatial
+
+import math
+import numpy as np
+import pygame
+
+
+#things other than the school that boids react to
+PREDATOR = "predator"
+ATTRACTOR = "attractor"
+OBSTACLE = "obstacle"
+AGENT_TYPES = [PREDATOR, ATTRACTOR, OBSTACLE]
+
+#boids within an agent's radius are pushed away from it (negative force) or pulled towards it (positive force) with this magnitude
+INFLUENCE_RADII = {PREDATOR: 80, ATTRACTOR: 150, OBSTACLE: 40}
+FORCE_CONSTS = {PREDATOR: -0.1, ATTRACTOR: 0.02, OBSTACLE: -0.3}
+
+COLOURS = {PREDATOR: (230, 59, 46), ATTRACTOR: (80, 200, 80), OBSTACLE: (120, 120, 120)}
+DRAW_RADIUS = 5
+
+
+class AgentField:
+    #every agent is kept in its own spatial hash, so each boid only looks at the agents near it
+
+    def __init__(self, world_width, world_height, bounds_policy=None):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.bounds_policy = bounds_policy
+
+        self.max_radius = max(INFLUENCE_RADII.values())
+        self.grid = spatial.SpatialHash(world_width, world_height, self.max_radius, bounds_policy)
+
+        self.type_inxs = {agent_type: i for i, agent_type in enumerate(AGENT_TYPES)}
+        self.radii_sq = np.array([INFLUENCE_RADII[i] ** 2 for i in AGENT_TYPES], dtype=float)
+        self.forces = np.array([FORCE_CONSTS[i] for i in AGENT_TYPES], dtype=float)
+
+        self.pos = np.zeros((0, 2))
+        self.types = np.zeros(0, dtype=np.int64)  #index into AGENT_TYPES
+        self.visible = np.zeros(0, dtype=bool)  #agents that are drawn by something else (e.g. the player fish) are not drawn here
+
+        #plain list copies for per boid queries from python code
+        self.nearby_items = []
+        self.pos_list = []
+        self.radii_sq_list = []
+        self.forces_list = []
+
+    def add_agent(self, x, y, agent_type, visible=True):
+        self.pos = np.append(self.pos, [[x, y]], axis=0)
+        self.types = np.append(self.types, self.type_inxs[agent_type])
+        self.visible = np.append(self.visible, visible)
+
+        self.rebuild()
+
+        return len(self.pos) - 1
+
+    def remove_agent(self, inx):
+        #NOTE: this moves every later agent down one index
+        self.pos = np.delete(self.pos, inx, axis=0)
+        self.types = np.delete(self.types, inx)
+        self.visible = np.delete(self.visible, inx)
+
+        self.rebuild()
+
+    def set_pos(self, inx, x, y):
+        #call rebuild once every agent has moved
+        self.pos[inx] = (x, y)
+
+    def set_agents(self, pos, types):
+        self.pos = pos
+        self.types = types
+        self.visible = np.ones(len(pos), dtype=bool)
+
+        self.rebuild()
+
+    def rebuild(self):
+        self.grid.rebuild(self.pos)
+
+        self.pos_list = self.pos.tolist()
+        self.radii_sq_list = self.radii_sq[self.types].tolist()
+        self.forces_list = self.forces[self.types].tolist()
+
+    def get_acc(self, x, y, acc):
+        #total push from the agents on a boid at (x, y), written into the vector acc
+        acc.set(0, 0)
+
+        for i in self.grid.get_nearby_items(x, y, self.nearby_items):
+            agent_x, agent_y = self.pos_list[i]
+            dx, dy = self.grid.wrap_offset(agent_x - x, agent_y - y)
+
+            dist_sq = dx * dx + dy * dy
+            if 0 < dist_sq < self.radii_sq_list[i]:
+                mult = self.forces_list[i] / math.sqrt(dist_sq)
+                acc.x += dx * mult
+                acc.y += dy * mult
+
+        return acc
+
+    def get_accs(self, positions):
+        #array version of get_acc, for an (n, 2) array of boid positions
+        acc = np.zeros_like(positions)
+        if len(self.pos) == 0:
+            return acc
+
+        for i, j in self.grid.iter_pairs(positions, self.max_radius**2):
+            offsets = self.grid.wrap_offsets(self.pos[j] - positions[i])
+            dist_sq = np.einsum("ij,ij->i", offsets, offsets)
+
+            near = (dist_sq > 0) & (dist_sq < self.radii_sq[self.types[j]])
+            i = i[near]
+            j = j[near]
+
+            push = offsets[near] * (self.forces[self.types[j]] / np.sqrt(dist_sq[near]))[:, None]
+            for k in range(2):
+                acc[:, k] += np.bincount(i, push[:, k], len(positions))
+
+        return acc
+
+    def draw(self, window, origin=(0, 0)):
+        #origin is the world position drawn at the top left of the window
+        origin_x, origin_y = origin
+
+        for (x, y), agent_type, visible in zip(self.pos_list, self.types.tolist(), self.visible.tolist()):
+            if visible:
+                pygame.draw.circle(window, COLOURS[AGENT_TYPES[agent_type]], (int(x - origin_x), int(y - origin_y)), DRAW_RADIUS)
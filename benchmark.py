@@ -0,0 +1,242 @@
+import simulation
+import snapshot
+import recording
+import profiling
+import pipeline
+
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import pygame
+
+
+DEFAULT_COUNTS = [80, 500, 2000, 10000, 50000]
+
+WORLD_WIDTH = 1000
+WORLD_HEIGHT = 800
+BASE_NUM_FISH = 80  #fish count the default world size was designed for
+
+PHASES = ["player", "boid_vel", "grid", "chains", "record", "draw", "wait"]
+
+
+def get_world_size(num_fish, constant_density):
+    if not constant_density:
+        return WORLD_WIDTH, WORLD_HEIGHT
+
+    #scale both sides so the number of fish per pixel matches the default game
+    scale = math.sqrt(max(num_fish, BASE_NUM_FISH) / BASE_NUM_FISH)
+
+    return int(WORLD_WIDTH * scale), int(WORLD_HEIGHT * scale)
+
+
+def time_phase(phase_times, name, func):
+    start = time.perf_counter()
+    func()
+    phase_times[name] += time.perf_counter() - start
+
+
+def run_tick(sim, phase_times, draw, recorder):
+    time_phase(phase_times, "player", sim.update_player)
+    time_phase(phase_times, "boid_vel", sim.update_boid_vels)
+    time_phase(phase_times, "grid", sim.update_grid)
+    time_phase(phase_times, "chains", sim.update_chains)
+
+    if draw:
+        sim.window.fill((0, 0, 0))
+        time_phase(phase_times, "draw", sim.draw)
+
+    sim.tick += 1
+
+    #recorded after the tick, the same as main.update
+    if recorder is not None:
+        time_phase(phase_times, "record", lambda: recorder.record(sim))
+
+
+def run_pipelined_tick(sim, sim_pipeline, phase_times, recorder):
+    #the same order as main.run_pipelined_frame, with the school's phases run on the pipeline's thread while drawing
+    #wait is how long the school held up the next tick
+    start = time.perf_counter()
+    num_ticks = sim_pipeline.wait()
+    phase_times["wait"] += time.perf_counter() - start
+
+    if num_ticks > 0 and recorder is not None:
+        time_phase(phase_times, "record", lambda: recorder.record(sim))
+
+    time_phase(phase_times, "player", lambda: sim_pipeline.update_player(1))
+
+    frame = sim_pipeline.get_frame()
+    sim_pipeline.start(1)
+
+    sim.window.fill((0, 0, 0))
+    time_phase(phase_times, "draw", lambda: sim.draw_frame(frame))
+
+
+def run_benchmark(num_fish, args):
+    width, height = get_world_size(num_fish, args.constant_density)
+
+    #drawing goes to an offscreen surface, so no display is needed
+    #with a camera it is the default world size, and shows the middle of a bigger world
+    window_size = (WORLD_WIDTH, WORLD_HEIGHT) if args.camera else (width, height)
+    window = pygame.Surface(window_size) if args.draw else None
+
+    setup_start = time.perf_counter()
+    sim = simulation.Simulation(
+        width,
+        height,
+        num_fish,
+        window,
+        use_flock_engine=args.flock_engine,
+        use_chain_solver=args.chain_solver,
+        follow_mouse=False,
+        bounds_policy=args.bounds_policy,
+        num_workers=args.workers,
+        use_batch_render=args.batch_render or args.pipeline,
+        use_lod=args.lod,
+        seed=args.seed,
+        obstacles_filename=args.obstacles,
+        verlet_skin=args.verlet_skin,
+        use_camera=args.camera,
+        lazy_chains=args.lazy_chains,
+        sprite_angle_steps=args.sprite_angle_steps,
+    )
+    setup_time = time.perf_counter() - setup_start
+
+    if args.load_snapshot is not None:
+        snapshot.load_snapshot(sim, args.load_snapshot.format(num_fish=num_fish))
+
+    for _ in range(args.warmup):
+        sim.update()
+
+    if args.save_snapshot is not None:
+        snapshot.save_snapshot(sim, args.save_snapshot.format(num_fish=num_fish))
+
+    recorder = None
+    if args.record is not None:
+        recorder = recording.Recorder(args.record.format(num_fish=num_fish), sim)
+
+    profiler = profiling.Profiler()
+    if args.spans:
+        profiler.enable()
+
+    sim_pipeline = None
+    if args.pipeline:
+        sim_pipeline = pipeline.Pipeline(sim)
+
+    phase_times = {i: 0 for i in PHASES}
+
+    num_ticks = 0
+    start = time.perf_counter()
+    while num_ticks < args.ticks:
+        if sim_pipeline is not None:
+            run_pipelined_tick(sim, sim_pipeline, phase_times, recorder)
+        else:
+            run_tick(sim, phase_times, args.draw, recorder)
+        num_ticks += 1
+
+        profiler.end_frame()
+
+        if time.perf_counter() - start > args.max_seconds:
+            break
+
+    if sim_pipeline is not None:
+        #the last tick is still running
+        if sim_pipeline.wait() > 0 and recorder is not None:
+            recorder.record(sim)
+
+        sim_pipeline.close()
+
+    total_time = time.perf_counter() - start
+
+    span_stats = profiler.get_stats() if args.spans else None
+    profiler.disable()
+
+    sim.close()
+
+    if recorder is not None:
+        recorder.close()
+
+    #tier counters from the last frame drawn
+    lod_counts = None
+    if sim.lod_selector is not None:
+        lod_counts = {"tier_counts": sim.lod_selector.tier_counts, "vertices": sim.lod_selector.num_vertices}
+
+    num_visible = None
+    if sim.camera is not None:
+        num_visible = len(sim.get_visible_fish())
+
+    return {
+        "num_fish": num_fish,
+        "world_size": [width, height],
+        "ticks": num_ticks,
+        "setup_seconds": setup_time,
+        "total_seconds": total_time,
+        "ticks_per_second": num_ticks / total_time,
+        "phase_seconds_per_tick": {i: phase_times[i] / num_ticks for i in PHASES},
+        "lod": lod_counts,
+        "visible_fish": num_visible,
+        "verlet": sim.get_verlet_stats(),
+        "lazy_chains": None if sim.lazy_chains is None else sim.lazy_chains.get_stats(),
+        "sprites": None if sim.sprite_cache is None else sim.sprite_cache.get_stats(),
+        "pipeline": None if sim_pipeline is None else sim_pipeline.get_stats(),
+        "span_percentiles_ms": span_stats,
+    }
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Time the fish simulation without a display")
+
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS, help="numbers of non player fish to time")
+    parser.add_argument("--ticks", type=int, default=200, help="ticks to time for each fish count")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed ticks before timing starts")
+    parser.add_argument("--max-seconds", type=float, default=30, help="stop timing a fish count after this long")
+    parser.add_argument("--flock-engine", action="store_true", help="use the numpy flock engine")
+    parser.add_argument("--chain-solver", action="store_true", help="use the batched chain solver")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes for the school (implies both batched engines)")
+    parser.add_argument("--bounds-policy", choices=["clamp", "wrap", "reflect"], help="keep fish inside the world")
+    parser.add_argument("--draw", action="store_true", help="also time drawing onto an offscreen surface")
+    parser.add_argument("--batch-render", action="store_true", help="draw the school with the batch renderer")
+    parser.add_argument("--lod", action="store_true", help="draw small or crowded fish with less detail")
+    parser.add_argument("--camera", action="store_true", help="draw only what a default sized window in the middle of the world can see")
+    parser.add_argument("--lazy-chains", action="store_true", help="with --draw and --camera, only solve the chains of fish near the view")
+    parser.add_argument("--sprite-angle-steps", type=int, help="blit fins, heads and eyes from sprites drawn at this many angles")
+    parser.add_argument("--pipeline", action="store_true", help="with --draw, tick the school on its own thread while the last tick is drawn (implies --batch-render)")
+    parser.add_argument("--seed", type=int, help="seed for the initial school, for reproducible runs")
+    parser.add_argument("--verlet-skin", type=float, help="keep neighbour candidates within the view radius plus this skin between ticks")
+    parser.add_argument("--obstacles", help="json file of static obstacles, like reef.json")
+    parser.add_argument("--save-snapshot", help="save the state after warmup to this file ({num_fish} is replaced by the fish count)")
+    parser.add_argument("--load-snapshot", help="start from a snapshot saved with --save-snapshot")
+    parser.add_argument("--record", help="record the timed ticks to this file ({num_fish} is replaced by the fish count), needs --flock-engine and --chain-solver")
+    parser.add_argument("--spans", action="store_true", help="also record percentiles of the time in each profiling span")
+    parser.add_argument("--constant-density", action="store_true", help="grow the world with the fish count")
+    parser.add_argument("--output", default="bench_output.json", help="file to write the json results to")
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    results = []
+    for num_fish in args.counts:
+        result = run_benchmark(num_fish, args)
+        results.append(result)
+
+        phases = ", ".join(f"{i} {result['phase_seconds_per_tick'][i] * 1000:.2f}ms" for i in PHASES)
+        print(f"{num_fish} fish: {result['ticks_per_second']:.1f} ticks/s ({phases})")
+
+    output = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "options": vars(args),
+        "results": results,
+    }
+
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,9 +1,10 @@
 import vector
-from math import pi
+import spatial
+import obstacles
+import numpy as np
+from math import pi, cos
 
 
-EPSILON = 0.001
-
 
 class Boid:
     ALIGN_MAG = 0.1
@@ -13,191 +14,278 @@ class Boid:
     VIEW_RADIUS = 80
     VIEW_RADIUS_SQ = VIEW_RADIUS**2
     FOV = 2 * pi / 3  #half of the range of view
-
-    WALL_DIST_RATIO = 0.1
-
-    WALL_AVOID_CONST = 1
-    PLAYER_AVOID_CONST = 0.1
+    COS_FOV = cos(FOV)
+    COS_FOV_SQ = COS_FOV**2
 
     MAX_ACC = 0.01
     SPEED = 0.8
 
-    def __init__(self, pos, screen_width, screen_height, player_boid, initial_vel):
-        self.pos = pos
-        self.screen_width = screen_width
-        self.screen_height = screen_height
-        self.player_boid = player_boid
-
-        self.vel = initial_vel
-        self.new_vel = initial_vel
-
-        self.width_threshold = screen_width * Boid.WALL_DIST_RATIO
-        self.height_threshold = screen_height * Boid.WALL_DIST_RATIO
-
-        self.num_grid_x = screen_width // Boid.VIEW_RADIUS + 1
-        self.num_grid_y = screen_height // Boid.VIEW_RADIUS + 1
+    FUSED_STEERING = True  #gather all three flocking rules during the neighbour scan instead of one pass per rule
+
+    def __init__(self, pos, world_width, world_height, agent_field, initial_vel):
+        self.pos = pos.copy()
+        self.world_width = world_width
+        self.world_height = world_height
+        self.agent_field = agent_field  #agents.AgentField of predators, attractors and obstacles, or None
+
+        self.vel = initial_vel.copy()
+        self.new_vel = initial_vel.copy()
+
+        #set after all boids initialised
+        self.grid = None
+        self.grid_boids = []
+        self.grid_inx = None  #index of this boid in grid_boids
+        self.verlet = None  #spatial.VerletList of grid_boids, or None to search the grid every tick
+        self.obstacle_field = None
+
+        #reused every tick so steady state updates do not allocate
+        self.neighbours = []
+        self.neighbour_offsets = []  #vector to each neighbour, grown as needed and reused
+        self.nearby_items = []
+        self.vec_to_boid = vector.Vec2(0, 0)
+        self.align_step = vector.Vec2(0, 0)
+        self.cohesion_step = vector.Vec2(0, 0)
+        self.seperation_step = vector.Vec2(0, 0)
+        self.obstacle_acc = vector.Vec2(0, 0)
+        self.agent_acc = vector.Vec2(0, 0)
+        self.acc = vector.Vec2(0, 0)
+
+    def init_grid(self, grid, grid_boids):
+        #to be called once all boids initialised
+        self.grid = grid
+        self.grid_boids = grid_boids  #item i of the grid is grid_boids[i]
 
-        self.grid = []  #set after all boids initialised
+    def get_vec_to(self, other_boid, vec_to_boid=None):
+        #NOTE: without a vector to write to, the returned vector is reused and only valid until the next call
+        if vec_to_boid is None:
+            vec_to_boid = self.vec_to_boid
 
-        self.grid_pos = self.get_grid_pos()
+        vec_to_boid.set_vec(other_boid.pos).isub(self.pos)
 
-    def get_grid_pos(self):
-        grid_x = int(self.pos.x / Boid.VIEW_RADIUS)
-        grid_y = int(self.pos.y / Boid.VIEW_RADIUS)
+        if self.grid.wrap:
+            vec_to_boid.set(*self.grid.wrap_offset(vec_to_boid.x, vec_to_boid.y))
 
-        return vector.Vec2(grid_x, grid_y)
-    
-    def add_to_grid_cell(self, new_grid_pos):
-        new_cell = self.grid[new_grid_pos.x][new_grid_pos.y]
-        new_cell.append(self)  #add to new cell
+        return vec_to_boid
 
-        self.grid_pos = new_grid_pos
+    def is_in_view(self, vec_to_boid, vel_mag_sq):
+        dist_sq = vec_to_boid.mag_sq()
+        if dist_sq >= Boid.VIEW_RADIUS_SQ or dist_sq == 0:
+            return False  #boids on top of each other (e.g. clamped into a corner) have no direction between them
 
-    def init_grid(self, grid):
-        #to be called once all boids initialised
-        self.grid = grid
-        grid_pos = self.get_grid_pos()
+        #the angle is less than FOV when dot / (|vel| * |vec|) > cos(FOV), compared squared to avoid the sqrt and acos
+        dot = self.vel.dot(vec_to_boid)
+        threshold_sq = Boid.COS_FOV_SQ * vel_mag_sq * dist_sq
 
-        self.add_to_grid_cell(grid_pos)
+        if Boid.COS_FOV < 0:
+            return dot >= 0 or dot * dot < threshold_sq
+        else:
+            return dot > 0 and dot * dot > threshold_sq
 
     def is_neighbour(self, other_boid):
-        if other_boid == self or other_boid == self.player_boid:
+        if other_boid == self:
             return False
 
-        vec_to_boid = (other_boid.pos - self.pos)
-        dist_sq = vec_to_boid.mag_sq()
-        angle_to_boid = self.vel.get_angle_to(vec_to_boid)
+        return self.is_in_view(self.get_vec_to(other_boid), self.vel.mag_sq())
+
+    def get_offset_slot(self, inx):
+        offsets = self.neighbour_offsets
+        if inx == len(offsets):
+            offsets.append(vector.Vec2(0, 0))
 
-        return dist_sq < Boid.VIEW_RADIUS_SQ and angle_to_boid < Boid.FOV
+        return offsets[inx]
     
+    def get_candidates(self):
+        #indices in grid_boids of every boid that could be a neighbour
+        if self.verlet is not None:
+            return self.verlet.get_candidates(self.grid_inx)
+
+        return self.grid.get_nearby_items(self.pos.x, self.pos.y, self.nearby_items)
+
     def get_neighbours(self):
-        neighbours = []
-        for i in range(-1, 2):
-            cell_x = self.grid_pos.x + i
-            if not 0 <= cell_x < self.num_grid_x:
+        #NOTE: neighbour_offsets[i] is the vector to neighbours[i]
+        neighbours = self.neighbours
+        neighbours.clear()
+
+        vel_mag_sq = self.vel.mag_sq()
+        for i in self.get_candidates():
+            boid = self.grid_boids[i]
+            if boid == self:
                 continue
 
-            for x in range(-1, 2):
-                cell_y = self.grid_pos.y + x
-                if not 0 <= cell_y < self.num_grid_y:
-                    continue
-
-                for boid in self.grid[cell_x][cell_y]:
-                    if self.is_neighbour(boid):
-                        neighbours.append(boid)
+            vec_to_boid = self.get_vec_to(boid, self.get_offset_slot(len(neighbours)))
+            if self.is_in_view(vec_to_boid, vel_mag_sq):
+                neighbours.append(boid)
 
         return neighbours
     
     def alignment(self, neighbours):
         #align velocity with average velocity of neighbours
-        total_vel = vector.Vec2(0, 0)
+        total_vel = self.align_step.set(0, 0)
         for i in neighbours:
-            total_vel = total_vel + i.vel
+            total_vel.iadd(i.vel)
 
-        desired_vel = total_vel / len(neighbours)
-        vel_step = desired_vel - self.vel
+        return self.finish_alignment(total_vel, len(neighbours))
 
-        return vel_step.limit_mag(Boid.ALIGN_MAG)
+    def finish_alignment(self, total_vel, num_neighbours):
+        desired_vel = total_vel.idiv(num_neighbours)
+        vel_step = desired_vel.isub(self.vel)
+
+        return vel_step.limit_mag_inplace(Boid.ALIGN_MAG)
     
-    def cohesion(self, neighbours):
+    def cohesion(self, neighbours, offsets):
         #steer to average position of neighbours
-        sum_pos = vector.Vec2(0, 0)
-        for i in neighbours:
-            sum_pos = sum_pos + i.pos
+        sum_offset = self.cohesion_step.set(0, 0)
+        for i in range(len(neighbours)):
+            sum_offset.iadd(offsets[i])
+
+        return self.finish_cohesion(sum_offset, len(neighbours))
 
-        desired_pos = sum_pos / len(neighbours)
-        desired_vel = desired_pos - self.pos
-        vel_step = desired_vel - self.vel
+    def finish_cohesion(self, sum_offset, num_neighbours):
+        desired_vel = sum_offset.idiv(num_neighbours)
+        vel_step = desired_vel.isub(self.vel)
 
-        return vel_step.limit_mag(Boid.COHESION_MAG)
+        return vel_step.limit_mag_inplace(Boid.COHESION_MAG)
+
+    def add_seperation(self, away_dir, vec_to_boid):
+        #NOTE: this rescales vec_to_boid
+        scaled_mag = 1 / vec_to_boid.mag()
+        away_dir.isub(vec_to_boid.set_mag_inplace(scaled_mag))
     
-    def seperation(self, neighbours):
+    def seperation(self, neighbours, offsets):
         #steer to avoid close neighbours
-        away_dir = vector.Vec2(0, 0)
-        for i in neighbours:
-            away_from_boid = self.pos - i.pos
-            scaled_mag = 1 / away_from_boid.mag()
-            away_dir = away_dir + away_from_boid.set_mag(scaled_mag)
+        #NOTE: this rescales the offsets, so it must be the last rule to use them
+        away_dir = self.seperation_step.set(0, 0)
+        for i in range(len(neighbours)):
+            self.add_seperation(away_dir, offsets[i])
 
-        return away_dir.limit_mag(Boid.SEPERATION_MAG)
-    
-    def get_avoid_vec(self, dist, direction):
-        mult = Boid.WALL_AVOID_CONST / dist
-        acc_vec = direction * mult
+        return away_dir.limit_mag_inplace(Boid.SEPERATION_MAG)
 
-        return acc_vec
+    def combine_steps(self, align_step, cohesion_step, seperation_step):
+        return self.acc.set(0, 0).iadd(align_step).iadd(cohesion_step).iadd(seperation_step).limit_mag_inplace(Boid.MAX_ACC)
 
-    def avoid_walls(self):
-        #steer away from the edge of the screen
-        dist_left = max(self.pos.x, EPSILON)
-        dist_right = max(self.screen_width - self.pos.x, EPSILON)
+    def get_flock_acc(self):
+        #one pass to find the neighbours, then one pass per rule
+        neighbours = self.get_neighbours()
+        if len(neighbours) == 0:
+            return self.acc.set(0, 0)
+
+        align_step = self.alignment(neighbours)
+        cohesion_step = self.cohesion(neighbours, self.neighbour_offsets)
+        seperation_step = self.seperation(neighbours, self.neighbour_offsets)
+
+        return self.combine_steps(align_step, cohesion_step, seperation_step)
+
+    def get_fused_flock_acc(self):
+        #same result as get_flock_acc, with every rule gathered during the neighbour scan
+        total_vel = self.align_step.set(0, 0)
+        sum_offset = self.cohesion_step.set(0, 0)
+        away_dir = self.seperation_step.set(0, 0)
+
+        num_neighbours = 0
+        vel_mag_sq = self.vel.mag_sq()
+        for i in self.get_candidates():
+            boid = self.grid_boids[i]
+            if boid == self:
+                continue
 
-        acc_x = vector.Vec2(0, 0)
-        if dist_left < self.width_threshold:
-            acc_x = self.get_avoid_vec(dist_left, vector.Vec2(1, 0))
-        elif dist_right < self.width_threshold:
-            acc_x = self.get_avoid_vec(dist_right, vector.Vec2(-1, 0))
+            vec_to_boid = self.get_vec_to(boid)
+            if self.is_in_view(vec_to_boid, vel_mag_sq):
+                num_neighbours += 1
+                total_vel.iadd(boid.vel)
+                sum_offset.iadd(vec_to_boid)
+                self.add_seperation(away_dir, vec_to_boid)
 
-        dist_up = max(self.pos.y, EPSILON)
-        dist_down = max(self.screen_height - self.pos.y, EPSILON)
+        if num_neighbours == 0:
+            return self.acc.set(0, 0)
 
-        acc_y = vector.Vec2(0, 0)
-        if dist_up < self.height_threshold:
-            acc_y = self.get_avoid_vec(dist_up, vector.Vec2(0, 1))
-        elif dist_down < self.height_threshold:
-            acc_y = self.get_avoid_vec(dist_down, vector.Vec2(0, -1))
+        align_step = self.finish_alignment(total_vel, num_neighbours)
+        cohesion_step = self.finish_cohesion(sum_offset, num_neighbours)
+        seperation_step = away_dir.limit_mag_inplace(Boid.SEPERATION_MAG)
 
-        return acc_x + acc_y
+        return self.combine_steps(align_step, cohesion_step, seperation_step)
     
-    def avoid_player(self):
-        vec_to_player = self.player_boid.pos - self.pos
-
-        avoid_vec = vector.Vec2(0, 0)
-        if vec_to_player.mag_sq() < Boid.VIEW_RADIUS_SQ:
-            mult = Boid.PLAYER_AVOID_CONST / vec_to_player.mag()
-            avoid_vec = vec_to_player * -mult
+    def avoid_obstacles(self):
+        #steer away from the walls and any other static obstacles
+        return self.obstacle_field.get_acc(self.pos.x, self.pos.y, self.obstacle_acc)
+    
+    def react_to_agents(self):
+        #steer away from predators and obstacles, and towards attractors
+        if self.agent_field is None:
+            return self.agent_acc.set(0, 0)
 
-        return avoid_vec
+        return self.agent_field.get_acc(self.pos.x, self.pos.y, self.agent_acc)
     
     def update_new_vel(self):
-        neighbours = self.get_neighbours()
+        if Boid.FUSED_STEERING:
+            acc = self.get_fused_flock_acc()
+        else:
+            acc = self.get_flock_acc()
 
-        acc = vector.Vec2(0, 0)
-        if len(neighbours) > 0:
-            align_step = self.alignment(neighbours)
-            cohesion_step = self.cohesion(neighbours)
-            seperation_step = self.seperation(neighbours)
+        acc.iadd(self.avoid_obstacles()).iadd(self.react_to_agents())
 
-            acc = (align_step + cohesion_step + seperation_step).limit_mag(Boid.MAX_ACC)
+        self.new_vel.set_vec(self.vel).iadd(acc).set_mag_inplace(Boid.SPEED)
 
-        acc = acc + self.avoid_walls() + self.avoid_player()
+    def update(self):
+        self.vel.set_vec(self.new_vel)
+        self.pos.iadd(self.vel)
 
-        self.new_vel = (self.vel + acc).set_mag(Boid.SPEED)
 
-    def update_grid_pos(self):
-        #check if this boid has moved to a new grid cell
-        new_grid_pos = self.get_grid_pos()
-        if new_grid_pos != self.grid_pos:
-            self.grid[self.grid_pos.x][self.grid_pos.y].remove(self)  #remove from old cell
-            self.add_to_grid_cell(new_grid_pos)
+def rebuild_grid(grid, grid_boids, verlet=None):
+    positions = np.array([(i.pos.x, i.pos.y) for i in grid_boids], dtype=float).reshape(-1, 2)
 
-    def update(self):
-        self.vel = self.new_vel
-        self.pos = self.pos + self.vel
+    velocities = None
+    if grid.bounds_policy == spatial.REFLECT:
+        velocities = np.array([(i.vel.x, i.vel.y) for i in grid_boids], dtype=float).reshape(-1, 2)
 
-        self.update_grid_pos()
+    moved = grid.enforce_bounds(positions, velocities)
+    for i in np.nonzero(moved)[0]:
+        grid_boids[i].pos.set(*positions[i].tolist())
 
+        if velocities is not None:
+            grid_boids[i].vel.set(*velocities[i].tolist())
 
-def set_all_boids(all_boids):
-    grid = [[[] for _ in range(all_boids[0].num_grid_y)] for _ in range(all_boids[0].num_grid_x)]
+    grid.rebuild(positions)
 
-    for i in all_boids:
-        i.init_grid(grid)
+    if verlet is not None:
+        verlet.update(positions)
 
 
-def update_all_boids(all_boids):
+def set_all_boids(all_boids, bounds_policy=None, obstacle_field=None, verlet_skin=None):
+    #with no obstacle field, the only obstacles are the walls
+    width = all_boids[0].world_width
+    height = all_boids[0].world_height
+
+    grid = spatial.SpatialHash(width, height, Boid.VIEW_RADIUS, bounds_policy)
+    if obstacle_field is None:
+        obstacle_field = obstacles.ObstacleField(width, height)
+
+    verlet = None
+    if verlet_skin is not None:
+        verlet = spatial.VerletList(width, height, Boid.VIEW_RADIUS, verlet_skin, bounds_policy)
+
+    for inx, i in enumerate(all_boids):
+        i.init_grid(grid, all_boids)
+        i.grid_inx = inx
+        i.verlet = verlet
+        i.obstacle_field = obstacle_field
+
+    rebuild_grid(grid, all_boids, verlet)
+
+
+def update_all_vels(all_boids):
     for i in all_boids:
         i.update_new_vel()
 
+
+def move_all_boids(all_boids):
     for i in all_boids:
-        i.update()
\ No newline at end of file
+        i.update()
+
+    #the whole grid is rebuilt rather than moving boids between cells one at a time
+    if len(all_boids) > 0:
+        rebuild_grid(all_boids[0].grid, all_boids[0].grid_boids, all_boids[0].verlet)
+
+
+def update_all_boids(all_boids):
+    update_all_vels(all_boids)
+    move_all_boids(all_boids)
\ No newline at end of file
@@ -0,0 +1,124 @@
+import fish
+
+import math
+import numpy as np
+import pygame
+
+
+MIN_ZOOM = 0.5  #the view surface is made big enough for this zoom, so it is never resized
+MAX_ZOOM = 4
+
+ZOOM_STEP = 1.25  #zoom multiplier for one mouse wheel click
+PAN_SPEED = 10  #screen pixels moved per frame by the pan keys
+FOLLOW_SMOOTHING = 0.1  #fraction of the way to its target the camera moves each frame when following
+
+#furthest any part of a fish reaches from its head: down the body and tail, then out past the widest point to the tip of a body fin
+CULL_RADIUS = fish.Fish.LENGTH * (1 + fish.TailFin.LENGTH_RATIO) + max(fish.Fish.SIZES) + fish.BodyFin.A
+
+
+class Camera:
+    #the part of the world shown in the window, given by the world position of its top left corner and a zoom
+    #everything is drawn unscaled onto a view surface (in world units relative to the corner), which is then scaled onto the window
+
+    def __init__(self, window, world_width, world_height, x=None, y=None, zoom=1):
+        #the view starts centred on the world unless x and y are given
+        self.window = window
+        self.world_width = world_width
+        self.world_height = world_height
+
+        self.zoom = zoom
+        self.x = (world_width - window.get_width() / zoom) / 2 if x is None else x
+        self.y = (world_height - window.get_height() / zoom) / 2 if y is None else y
+
+        max_width = math.ceil(window.get_width() / MIN_ZOOM)
+        max_height = math.ceil(window.get_height() / MIN_ZOOM)
+        self.view_surface = pygame.Surface((max_width, max_height))
+        self.cleared_zoom = zoom  #zoom when the view surface was last cleared
+
+        self.clamp()
+
+    def get_view_size(self):
+        #size of the visible part of the world, in world units
+        return self.window.get_width() / self.zoom, self.window.get_height() / self.zoom
+
+    def get_view_rect(self):
+        view_width, view_height = self.get_view_size()
+
+        return self.x, self.y, self.x + view_width, self.y + view_height
+
+    def clamp(self):
+        #keep the view inside the world, or centred on it when the world is smaller than the view
+        view_width, view_height = self.get_view_size()
+
+        if view_width >= self.world_width:
+            self.x = (self.world_width - view_width) / 2
+        else:
+            self.x = min(max(self.x, 0), self.world_width - view_width)
+
+        if view_height >= self.world_height:
+            self.y = (self.world_height - view_height) / 2
+        else:
+            self.y = min(max(self.y, 0), self.world_height - view_height)
+
+    def pan(self, dx, dy):
+        #dx and dy are in screen pixels
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self.clamp()
+
+    def zoom_at(self, mult, screen_x, screen_y):
+        #zooms by mult, keeping the world point under (screen_x, screen_y) where it is on the screen
+        world_x, world_y = self.screen_to_world(screen_x, screen_y)
+
+        self.zoom = min(max(self.zoom * mult, MIN_ZOOM), MAX_ZOOM)
+        self.x = world_x - screen_x / self.zoom
+        self.y = world_y - screen_y / self.zoom
+        self.clamp()
+
+    def follow(self, x, y, smoothing=FOLLOW_SMOOTHING):
+        #moves the centre of the view part of the way towards the world point (x, y)
+        view_width, view_height = self.get_view_size()
+
+        self.x += (x - view_width / 2 - self.x) * smoothing
+        self.y += (y - view_height / 2 - self.y) * smoothing
+        self.clamp()
+
+    def screen_to_world(self, screen_x, screen_y):
+        return self.x + screen_x / self.zoom, self.y + screen_y / self.zoom
+
+    def world_to_view(self, points):
+        #array of world positions (with (x, y) as the last axis) to positions on the view surface
+        return points - np.array([self.x, self.y])
+
+    def is_visible(self, head_pos, radius=CULL_RADIUS):
+        #mask of the (n, 2) head positions whose fish could reach into the view
+        min_x, min_y, max_x, max_y = self.get_view_rect()
+
+        return (head_pos[:, 0] >= min_x - radius) & (head_pos[:, 0] <= max_x + radius) & (head_pos[:, 1] >= min_y - radius) & (head_pos[:, 1] <= max_y + radius)
+
+    def get_visible(self, grid, radius=CULL_RADIUS):
+        #indices of the items in the spatial hash whose fish could reach into the view
+        min_x, min_y, max_x, max_y = self.get_view_rect()
+
+        return grid.get_items_in_rect(min_x - radius, min_y - radius, max_x + radius, max_y + radius)
+
+    def begin_frame(self, colour):
+        #clears the part of the view surface that will be shown
+        #fish are drawn a little past it, so the whole surface is cleared when zooming out shows more of it
+        if self.zoom < self.cleared_zoom:
+            self.view_surface.fill(colour)
+        else:
+            view_width, view_height = self.get_view_size()
+            self.view_surface.fill(colour, (0, 0, math.ceil(view_width), math.ceil(view_height)))
+
+        self.cleared_zoom = self.zoom
+
+    def end_frame(self):
+        #copies the visible part of the view surface onto the window, scaled by the zoom
+        view_width, view_height = self.get_view_size()
+        visible = self.view_surface.subsurface((0, 0, math.ceil(view_width), math.ceil(view_height)))
+
+        if self.zoom == 1:
+            self.window.blit(visible, (0, 0))
+        else:
+            pygame.transform.scale(visible, self.window.get_size(), self.window)
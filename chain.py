@@ -0,0 +1,205 @@
+import fish
+import numpy as np
+
+
+MAX_ANGLE = fish.TrailPoint.MAX_ANGLE
+
+NUM_POINTS = 1 + len(fish.Fish.SIZES) + len(fish.TailFin.SIZES)  #head, body and tail fin (see get_chain_points)
+
+
+def get_chain_points(fish_obj):
+    #the head, body and tail fin form one chain, with the tail fin hanging off the last body point
+    return [fish_obj.head_point] + fish_obj.body.trail_points + fish_obj.tail_fin.fin_points.trail_points
+
+
+class ChainSolver:
+    #batched version of TrailPointString.update for the body and tail fin of every fish
+
+    def __init__(self, wrap_size=None):
+        self.wrap_size = wrap_size  #world (width, height) when the world wraps around
+        self.all_fish = []
+
+        #set after all fish added
+        self.all_points = np.zeros((0, 0, 2))
+        self.all_link_lengths = np.zeros((0, 0))
+        self.all_joint_angles = np.zeros((0, 0))
+        self.layout_lengths = np.zeros(0)
+
+        self.points = np.zeros((0, 0, 2))
+        self.link_lengths = np.zeros((0, 0))
+        self.angle_limited = np.zeros(0, dtype=bool)
+        self.joint_angles = np.zeros((0, 0))
+
+    def add_fish(self, fish_obj):
+        self.all_fish.append(fish_obj)
+
+        return len(self.all_fish) - 1
+
+    def init_arrays(self):
+        #to be called once all fish added
+        chains = [get_chain_points(i) for i in self.all_fish]
+
+        points = np.array([[(p.pos.x, p.pos.y) for p in c] for c in chains], dtype=float).reshape(len(chains), NUM_POINTS, 2)
+        link_lengths = np.array([[p.parent.radius for p in c[1:]] for c in chains], dtype=float).reshape(len(chains), NUM_POINTS - 1)
+        joint_angles = np.zeros(points.shape[:2])
+
+        #a new fish has each point its own radius behind the one before (see TrailPointString.create_points)
+        #which is not always the link length, as the first point of the tail fin trails by the fin's radius
+        #every fish is the same shape, so one row does for all of them
+        if chains:
+            self.layout_lengths = np.array([p.radius for p in chains[0][1:]], dtype=float)
+
+        self.use_arrays(points, link_lengths, joint_angles)
+
+    def use_arrays(self, points, link_lengths, joint_angles):
+        #the arrays are updated in place, so they can be views into shared memory
+        #they hold a row for every fish slot, and points, link_lengths and joint_angles are views of the active ones at the start
+        self.all_points = points
+        self.all_link_lengths = link_lengths
+        self.all_joint_angles = joint_angles
+
+        #the first point after the head has no joint to limit (same as TrailPoint.check_sharp_angle)
+        num_points = points.shape[1]
+        self.angle_limited = np.array([k >= 2 for k in range(num_points)])
+
+        self.set_views(len(points))
+
+    def set_active_fish(self, all_fish):
+        #all_fish are the fish in the first len(all_fish) slots
+        self.all_fish = all_fish
+        self.set_views(len(all_fish))
+
+    def set_views(self, num_active):
+        self.points = self.all_points[:num_active]
+        self.link_lengths = self.all_link_lengths[:num_active]
+        self.joint_angles = self.all_joint_angles[:num_active]
+
+    def swap_slots(self, a, b):
+        #swaps the chains in the slots of index arrays a and b
+        for i in [self.all_points, self.all_link_lengths, self.all_joint_angles]:
+            i[a], i[b] = i[b], i[a]
+
+    def reset_slots(self, inxs, head_pos, directions):
+        #lays out new straight chains in the given slots, trailing behind each head like a newly made fish
+        dist_along = np.concatenate([[0], np.cumsum(self.layout_lengths)])
+
+        unit_dirs = directions / np.linalg.norm(directions, axis=1)[:, None]
+
+        self.all_points[inxs] = head_pos[:, None, :] - unit_dirs[:, None, :] * dist_along[None, :, None]
+        self.all_joint_angles[inxs] = 0
+
+    def get_signed_angles(self, vecs, other_vecs):
+        #same as Vec2.get_signed_angle_to for each row
+        dot = np.einsum("ij,ij->i", vecs, other_vecs)
+        mags = np.sqrt(np.einsum("ij,ij->i", vecs, vecs) * np.einsum("ij,ij->i", other_vecs, other_vecs))
+        abs_angle = np.arccos(np.clip(dot / mags, -1, 1))
+
+        perp_dot = vecs[:, 1] * other_vecs[:, 0] - vecs[:, 0] * other_vecs[:, 1]
+
+        return np.where(perp_dot > 0, abs_angle, -abs_angle)
+
+    def rot(self, vecs, angles):
+        c = np.cos(angles)
+        s = np.sin(angles)
+
+        x = vecs[:, 0] * c - vecs[:, 1] * s
+        y = vecs[:, 0] * s + vecs[:, 1] * c
+
+        return np.stack([x, y], axis=1)
+
+    def check_sharp_angles(self, k):
+        parent = self.points[:, k - 1]
+        vec_to_parent = parent - self.points[:, k]
+        parent_dir = self.points[:, k - 2] - parent
+
+        signed_angle = self.get_signed_angles(vec_to_parent, parent_dir)
+
+        too_sharp = np.abs(signed_angle) > MAX_ANGLE
+        if np.any(too_sharp):
+            #turn is too sharp - rotate the point to be back to the minimum angle
+            delta_theta = signed_angle[too_sharp] - np.sign(signed_angle[too_sharp]) * MAX_ANGLE
+            new_vec_to_parent = self.rot(vec_to_parent[too_sharp], -delta_theta)
+
+            self.points[too_sharp, k] = parent[too_sharp] - new_vec_to_parent
+            signed_angle[too_sharp] = np.sign(signed_angle[too_sharp]) * MAX_ANGLE
+
+        self.joint_angles[:, k] = signed_angle
+
+    def update_point(self, k):
+        parent = self.points[:, k - 1]
+        vec_to_parent = parent - self.points[:, k]
+        dist = np.sqrt(np.einsum("ij,ij->i", vec_to_parent, vec_to_parent))
+
+        #same as stepping towards the parent until the point is one parent radius away
+        self.points[:, k] = parent - vec_to_parent * (self.link_lengths[:, k - 1] / dist)[:, None]
+
+        if self.angle_limited[k]:
+            self.check_sharp_angles(k)
+
+    def find_joint_angles(self):
+        #joint angles for points that were set directly rather than solved, e.g. when replaying a recording
+        vec_to_parent = (self.points[:, 1:-1] - self.points[:, 2:]).reshape(-1, 2)
+        parent_dir = (self.points[:, :-2] - self.points[:, 1:-1]).reshape(-1, 2)
+
+        self.joint_angles[:, 2:] = self.get_signed_angles(vec_to_parent, parent_dir).reshape(len(self.points), -1)
+
+    def get_head_positions(self, rows=None):
+        all_fish = self.all_fish if rows is None else [self.all_fish[i] for i in rows.tolist()]
+
+        return np.array([(i.head_point.pos.x, i.head_point.pos.y) for i in all_fish], dtype=float).reshape(-1, 2)
+
+    def follow_wrapped_heads(self, head_pos):
+        #heads that wrapped around the world jump by a whole world size, so move their chains with them
+        jump = head_pos - self.points[:, 0]
+        world_size = np.array(self.wrap_size, dtype=float)
+
+        self.points += (world_size * np.round(jump / world_size))[:, None, :]
+
+    def update(self, head_pos):
+        if self.wrap_size is not None:
+            self.follow_wrapped_heads(head_pos)
+
+        self.points[:, 0] = head_pos
+
+        #each point depends on the new position of its parent, so only the walk down the chain is a loop
+        for k in range(1, self.points.shape[1]):
+            self.update_point(k)
+
+    def update_rows(self, head_pos, rows):
+        #update only the chains in the index array rows, with head_pos holding just their heads
+        points = self.points
+        link_lengths = self.link_lengths
+        joint_angles = self.joint_angles
+
+        self.points = points[rows]
+        self.link_lengths = link_lengths[rows]
+        self.joint_angles = joint_angles[rows]
+
+        self.update(head_pos)
+
+        points[rows] = self.points
+        joint_angles[rows] = self.joint_angles
+
+        self.points = points
+        self.link_lengths = link_lengths
+        self.joint_angles = joint_angles
+
+    def sync_fish(self, rows=None):
+        #copy the solved positions and joint angles back onto the TrailPoint objects used for drawing, for every fish or the ones in rows
+        if rows is None:
+            all_fish = self.all_fish
+            all_points = self.points.tolist()
+            all_angles = self.joint_angles.tolist()
+        else:
+            all_fish = [self.all_fish[i] for i in rows.tolist()]
+            all_points = self.points[rows].tolist()
+            all_angles = self.joint_angles[rows].tolist()
+
+        #the head has no joint angle
+        for fish_obj, points, angles in zip(all_fish, all_points, all_angles):
+            chain_points = get_chain_points(fish_obj)
+            chain_points[0].pos.set(*points[0])
+
+            for i in range(1, len(chain_points)):
+                chain_points[i].pos.set(*points[i])
+                chain_points[i].joint_angle = angles[i]
@@ -1,4 +1,5 @@
 import boid
+import agents
 import vector
 import pygame
 
@@ -6,13 +7,15 @@ import pygame
 FPS = 120
 
 
-pygame.init()
-window = pygame.display.set_mode((500, 500))
+def boid_debug():
+    pygame.init()
+    window = pygame.display.set_mode((500, 500))
 
+    agent_field = agents.AgentField(500, 500)
+    predator_pos = vector.rand_vec(0, 500)
+    agent_field.add_agent(predator_pos.x, predator_pos.y, agents.PREDATOR)
 
-def boid_debug():
-    player_boid = boid.Boid(vector.rand_vec(0, 500), 500, 500, None)
-    boids = [boid.Boid(vector.rand_vec(0, 500), 500, 500, player_boid) for _ in range(40)]
+    boids = [boid.Boid(vector.rand_vec(0, 500), 500, 500, agent_field, vector.rand_vec(-1, 1)) for _ in range(40)]
     boid.set_all_boids(boids)
 
     clock = pygame.time.Clock()
@@ -21,6 +24,7 @@ def boid_debug():
         boid.update_all_boids(boids)
 
         window.fill((0, 0, 0))
+        agent_field.draw(window)
         for i in boids:
             if i.pos.x < 0:
                 i.pos.x = 500
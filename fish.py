@@ -1,10 +1,19 @@
 import boid
+import agents
 import vector
+import species
 
 import math
+import random
 import pygame
-from json import loads
-from random import uniform
+
+
+#levels of detail a fish can be drawn at, from most to least detailed (see lod.py)
+LOD_FULL = 0
+LOD_BODY_TAIL = 1  #head, body and tail fin
+LOD_OUTLINE = 2  #one four sided polygon along the body
+LOD_POINT = 3
+LOD_TIERS = [LOD_FULL, LOD_BODY_TAIL, LOD_OUTLINE, LOD_POINT]
 
 
 class HeadPoint:
@@ -20,6 +29,12 @@ class TrailPoint(HeadPoint):
         self.size = size
         self.parent = parent
 
+        #reused every update so steady state updates do not allocate
+        self.vec_to_parent = vector.Vec2(0, 0)
+        self.parent_dir = vector.Vec2(0, 0)
+
+        self.joint_angle = 0  #signed angle from the parent's direction to this point's, after limiting
+
         super().__init__(pos, radius)
 
     def get_direction(self):
@@ -36,8 +51,9 @@ class TrailPoint(HeadPoint):
         if type(self.parent) == HeadPoint:
             return
     
-        vec_to_parent = self.parent.pos - self.pos
-        signed_angle = vec_to_parent.get_signed_angle_to(self.parent.get_direction())
+        vec_to_parent = self.vec_to_parent.set_vec(self.parent.pos).isub(self.pos)
+        parent_dir = self.parent_dir.set_vec(self.parent.parent.pos).isub(self.parent.pos)
+        signed_angle = vec_to_parent.get_signed_angle_to(parent_dir)
 
         if abs(signed_angle) > TrailPoint.MAX_ANGLE:
             #turn is too sharp - rotate the point to be back to the minimum angle
@@ -46,16 +62,20 @@ class TrailPoint(HeadPoint):
             else:
                 delta_theta = signed_angle - TrailPoint.MAX_ANGLE
 
-            new_vec_to_parent = vec_to_parent.rot(-delta_theta)
+            new_vec_to_parent = vec_to_parent.rotate_inplace(-delta_theta)
+
+            self.pos.set_vec(self.parent.pos).isub(new_vec_to_parent)
 
-            self.pos = self.parent.pos - new_vec_to_parent
+            signed_angle = math.copysign(TrailPoint.MAX_ANGLE, signed_angle)
+
+        self.joint_angle = signed_angle
 
     def update_pos(self):
-        vec_to_parent = self.parent.pos - self.pos
+        vec_to_parent = self.vec_to_parent.set_vec(self.parent.pos).isub(self.pos)
         step_length = vec_to_parent.mag() - self.parent.radius
-        step = vec_to_parent.set_mag(step_length)
+        step = vec_to_parent.set_mag_inplace(step_length)
 
-        self.pos = self.pos + step
+        self.pos.iadd(step)
 
         self.check_sharp_angle()
 
@@ -128,6 +148,8 @@ class Eyes:
 
         self.dist_along = self.first_trail_point.size * Eyes.LENGTH_RATIO
 
+        self.sprite_cache = None  #sprites.SpriteCache to blit from instead of drawing circles
+
     def get_pos(self):
         pointing_dir = self.first_trail_point.get_direction()
         scaled_vec = pointing_dir.set_mag(self.dist_along)
@@ -140,6 +162,11 @@ class Eyes:
     def draw(self):
         pos1, pos2 = self.get_pos()
 
+        if self.sprite_cache is not None:
+            self.sprite_cache.draw_circle(self.window, self.colour, pos1.x, pos1.y, Eyes.RADIUS)
+            self.sprite_cache.draw_circle(self.window, self.colour, pos2.x, pos2.y, Eyes.RADIUS)
+            return
+
         pygame.draw.circle(self.window, self.colour, pos1.get_int_pos(), Eyes.RADIUS)
         pygame.draw.circle(self.window, self.colour, pos2.get_int_pos(), Eyes.RADIUS)
 
@@ -190,24 +217,21 @@ class BodyFin:
         self.positive_rot = positive_rot
         self.colour = colour
 
-        self.ellipse_points = self.get_ellipse_points()
+        self.ellipse_points = BodyFin.ELLIPSE_POINTS  #shared by every fin, so must not be changed
 
-    def get_ellipse_points(self):
-        ellipse_points = []
-        for i in range(BodyFin.NUM_T_STEPS):
-            t = math.pi / 2 + BodyFin.T_STEP * i
-            ellipse_points.append(vector.Vec2(BodyFin.A * math.cos(t), BodyFin.B * math.sin(t)))
+        self.sprite_cache = None  #sprites.SpriteCache to blit from instead of drawing the polygon
 
-        return ellipse_points
-    
-    def transform_ellipse_points(self):
-        anchor_pos = self.anchor_point.get_outside_point(self.positive_rot)
+    def get_rot_angle(self):
         rot_point_angle = self.rotation_point.get_direction().get_angle_above_x_axis()
 
         if not self.positive_rot:
-            rot_angle = rot_point_angle + BodyFin.ANGLE_OFFSET
+            return rot_point_angle + BodyFin.ANGLE_OFFSET
         else:
-            rot_angle = rot_point_angle - BodyFin.ANGLE_OFFSET
+            return rot_point_angle - BodyFin.ANGLE_OFFSET
+    
+    def transform_ellipse_points(self):
+        anchor_pos = self.anchor_point.get_outside_point(self.positive_rot)
+        rot_angle = self.get_rot_angle()
 
         transformed = []
         for i in self.ellipse_points:
@@ -219,12 +243,29 @@ class BodyFin:
         return transformed
     
     def draw(self):
+        if self.sprite_cache is not None:
+            anchor_pos = self.anchor_point.get_outside_point(self.positive_rot)
+            self.sprite_cache.draw_fin(self.window, self.colour, anchor_pos.x, anchor_pos.y, self.get_rot_angle())
+            return
+
         vector_points = self.transform_ellipse_points()
         coord_points = [i.get_int_pos() for i in vector_points]
 
         pygame.draw.polygon(self.window, self.colour, coord_points)
 
 
+def get_ellipse_points():
+    ellipse_points = []
+    for i in range(BodyFin.NUM_T_STEPS):
+        t = math.pi / 2 + BodyFin.T_STEP * i
+        ellipse_points.append(vector.Vec2(BodyFin.A * math.cos(t), BodyFin.B * math.sin(t)))
+
+    return tuple(ellipse_points)
+
+
+BodyFin.ELLIPSE_POINTS = get_ellipse_points()
+
+
 class DorsalFin:
     CONST_PROPORTIONALITY = 30
 
@@ -242,30 +283,20 @@ class DorsalFin:
         self.mid_point = body.trail_points[mid_inx]
         self.trail_points = body.trail_points[self.start_inx : self.end_inx + 1]
 
-    def lerp(self, a, b, t):
-        return a + (b - a) * t
-    
-    def bezier_curve(self, points, t):
-        if len(points) == 1:
-            return points[0]
-        
-        lerped_points = []
-        for i, x in enumerate(points):
-            if i == 0:
-                continue
-
-            new_point = self.lerp(points[i - 1], x, t)
-            lerped_points.append(new_point)
-
-        return self.bezier_curve(lerped_points, t)
+    def get_bezier_point(self, start, control, end, weights):
+        #quadratic bezier as a weighted sum of its three points
+        w0, w1, w2 = weights
+
+        x = w0 * start.x + w1 * control.x + w2 * end.x
+        y = w0 * start.y + w1 * control.y + w2 * end.y
+
+        return (int(x), int(y))
     
     def get_total_curvature(self):
+        #the angle between each point and the one in front was found when the chain was last updated
         total_angle = 0
-        prev_dir = self.trail_points[0].get_direction()
         for i in self.trail_points[1:]:
-            new_dir = i.get_direction()
-            total_angle += new_dir.get_signed_angle_to(prev_dir)
-            prev_dir = new_dir
+            total_angle += i.joint_angle
 
         num_angles = len(self.trail_points) - 1
         avg_angle = total_angle / num_angles
@@ -287,15 +318,10 @@ class DorsalFin:
         scaled_vec = (outside_point - self.mid_point.pos) * mult
         apex = self.mid_point.pos + scaled_vec
 
-        bezier_points = [self.trail_points[0].pos, apex, self.trail_points[-1].pos]
+        start = self.trail_points[0].pos
+        end = self.trail_points[-1].pos
 
-        outside_points = []
-        for i in range(DorsalFin.NUM_BEZIER_STEPS):
-            t = i * DorsalFin.STEP_SIZE
-            point_on_bezier = self.bezier_curve(bezier_points, t)
-            outside_points.append(point_on_bezier.get_int_pos())
-
-        return outside_points
+        return [self.get_bezier_point(start, apex, end, i) for i in DorsalFin.BEZIER_WEIGHTS]
     
     def draw(self):
         body_points = self.get_body_points()
@@ -304,6 +330,19 @@ class DorsalFin:
         pygame.draw.polygon(self.window, self.colour, body_points + outside_points[::-1])
 
 
+def get_bezier_weights():
+    #bernstein weights of the start, control and end point at each step along the curve
+    weights = []
+    for i in range(DorsalFin.NUM_BEZIER_STEPS):
+        t = i * DorsalFin.STEP_SIZE
+        weights.append(((1 - t) ** 2, 2 * t * (1 - t), t**2))
+
+    return tuple(weights)
+
+
+DorsalFin.BEZIER_WEIGHTS = get_bezier_weights()
+
+
 class Fish:
     SHOW_EYES = False
 
@@ -311,17 +350,22 @@ class Fish:
     LENGTH = 64
 
     BODY_FIN_ANCHOR_INX = 2
+    OUTLINE_WIDEST_INX = 2  #trail point the sides of the LOD_OUTLINE polygon go through
+
+    POINT_RADIUS = 2  #size of a fish drawn at LOD_POINT
 
     DORSAL_FIN_START_INX = 3
     DORSAL_FIN_END_INX = 8
     DORSAL_FIN_MID_INX = (DORSAL_FIN_START_INX + DORSAL_FIN_END_INX) // 2
 
-    def __init__(self, window, pos, config_file):
-        self.window = window
+    def __init__(self, window, pos, config_file, world_size=None, rng=None):
+        self.window = window  #may be None when running headless, in which case the fish cannot be drawn
+        self.world_width, self.world_height = get_world_size(window, world_size)
 
-        self.config = self.get_config(config_file)
+        self.species = species.get_species(config_file)
+        self.config = self.species.config
 
-        self.initial_vel = vector.rand_vec(-1, 1)
+        self.initial_vel = vector.rand_vec(-1, 1, rng)
 
         self.head_point = self.create_head_point(pos)
         self.body = self.create_body()
@@ -330,11 +374,7 @@ class Fish:
         self.eyes = self.create_eyes()
         self.dorsal_fin = self.create_dorsal_fin()
 
-    def get_config(self, filename):
-        file_data = read_file(filename)
-        config = loads(file_data)
-
-        return config
+        self.sprite_cache = None
 
     def create_head_point(self, pos):
         num_radii = len(Fish.SIZES)
@@ -343,12 +383,12 @@ class Fish:
         return HeadPoint(pos, head_radius)
     
     def create_body(self):
-        body = TrailPointString(self.window, self.head_point, Fish.SIZES, self.head_point.radius, self.initial_vel, self.config["colours"]["body"])
+        body = TrailPointString(self.window, self.head_point, Fish.SIZES, self.head_point.radius, self.initial_vel, self.species.colours["body"])
 
         return body
     
     def create_tail_fin(self):
-        tail_fin = TailFin(self.window, self.body.trail_points[-1], self.config["colours"]["tail_fin"], self.initial_vel)
+        tail_fin = TailFin(self.window, self.body.trail_points[-1], self.species.colours["tail_fin"], self.initial_vel)
 
         return tail_fin
     
@@ -356,36 +396,92 @@ class Fish:
         anchor = self.body.trail_points[Fish.BODY_FIN_ANCHOR_INX]
         rotation = self.body.trail_points[Fish.BODY_FIN_ANCHOR_INX - 1]
 
-        left_fin = BodyFin(self.window, anchor, rotation, False, self.config["colours"]["body_fin"])
-        right_fin = BodyFin(self.window, anchor, rotation, True, self.config["colours"]["body_fin"])
+        left_fin = BodyFin(self.window, anchor, rotation, False, self.species.colours["body_fin"])
+        right_fin = BodyFin(self.window, anchor, rotation, True, self.species.colours["body_fin"])
 
         return left_fin, right_fin
     
     def create_eyes(self):
-        eyes = Eyes(self.window, self.head_point, self.body.trail_points[0], self.config["colours"]["eyes"])
+        eyes = Eyes(self.window, self.head_point, self.body.trail_points[0], self.species.colours["eyes"])
 
         return eyes
     
     def create_dorsal_fin(self):
-        dorsal_fin = DorsalFin(self.window, Fish.DORSAL_FIN_START_INX, Fish.DORSAL_FIN_MID_INX, Fish.DORSAL_FIN_END_INX, self.body, self.config["colours"]["dorsal_fin"])
+        dorsal_fin = DorsalFin(self.window, Fish.DORSAL_FIN_START_INX, Fish.DORSAL_FIN_MID_INX, Fish.DORSAL_FIN_END_INX, self.body, self.species.colours["dorsal_fin"])
 
         return dorsal_fin
 
+    def reset(self, pos, direction_vec):
+        #lay the fish out straight behind pos, as it is when first made, so the fish can be reused
+        self.head_point.pos.set_vec(pos)
+
+        for i in self.body.trail_points + self.tail_fin.fin_points.trail_points:
+            i.pos.set_vec(direction_vec).set_mag_inplace(-i.radius).iadd(i.parent.pos)
+            i.joint_angle = 0
+
+    def set_species(self, new_species):
+        #switch to a reloaded config, recolouring every part
+        self.species = new_species
+        self.config = new_species.config
+
+        colours = new_species.colours
+        self.body.colour = colours["body"]
+        self.tail_fin.colour = colours["tail_fin"]
+        self.tail_fin.fin_points.colour = colours["tail_fin"]
+        self.left_fin.colour = colours["body_fin"]
+        self.right_fin.colour = colours["body_fin"]
+        self.eyes.colour = colours["eyes"]
+        self.dorsal_fin.colour = colours["dorsal_fin"]
+
+    def set_sprite_cache(self, sprite_cache):
+        #the fins, head and eyes are blitted from sprite_cache (a sprites.SpriteCache) instead of being drawn, or drawn again when None
+        self.sprite_cache = sprite_cache
+        self.left_fin.sprite_cache = sprite_cache
+        self.right_fin.sprite_cache = sprite_cache
+        self.eyes.sprite_cache = sprite_cache
+
     def draw_head(self):
         radius = Fish.SIZES[0]
 
-        pygame.draw.circle(self.window, self.config["colours"]["body"], self.head_point.pos.get_int_pos(), radius)
+        if self.sprite_cache is not None:
+            self.sprite_cache.draw_circle(self.window, self.species.colours["body"], self.head_point.pos.x, self.head_point.pos.y, radius)
+            return
+
+        pygame.draw.circle(self.window, self.species.colours["body"], self.head_point.pos.get_int_pos(), radius)
+
+    def draw_outline(self):
+        widest = self.body.trail_points[Fish.OUTLINE_WIDEST_INX]
+        tail_end = self.tail_fin.fin_points.trail_points[-1]
+
+        points = [self.head_point.pos, widest.get_outside_point(False), tail_end.pos, widest.get_outside_point(True)]
+
+        pygame.draw.polygon(self.window, self.species.colours["body"], [i.get_int_pos() for i in points])
+
+    def draw_point(self):
+        pygame.draw.circle(self.window, self.species.colours["body"], self.head_point.pos.get_int_pos(), Fish.POINT_RADIUS)
+
+    def draw(self, tier=LOD_FULL):
+        if tier == LOD_POINT:
+            self.draw_point()
+            return
+        elif tier == LOD_OUTLINE:
+            self.draw_outline()
+            return
 
-    def draw(self):
         self.draw_head()
         self.tail_fin.draw()
-        self.left_fin.draw()
-        self.right_fin.draw()
+
+        if tier == LOD_FULL:
+            self.left_fin.draw()
+            self.right_fin.draw()
+
         self.body.draw()
-        self.dorsal_fin.draw()
 
-        if Fish.SHOW_EYES:
-            self.eyes.draw()
+        if tier == LOD_FULL:
+            self.dorsal_fin.draw()
+
+            if Fish.SHOW_EYES:
+                self.eyes.draw()
 
     def update(self):
         self.update_head()
@@ -398,82 +494,167 @@ class PlayerFish(Fish):
 
     SPEED = 1.5
 
-    def __init__(self, window, pos):
-        super().__init__(window, pos, PlayerFish.CONFIG_FILENAME)
+    def __init__(self, window, pos, world_size=None, rng=None, agent_field=None):
+        super().__init__(window, pos, PlayerFish.CONFIG_FILENAME, world_size, rng)
 
-        self.dummy_boid = self.create_dummy_boid()
+        self.target_pos = None  #follow the mouse when not set
+        self.camera = None  #camera.Camera the mouse is seen through, when the world is not drawn straight onto the window
+        self.head_step = vector.Vec2(0, 0)  #also the velocity of the player fish
 
-    def create_dummy_boid(self):
-        #create a boid object with same pos and vel as fish so non player fish interact with player fish
-        boid_obj = boid.Boid(self.head_point.pos, self.window.get_width(), self.window.get_height(), None, self.initial_vel)
+        #the player fish is a predator to the rest of the school, but draws itself
+        self.agent_field = agent_field
+        if self.agent_field is not None:
+            self.agent_inx = self.agent_field.add_agent(self.head_point.pos.x, self.head_point.pos.y, agents.PREDATOR, visible=False)
 
-        return boid_obj
-    
-    def update_dummy_boid(self, head_step):
-        #ensure dummy boids attrs match the actual fish
-        self.dummy_boid.pos = self.head_point.pos
-        self.dummy_boid.vel = head_step
-        self.dummy_boid.update_grid_pos()
+    def get_target_pos(self):
+        if self.target_pos is None and self.camera is not None:
+            return vector.Vec2(*self.camera.screen_to_world(*pygame.mouse.get_pos()))
+        elif self.target_pos is None:
+            return vector.Vec2(*pygame.mouse.get_pos())
+        else:
+            return self.target_pos
 
     def update_head(self):
-        mouse_pos = vector.Vec2(*pygame.mouse.get_pos())
-        step_dir = mouse_pos - self.head_point.pos
-        step = step_dir.set_mag(PlayerFish.SPEED)
+        #NOTE: this does not rebuild the agent field, this must be done once all agents have moved
+        target_pos = self.get_target_pos()
+        step_dir = self.head_step.set_vec(target_pos).isub(self.head_point.pos)
+        step = step_dir.set_mag_inplace(PlayerFish.SPEED)
 
-        self.head_point.pos = self.head_point.pos + step
+        self.head_point.pos.iadd(step)
 
-        self.update_dummy_boid(step)
+        if self.agent_field is not None:
+            self.agent_field.set_pos(self.agent_inx, self.head_point.pos.x, self.head_point.pos.y)
 
 
 class NonPlayerFish(Fish):
     CONFIG_FILENAME = "default_fish.json"
 
-    def __init__(self, window, pos, player_fish):
-        super().__init__(window, pos, NonPlayerFish.CONFIG_FILENAME)
+    def __init__(self, window, pos, player_fish, school_flock=None, rng=None):
+        super().__init__(window, pos, NonPlayerFish.CONFIG_FILENAME, (player_fish.world_width, player_fish.world_height), rng)
+
+        self.flock = school_flock
+
+        if self.flock is None:
+            self.boid = boid.Boid(pos, self.world_width, self.world_height, player_fish.agent_field, self.initial_vel)
+        else:
+            self.boid = None
+            self.flock_inx = self.flock.add_boid(pos, self.initial_vel)
 
-        self.boid = boid.Boid(pos, self.window.get_width(), self.window.get_height(), player_fish.dummy_boid, self.initial_vel)
+    def follow_wrapped_head(self, new_x, new_y):
+        #a head that wrapped around the world jumps by a whole world size, so move the chain with it
+        shift_x = self.world_width * round((new_x - self.head_point.pos.x) / self.world_width)
+        shift_y = self.world_height * round((new_y - self.head_point.pos.y) / self.world_height)
+
+        if shift_x != 0 or shift_y != 0:
+            shift = vector.Vec2(shift_x, shift_y)
+            for i in self.body.trail_points + self.tail_fin.fin_points.trail_points:
+                i.pos.iadd(shift)
 
     def update_head(self):
         #NOTE: this does not actually update the boid pos, this must be done with update_all_non_player_fish
-        self.head_point.pos = self.boid.pos
+        if self.flock is None:
+            new_x = self.boid.pos.x
+            new_y = self.boid.pos.y
+            grid = self.boid.grid
+        else:
+            new_x, new_y = self.flock.pos_list[self.flock_inx]
+            grid = self.flock.grid
+
+        if grid.wrap:
+            self.follow_wrapped_head(new_x, new_y)
 
+        self.head_point.pos.set(new_x, new_y)
 
-def read_file(filename):
-    with open(filename, "r") as file:
-        data = file.read()
 
-    return data
+def get_world_size(window, world_size):
+    if world_size is None:
+        return window.get_width(), window.get_height()
+    else:
+        return world_size
 
 
-def set_all_fish_boids(all_fish, player_fish):
+def set_all_fish_boids(all_fish, bounds_policy=None, obstacle_field=None, verlet_skin=None):
     #to be called once all fish have been initialised
-    boids = [i.boid for i in all_fish]
-    boids.append(player_fish.dummy_boid)
+    boids = [i.boid for i in all_fish if i.boid is not None]
 
-    boid.set_all_boids(boids)
+    if len(boids) > 0:
+        boid.set_all_boids(boids, bounds_policy, obstacle_field, verlet_skin)
 
 
-def create_non_player_fish(window, num, player_fish):
-    width = window.get_width()
-    height = window.get_height()
+def create_non_player_fish(window, num, player_fish, school_flock=None, school_chains=None, bounds_policy=None, rng=None, obstacle_field=None, verlet_skin=None):
+    #rng is a random.Random, so a seeded one gives the same school every time
+    if rng is None:
+        rng = random
+
+    width = player_fish.world_width
+    height = player_fish.world_height
 
     all_fish = []
     for _ in range(num):
-        pos_x = uniform(0, width)
-        pos_y = uniform(0, height)
+        pos_x = rng.uniform(0, width)
+        pos_y = rng.uniform(0, height)
 
-        fish = NonPlayerFish(window, vector.Vec2(pos_x, pos_y), player_fish)
+        fish = NonPlayerFish(window, vector.Vec2(pos_x, pos_y), player_fish, school_flock, rng)
         all_fish.append(fish)
 
-    set_all_fish_boids(all_fish, player_fish)
+        if school_chains is not None:
+            school_chains.add_fish(fish)
+
+    set_all_fish_boids(all_fish, bounds_policy, obstacle_field, verlet_skin)
+
+    if school_flock is not None:
+        school_flock.init_arrays()
+
+    if school_chains is not None:
+        school_chains.init_arrays()
 
     return all_fish
 
 
-def update_all_non_player_fish(all_fish):
-    boids = [i.boid for i in all_fish]
+def update_non_player_vels(all_fish, school_flock=None):
+    if school_flock is None:
+        boids = [i.boid for i in all_fish]
+        boid.update_all_vels(boids)
+    else:
+        school_flock.update_new_vel()
+
+
+def move_non_player_fish(all_fish, school_flock=None):
+    #applies the new velocities and keeps the grid up to date
+    if school_flock is None:
+        boids = [i.boid for i in all_fish]
+        boid.move_all_boids(boids)
+    else:
+        school_flock.update()
+
+
+def update_non_player_chains(all_fish, school_flock=None, school_chains=None, sync_objects=True, awake=None):
+    #awake is an index array of the only fish whose chains (and heads) are updated, the rest are left where they were (see lazy.py)
+    awake_fish = all_fish if awake is None else [all_fish[i] for i in awake.tolist()]
+
+    if school_chains is None:
+        for i in awake_fish:
+            i.update()
+    else:
+        #with both engines the heads are copied straight from the flock, and onto the fish objects along with the rest of the chain
+        if school_flock is not None:
+            head_pos = school_flock.pos if awake is None else school_flock.pos[awake]
+        else:
+            for i in awake_fish:
+                i.update_head()
+
+            head_pos = school_chains.get_head_positions(awake)
+
+        if awake is None:
+            school_chains.update(head_pos)
+        else:
+            school_chains.update_rows(head_pos, awake)
+
+        if sync_objects:
+            school_chains.sync_fish(awake)
 
-    boid.update_all_boids(boids)
 
-    for i in all_fish:
-        i.update()
\ No newline at end of file
+def update_all_non_player_fish(all_fish, school_flock=None, school_chains=None):
+    update_non_player_vels(all_fish, school_flock)
+    move_non_player_fish(all_fish, school_flock)
+    update_non_player_chains(all_fish, school_flock, school_chains)
\ No newline at end of file
@@ -0,0 +1,203 @@
+import boid
+import spatial
+import obstacles
+import numpy as np
+
+
+
+def limit_mag(vecs, limit):
+    #clamp the magnitude of each row vector in place
+    mags = np.sqrt(np.einsum("ij,ij->i", vecs, vecs))
+    over = mags > limit
+    vecs[over] *= (limit / mags[over])[:, None]
+
+    return vecs
+
+
+def set_mag(vecs, desired_mag):
+    mags = np.sqrt(np.einsum("ij,ij->i", vecs, vecs))
+    vecs *= (desired_mag / mags)[:, None]
+
+    return vecs
+
+
+class Flock:
+    #structure of arrays version of boid.Boid, applying the same rules to every boid in one go
+
+    def __init__(self, world_width, world_height, agent_field, bounds_policy=None, obstacle_field=None, verlet_skin=None):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.agent_field = agent_field  #agents.AgentField, or None
+
+        #with no obstacle field, the only obstacles are the walls
+        self.obstacle_field = obstacle_field
+        if self.obstacle_field is None:
+            self.obstacle_field = obstacles.ObstacleField(world_width, world_height)
+
+        self.grid = spatial.SpatialHash(world_width, world_height, boid.Boid.VIEW_RADIUS, bounds_policy)
+
+        #with a skin, neighbour candidates are kept between ticks instead of being found in the grid every tick
+        self.verlet = None
+        if verlet_skin is not None:
+            self.verlet = spatial.VerletList(world_width, world_height, boid.Boid.VIEW_RADIUS, verlet_skin, bounds_policy)
+
+        self.initial_pos = []
+        self.initial_vel = []
+
+        #set after all boids added - the all_ arrays hold every slot, and pos, vel and new_vel are views of the active ones at the start
+        self.all_pos = np.zeros((0, 2))
+        self.all_vel = np.zeros((0, 2))
+        self.all_new_vel = np.zeros((0, 2))
+        self.num_active = 0
+
+        self.pos = self.all_pos
+        self.vel = self.all_vel
+        self.new_vel = self.all_new_vel
+
+        self.pos_list = []
+
+    def add_boid(self, pos, initial_vel):
+        self.initial_pos.append((pos.x, pos.y))
+        self.initial_vel.append((initial_vel.x, initial_vel.y))
+
+        return len(self.initial_pos) - 1
+
+    def init_arrays(self):
+        #to be called once all boids added
+        self.all_pos = np.array(self.initial_pos, dtype=float).reshape(-1, 2)
+        self.all_vel = np.array(self.initial_vel, dtype=float).reshape(-1, 2)
+        self.all_new_vel = self.all_vel.copy()
+
+        self.set_num_active(len(self.all_pos))
+
+    def set_views(self):
+        self.pos = self.all_pos[:self.num_active]
+        self.vel = self.all_vel[:self.num_active]
+        self.new_vel = self.all_new_vel[:self.num_active]
+
+    def set_num_active(self, num):
+        #only the first num boids are updated, the rest are free slots
+        self.num_active = num
+        self.set_views()
+
+        self.rebuild_grid()
+
+    def get_slot_arrays(self):
+        return [self.all_pos, self.all_vel, self.all_new_vel]
+
+    def swap_slots(self, a, b):
+        #swaps the boids in the slots of index arrays a and b
+        for i in self.get_slot_arrays():
+            i[a], i[b] = i[b], i[a]  #fancy indexing copies, so this does not overwrite before reading
+
+    def reset_slots(self, inxs, pos, vel):
+        #puts new boids into the given slots
+        for i, values in zip(self.get_slot_arrays(), [pos, vel, vel]):
+            i[inxs] = values
+
+    def rebuild_grid(self):
+        #to be called whenever pos has changed
+        self.pos_list = self.pos.tolist()
+        self.grid.rebuild(self.pos)
+
+        if self.verlet is not None:
+            self.verlet.update(self.pos)
+
+    def iter_candidate_pairs(self, query):
+        #yields (q, j) chunks where boid j could be a neighbour of boid query[q]
+        if self.verlet is not None:
+            yield from self.verlet.iter_candidates(query)
+        else:
+            yield from self.grid.iter_pairs(self.pos[query], boid.Boid.VIEW_RADIUS_SQ)
+
+    def iter_neighbour_pairs(self, query):
+        #yields (q, i, j) index arrays where boid j is a neighbour of boid i = query[q], a chunk at a time
+        for q, j in self.iter_candidate_pairs(query):
+            i = query[q]
+            keep = (i != j) & self.is_in_view(i, j)
+
+            yield q[keep], i[keep], j[keep]
+
+    def get_offsets(self, i, j):
+        #vectors from boid i to boid j
+        return self.grid.wrap_offsets(self.pos[j] - self.pos[i])
+
+    def is_in_view(self, i, j):
+        #same test as Boid.is_in_view
+        offsets = self.get_offsets(i, j)
+        vel = self.vel[i]
+
+        dot = np.einsum("ij,ij->i", vel, offsets)
+        dist_sq = np.einsum("ij,ij->i", offsets, offsets)
+        threshold_sq = boid.Boid.COS_FOV_SQ * np.einsum("ij,ij->i", vel, vel) * dist_sq
+
+        if boid.Boid.COS_FOV < 0:
+            in_view = (dot >= 0) | (dot * dot < threshold_sq)
+        else:
+            in_view = (dot > 0) & (dot * dot > threshold_sq)
+
+        #verlet candidates can be further away than the view radius
+        return in_view & (dist_sq > 0) & (dist_sq < boid.Boid.VIEW_RADIUS_SQ)
+
+    def sum_rows(self, q, values, num_rows):
+        return np.stack([np.bincount(q, values[:, k], num_rows) for k in range(2)], axis=1)
+
+    def flock_steering(self, query):
+        num_query = len(query)
+        count = np.zeros(num_query)
+        sum_vel = np.zeros((num_query, 2))
+        sum_offset = np.zeros((num_query, 2))
+        sum_away = np.zeros((num_query, 2))
+
+        for q, i, j in self.iter_neighbour_pairs(query):
+            count += np.bincount(q, minlength=num_query)
+            sum_vel += self.sum_rows(q, self.vel[j], num_query)
+            offsets = self.get_offsets(i, j)
+            sum_offset += self.sum_rows(q, offsets, num_query)
+
+            away = -offsets
+            away_dist_sq = np.einsum("ij,ij->i", away, away)
+            away /= away_dist_sq[:, None]  #magnitude of 1 / dist
+            sum_away += self.sum_rows(q, away, num_query)
+
+        has_neighbours = count > 0
+        safe_count = np.maximum(count, 1)[:, None]
+        vel = self.vel[query]
+
+        align_step = limit_mag(sum_vel / safe_count - vel, boid.Boid.ALIGN_MAG)
+        cohesion_step = limit_mag(sum_offset / safe_count - vel, boid.Boid.COHESION_MAG)
+        seperation_step = limit_mag(sum_away, boid.Boid.SEPERATION_MAG)
+
+        acc = limit_mag(align_step + cohesion_step + seperation_step, boid.Boid.MAX_ACC)
+        acc[~has_neighbours] = 0
+
+        return acc
+
+    def avoid_obstacles(self, positions):
+        return self.obstacle_field.get_accs(positions)
+
+    def react_to_agents(self, positions):
+        if self.agent_field is None:
+            return np.zeros_like(positions)
+
+        return self.agent_field.get_accs(positions)
+
+    def get_new_vels(self, query):
+        #new velocities for the boids at the given indices
+        positions = self.pos[query]
+
+        acc = self.flock_steering(query)
+        acc += self.avoid_obstacles(positions)
+        acc += self.react_to_agents(positions)
+
+        return set_mag(self.vel[query] + acc, boid.Boid.SPEED)
+
+    def update_new_vel(self):
+        self.new_vel[:] = self.get_new_vels(np.arange(len(self.pos)))
+
+    def update(self):
+        self.vel[:] = self.new_vel
+        self.pos += self.vel
+        self.grid.enforce_bounds(self.pos, self.vel)
+
+        self.rebuild_grid()
@@ -0,0 +1,143 @@
+import fish
+import camera
+
+import numpy as np
+
+
+HISTORY_INTERVAL = 4  #ticks between the head positions kept for each fish
+HISTORY_LENGTH = 32  #head positions kept for each fish, enough to lay a whole chain along at normal speed
+
+#fish this far past camera.CULL_RADIUS from the view keep their chains awake, so they are settled a few ticks before they can be seen
+WAKE_MARGIN = 2 * fish.Fish.LENGTH
+WAKE_RADIUS = camera.CULL_RADIUS + WAKE_MARGIN
+
+EPSILON = 0.001
+
+
+class LazyChains:
+    #lets fish the camera cannot see skip their body and tail chains, which are only needed for drawing
+    #a sleeping fish keeps moving its boid, and a few of its head positions are kept so its chain can be laid back along
+    #the path it took when it wakes up, which is very close to where solving the chain every tick would have left it
+
+    def __init__(self, capacity, wrap_size=None):
+        self.wrap_size = wrap_size
+
+        #a ring of head positions for each slot, all written at the same ticks
+        self.history = np.zeros((capacity, HISTORY_LENGTH, 2))
+        self.counts = np.zeros(capacity, dtype=np.int64)  #positions kept since the slot was last reset
+        self.write_inx = 0
+        self.num_ticks = 0
+
+        self.awake = np.ones(capacity, dtype=bool)
+
+        #counters for tuning the wake margin
+        self.num_updates = 0
+        self.total_awake = 0
+        self.num_settled = 0
+
+    def record(self, head_pos):
+        #to be called every tick with the (num_active, 2) head positions
+        self.num_ticks += 1
+        if self.num_ticks % HISTORY_INTERVAL != 0:
+            return
+
+        num_active = len(head_pos)
+        self.history[:num_active, self.write_inx] = head_pos
+        self.counts[:num_active] = np.minimum(self.counts[:num_active] + 1, HISTORY_LENGTH)
+
+        self.write_inx = (self.write_inx + 1) % HISTORY_LENGTH
+
+    def set_awake(self, awake, num_active):
+        #awake is an index array of the fish whose chains should be solved this tick, returns the ones that were asleep
+        is_awake = np.zeros(num_active, dtype=bool)
+        is_awake[awake] = True
+
+        woken = np.nonzero(is_awake & ~self.awake[:num_active])[0]
+        self.awake[:num_active] = is_awake
+
+        self.num_updates += 1
+        self.total_awake += len(awake)
+        self.num_settled += len(woken)
+
+        return woken
+
+    def swap_slots(self, a, b):
+        #swaps the fish in the slots of index arrays a and b
+        for i in [self.history, self.counts, self.awake]:
+            i[a], i[b] = i[b], i[a]
+
+    def reset_slots(self, inxs):
+        #new fish have no path to settle along, and start awake with freshly laid out chains
+        self.counts[inxs] = 0
+        self.awake[inxs] = True
+
+    def clear(self):
+        #to be called when every chain has been set from somewhere else, e.g. loaded from a snapshot
+        self.counts[:] = 0
+        self.awake[:] = True
+
+    def get_paths(self, inxs, head_pos):
+        #each head followed by its kept positions, newest first, as (len(inxs), HISTORY_LENGTH + 2, 2)
+        #the last position is left for settle to extend the path past its end
+        newest_first = (self.write_inx - 1 - np.arange(HISTORY_LENGTH)) % HISTORY_LENGTH
+
+        paths = np.zeros((len(inxs), HISTORY_LENGTH + 2, 2))
+        paths[:, 0] = head_pos
+        paths[:, 1:-1] = self.history[inxs][:, newest_first]
+
+        if self.wrap_size is not None:
+            #a head that wrapped around the world jumped a whole world size, so join the path back up
+            steps = np.diff(paths, axis=1)
+            world_size = np.array(self.wrap_size, dtype=float)
+            steps -= world_size * np.round(steps / world_size)
+
+            paths[:, 1:] = head_pos[:, None, :] + np.cumsum(steps, axis=1)
+
+        return paths
+
+    def settle(self, inxs, head_pos, link_lengths, back_dirs):
+        #lays the chains of the fish in inxs along their paths, as (len(inxs), num_points, 2)
+        #link_lengths is (len(inxs), num_points - 1), and back_dirs point backwards from each head, used past the end of its path
+        num_fish = len(inxs)
+        paths = self.get_paths(inxs, head_pos)
+        counts = self.counts[inxs]
+
+        chain_length = link_lengths.sum(axis=1)
+
+        #the path carries on straight from its last kept position, in the direction it was going
+        rows = np.arange(num_fish)
+        last = paths[rows, counts]
+        before_last = paths[rows, np.maximum(counts - 1, 0)]
+
+        ext_dirs = np.where((counts > 0)[:, None], last - before_last, back_dirs)
+        ext_lengths = np.sqrt(np.einsum("ij,ij->i", ext_dirs, ext_dirs))
+        ext_dirs = np.where((ext_lengths > EPSILON)[:, None], ext_dirs, back_dirs)
+        ext_dirs /= np.maximum(np.sqrt(np.einsum("ij,ij->i", ext_dirs, ext_dirs)), EPSILON)[:, None]
+
+        steps = np.arange(paths.shape[1])[None, :] - counts[:, None]
+        extended = last[:, None, :] + ext_dirs[:, None, :] * (np.maximum(steps, 0) * (chain_length[:, None] + 1))[:, :, None]
+        paths = np.where((steps > 0)[:, :, None], extended, paths)
+
+        #distance along each path to every point of the path, and to every point of the chain
+        segments = np.diff(paths, axis=1)
+        segment_lengths = np.sqrt(np.einsum("ijk,ijk->ij", segments, segments))
+        path_dists = np.concatenate([np.zeros((num_fish, 1)), np.cumsum(segment_lengths, axis=1)], axis=1)
+        chain_dists = np.concatenate([np.zeros((num_fish, 1)), np.cumsum(link_lengths, axis=1)], axis=1)
+
+        #one searchsorted for every fish at once, with each row shifted past the end of the one before
+        row_offsets = (np.arange(num_fish) * (path_dists[:, -1].max(initial=0) + chain_length.max(initial=0) + 1))[:, None]
+        seg_inxs = np.searchsorted((path_dists + row_offsets).ravel(), (chain_dists + row_offsets).ravel(), side="right").reshape(chain_dists.shape)
+        seg_inxs -= 1 + rows[:, None] * paths.shape[1]
+        np.clip(seg_inxs, 0, segments.shape[1] - 1, out=seg_inxs)
+
+        seg_lengths = segment_lengths[rows[:, None], seg_inxs]
+        t = (chain_dists - path_dists[rows[:, None], seg_inxs]) / np.maximum(seg_lengths, EPSILON)
+
+        return paths[rows[:, None], seg_inxs] + segments[rows[:, None], seg_inxs] * np.clip(t, 0, 1)[:, :, None]
+
+    def get_stats(self):
+        return {
+            "wake_radius": WAKE_RADIUS,
+            "mean_awake": self.total_awake / max(self.num_updates, 1),
+            "settled": self.num_settled,
+        }
@@ -0,0 +1,93 @@
+import fish
+
+import math
+import numpy as np
+
+
+#smallest on screen fish length (in pixels) each tier is used for
+MIN_LENGTHS = {fish.LOD_FULL: 32, fish.LOD_BODY_TAIL: 16, fish.LOD_OUTLINE: 6}
+
+#a fish sharing its crowd cell with at least this many fish is drawn one tier lower for each count reached
+CROWD_COUNTS = [12, 32]
+
+VERTEX_BUDGET = 20000  #max vertices drawn per frame, fish are dropped to lower tiers to fit
+
+
+def get_vertex_counts():
+    #vertices drawn for one fish at each tier, with a circle counted as one vertex
+    body = 2 * len(fish.Fish.SIZES) + 2
+    tail = 2 * len(fish.TailFin.SIZES) + 2
+    fins = 2 * fish.BodyFin.NUM_T_STEPS
+    dorsal_fin = fish.Fish.DORSAL_FIN_END_INX - fish.Fish.DORSAL_FIN_START_INX + 1 + fish.DorsalFin.NUM_BEZIER_STEPS
+    eyes = 2 if fish.Fish.SHOW_EYES else 0
+
+    return np.array([1 + tail + fins + body + dorsal_fin + eyes, 1 + tail + body, 4, 1])
+
+
+class LodSelector:
+    #picks a level of detail for each fish every frame, from its size on screen and how crowded it is
+
+    def __init__(self, screen_width, screen_height, vertex_budget=VERTEX_BUDGET):
+        self.vertex_budget = vertex_budget
+
+        #crowd cells are one fish length across
+        self.cell_size = fish.Fish.LENGTH
+        self.num_cells_x = int(screen_width // self.cell_size) + 1
+        self.num_cells_y = int(screen_height // self.cell_size) + 1
+
+        #counters for the last frame
+        self.tier_counts = [0 for _ in fish.LOD_TIERS]
+        self.num_vertices = 0
+
+    def get_size_tier(self, scale):
+        on_screen_length = fish.Fish.LENGTH * scale
+
+        for tier in [fish.LOD_FULL, fish.LOD_BODY_TAIL, fish.LOD_OUTLINE]:
+            if on_screen_length >= MIN_LENGTHS[tier]:
+                return tier
+
+        return fish.LOD_POINT
+
+    def get_crowd_counts(self, head_pos):
+        #number of fish in the crowd cell of each fish, with fish off the screen counted in the edge cells
+        cell_x = np.clip(np.floor(head_pos[:, 0] / self.cell_size).astype(np.int64), 0, self.num_cells_x - 1)
+        cell_y = np.clip(np.floor(head_pos[:, 1] / self.cell_size).astype(np.int64), 0, self.num_cells_y - 1)
+        cell_ids = cell_x * self.num_cells_y + cell_y
+
+        return np.bincount(cell_ids, minlength=self.num_cells_x * self.num_cells_y)[cell_ids]
+
+    def fit_budget(self, tiers, crowd_counts, vertex_counts):
+        #drop fish one tier at a time, most crowded first, until the frame fits in the vertex budget
+        total = vertex_counts[tiers].sum()
+
+        for tier in [fish.LOD_FULL, fish.LOD_BODY_TAIL, fish.LOD_OUTLINE]:
+            excess = total - self.vertex_budget
+            if excess <= 0:
+                break
+
+            candidates = np.nonzero(tiers == tier)[0]
+            candidates = candidates[np.argsort(-crowd_counts[candidates], kind="stable")]
+
+            saving = vertex_counts[tier] - vertex_counts[tier + 1]
+            num_dropped = min(len(candidates), math.ceil(excess / saving))
+
+            tiers[candidates[:num_dropped]] = tier + 1
+            total -= num_dropped * saving
+
+        return total
+
+    def select(self, head_pos, scale=1):
+        #head_pos is an (n, 2) array of screen positions, scale is screen pixels per world unit
+        crowd_counts = self.get_crowd_counts(head_pos)
+
+        tiers = np.full(len(head_pos), self.get_size_tier(scale), dtype=np.int64)
+        for count in CROWD_COUNTS:
+            tiers += crowd_counts >= count
+
+        np.minimum(tiers, fish.LOD_POINT, out=tiers)
+
+        vertex_counts = get_vertex_counts()
+        self.num_vertices = int(self.fit_budget(tiers, crowd_counts, vertex_counts))
+        self.tier_counts = np.bincount(tiers, minlength=len(fish.LOD_TIERS)).tolist()
+
+        return tiers
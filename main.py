@@ -1,50 +1,225 @@
-import fish
-import vector
+import agents
+import camera
+import simulation
+import pipeline
+import recording
+import profiling
+import timestep
 import pygame
 
 
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 800
 
-FPS = 60
+#the world can be bigger than the screen when USE_CAMERA is set, with only the part the camera can see drawn
+WORLD_WIDTH = SCREEN_WIDTH
+WORLD_HEIGHT = SCREEN_HEIGHT
+USE_CAMERA = False
+CAMERA_FOLLOW_PLAYER = True  #keep the player fish in view, otherwise the arrow keys move the camera
+LAZY_CHAINS = False  #with the camera, fish out of view skip their body and tail until they come near it, see lazy.py
+
+FPS = 60  #frames drawn per second
+
+TICK_RATE = 60  #simulation ticks per second, independent of FPS
+MAX_CATCH_UP_TICKS = 5  #most ticks run in one frame before the simulation gives up on catching up
+TIME_SCALE = 1  #simulated seconds per real second
+INTERPOLATE = True  #draw fish between their last two ticks, so movement looks smooth when FPS and TICK_RATE differ
+
+#tick the school on its own thread while the last frame is drawn, see pipeline.py
+#NOTE: frames are drawn with render.py, so this implies USE_BATCH_RENDER, and a recording gets one frame per drawn frame
+PIPELINE = False
+
+RELOAD_KEY = pygame.K_r  #reload any fish config files that have changed
+PROFILE_KEY = pygame.K_F3  #time each part of the update and draw, and show the times on screen
+CPROFILE_KEY = pygame.K_F4  #record every function call for the next CPROFILE_FRAMES frames
+SPAWN_KEY = pygame.K_EQUALS  #add SPAWN_STEP fish, up to MAX_FISH
+DESPAWN_KEY = pygame.K_MINUS  #remove SPAWN_STEP fish
+
+#mouse button -> the agent a click places, see agents.py
+AGENT_BUTTONS = {1: agents.ATTRACTOR, 2: agents.PREDATOR, 3: agents.OBSTACLE}
+
+CPROFILE_FRAMES = 300
+CPROFILE_FILENAME = "fish.prof"
 
 NUM_FISH = 80  #excluding the player
+#every fish that could be spawned is made at the start, so spawning later is cheap
+#None makes only the NUM_FISH fish, so raise it (e.g. to NUM_FISH + 10 * SPAWN_STEP) to be able to spawn more
+MAX_FISH = None
+SPAWN_STEP = 10
+
+USE_FLOCK_ENGINE = False  #use the numpy engine in flock.py instead of a Boid object per fish
+USE_CHAIN_SOLVER = False  #solve every body and tail chain at once with chain.py
+
+VERLET_SKIN = None  #set to e.g. 10 to keep neighbour candidates between ticks, rebuilt once a fish has moved half the skin
+
+NUM_WORKERS = 0  #run the school in this many worker processes, 0 to run it in this process
 
+USE_BATCH_RENDER = False  #draw the school from bulk vertex arrays with render.py
+USE_LOD = False  #draw small or crowded fish with less detail, see lod.py
+SPRITE_ANGLE_STEPS = None  #set to e.g. 64 to blit fins, heads and eyes from sprites drawn at that many angles, see sprites.py
 
-pygame.init()
-window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+SEED = None  #set to an int for the same school every run
 
+RECORD_FILENAME = None  #set to a filename to record every tick, then play it back with replay.py (implies USE_FLOCK_ENGINE and USE_CHAIN_SOLVER)
 
-def update(player_fish, non_player_fish):
-    player_fish.update()
-    fish.update_all_non_player_fish(non_player_fish)
+OBSTACLES_FILENAME = None  #set to a json file of rocks and reef for the school to swim around, e.g. "reef.json"
 
+BOUNDS_POLICY = None  #None, "clamp", "wrap" or "reflect" - what happens to fish that leave the world
 
-def draw(player_fish, non_player_fish):
+
+def update(sim, recorder):
+    sim.update()
+
+    if recorder is not None:
+        recorder.record(sim)
+
+
+def update_camera(sim):
+    if sim.camera is None:
+        return
+
+    if CAMERA_FOLLOW_PLAYER:
+        head_pos = sim.player_fish.head_point.pos
+        sim.camera.follow(head_pos.x, head_pos.y)
+    else:
+        keys = pygame.key.get_pressed()
+        dx = (keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]) * camera.PAN_SPEED
+        dy = (keys[pygame.K_DOWN] - keys[pygame.K_UP]) * camera.PAN_SPEED
+
+        sim.camera.pan(dx, dy)
+
+
+def draw(window, sim, profiler, alpha, frame=None):
+    #frame is from Simulation.get_frame, when the school is being ticked while it is drawn
     window.fill((0, 0, 0))
 
-    for i in non_player_fish:
-        i.draw()
+    if frame is None:
+        sim.draw(alpha)
+    else:
+        sim.draw_frame(frame)
 
-    player_fish.draw()
+    profiler.draw_overlay(window)
 
     pygame.display.update()
 
+    profiler.end_frame()
+
+
+def handle_key(sim, profiler, key):
+    if key == RELOAD_KEY:
+        sim.reload_species()
+    elif key == PROFILE_KEY:
+        profiler.toggle()
+    elif key == CPROFILE_KEY and profiler.cprofile is None:
+        profiler.start_cprofile(CPROFILE_FRAMES, CPROFILE_FILENAME)
+    elif key == SPAWN_KEY:
+        sim.set_num_fish(min(len(sim.non_player_fish) + SPAWN_STEP, len(sim.fish_pool.slots)))
+    elif key == DESPAWN_KEY:
+        sim.set_num_fish(max(len(sim.non_player_fish) - SPAWN_STEP, 0))
+
+
+def handle_click(sim, button, pos):
+    if sim.camera is not None:
+        pos = sim.camera.screen_to_world(*pos)
+
+    if button in AGENT_BUTTONS:
+        sim.agents.add_agent(pos[0], pos[1], AGENT_BUTTONS[button])
+
+
+def handle_events(sim, profiler, recorder, sim_pipeline):
+    for e in pygame.event.get():
+        if e.type == pygame.QUIT:
+            if sim_pipeline is not None:
+                sim_pipeline.close()
+
+            if recorder is not None:
+                recorder.close()
+
+            sim.close()
+            quit()
+        elif e.type == pygame.KEYDOWN:
+            handle_key(sim, profiler, e.key)
+        elif e.type == pygame.MOUSEBUTTONDOWN:
+            handle_click(sim, e.button, e.pos)
+        elif e.type == pygame.MOUSEWHEEL and sim.camera is not None:
+            sim.camera.zoom_at(camera.ZOOM_STEP**e.y, *pygame.mouse.get_pos())
+
+
+def run_pipelined_frame(window, sim, sim_pipeline, profiler, recorder, num_ticks, alpha):
+    #the school finishes the ticks it was handed last frame before anything else touches the simulation
+    if sim_pipeline.wait() > 0 and recorder is not None:
+        recorder.record(sim)
+
+    handle_events(sim, profiler, recorder, sim_pipeline)
+
+    #the player moves now, with the mouse as it is now, and the school catches up while the frame is drawn
+    sim_pipeline.update_player(num_ticks)
+    update_camera(sim)
+
+    frame = sim_pipeline.get_frame(alpha)
+    sim_pipeline.start(num_ticks)
+
+    draw(window, sim, profiler, alpha, frame)
+
 
 def main():
-    player_fish = fish.PlayerFish(window, vector.Vec2(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-    non_player_fish = fish.create_non_player_fish(window, NUM_FISH, player_fish)
+    pygame.init()
+    window = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    #a recording is copied from the arrays of the batched engines every tick
+    recording_on = RECORD_FILENAME is not None
+    sim = simulation.Simulation(
+        WORLD_WIDTH,
+        WORLD_HEIGHT,
+        NUM_FISH,
+        window,
+        use_flock_engine=USE_FLOCK_ENGINE or recording_on,
+        use_chain_solver=USE_CHAIN_SOLVER or recording_on,
+        follow_mouse=True,
+        bounds_policy=BOUNDS_POLICY,
+        num_workers=NUM_WORKERS,
+        use_batch_render=USE_BATCH_RENDER or PIPELINE,
+        use_lod=USE_LOD,
+        seed=SEED,
+        interpolate=INTERPOLATE,
+        obstacles_filename=OBSTACLES_FILENAME,
+        verlet_skin=VERLET_SKIN,
+        max_fish=MAX_FISH,
+        use_camera=USE_CAMERA,
+        lazy_chains=LAZY_CHAINS,
+        sprite_angle_steps=SPRITE_ANGLE_STEPS,
+    )
+
+    sim_pipeline = None
+    if PIPELINE:
+        sim_pipeline = pipeline.Pipeline(sim)
+
+    profiler = profiling.Profiler()
+
+    recorder = None
+    if RECORD_FILENAME is not None:
+        recorder = recording.Recorder(RECORD_FILENAME, sim)
+
+    fixed_timestep = timestep.FixedTimestep(TICK_RATE, MAX_CATCH_UP_TICKS, TIME_SCALE)
 
     clock = pygame.time.Clock()
     while True:
-        clock.tick(FPS)
+        frame_seconds = clock.tick(FPS) / 1000
+
+        num_ticks = fixed_timestep.advance(frame_seconds)
+        alpha = fixed_timestep.get_alpha() if INTERPOLATE else 1
+
+        if sim_pipeline is not None:
+            run_pipelined_frame(window, sim, sim_pipeline, profiler, recorder, num_ticks, alpha)
+            continue
+
+        for _ in range(num_ticks):
+            update(sim, recorder)
 
-        update(player_fish, non_player_fish)
-        draw(player_fish, non_player_fish)
+        update_camera(sim)
+        draw(window, sim, profiler, alpha)
 
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                quit()
+        handle_events(sim, profiler, recorder, sim_pipeline)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+import math
+import numpy as np
+import pygame
+from json import loads
+
+
+CELL_SIZE = 4  #distance between samples of the field, smaller is more accurate around sharp corners but slower to build
+MAX_SAMPLES = 2**20  #most samples kept around the obstacles, past this the samples are spread further apart than CELL_SIZE
+
+AVOID_DIST_RATIO = 0.1  #boids closer than this fraction of the smaller world dimension to an obstacle steer away from it
+WALL_DIST_RATIO = 0.1  #boids closer than this fraction of the world width (or height) to a side (or the top or bottom) steer away from it
+AVOID_CONST = 1
+
+EPSILON = 0.001
+
+COLOUR = (70, 70, 90)
+
+
+def read_file(filename):
+    with open(filename, "r") as file:
+        data = file.read()
+
+    return data
+
+
+def get_segment_dist(x, y, start, end):
+    #distance from every (x, y) to the line segment from start to end
+    seg_x = end[0] - start[0]
+    seg_y = end[1] - start[1]
+    seg_len_sq = max(seg_x * seg_x + seg_y * seg_y, EPSILON)
+
+    t = np.clip(((x - start[0]) * seg_x + (y - start[1]) * seg_y) / seg_len_sq, 0, 1)
+
+    return np.hypot(x - start[0] - t * seg_x, y - start[1] - t * seg_y)
+
+
+def get_polygon_dist(x, y, points):
+    #signed distance from every (x, y) to a polygon, negative inside
+    dist = np.full(x.shape, np.inf)
+    inside = np.zeros(x.shape, dtype=bool)
+
+    for start, end in zip(points, points[1:] + points[:1]):
+        dist = np.minimum(dist, get_segment_dist(x, y, start, end))
+
+        #even-odd rule: count the edges crossed by a ray going right from the point
+        if start[1] != end[1]:
+            crosses_y = (start[1] > y) != (end[1] > y)
+            cross_x = start[0] + (y - start[1]) * (end[0] - start[0]) / (end[1] - start[1])
+            inside ^= crosses_y & (x < cross_x)
+
+    return np.where(inside, -dist, dist)
+
+
+class ObstacleField:
+    #static obstacles rasterised once into a signed distance grid, so steering around them costs the same however many there are
+    #distances are positive in open water and negative inside an obstacle
+    #the walls are not in the grid: they push on each axis separately as in the original Boid.avoid_walls, with the push from the nearest obstacle added on
+    #so only the space the obstacles can push boids in is sampled
+
+    def __init__(self, world_width, world_height, walls=True, cell_size=CELL_SIZE):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.walls = walls  #the edge of the world is an obstacle too
+        self.min_cell_size = cell_size
+
+        self.avoid_dist = min(world_width, world_height) * AVOID_DIST_RATIO
+        self.wall_dist_x = world_width * WALL_DIST_RATIO
+        self.wall_dist_y = world_height * WALL_DIST_RATIO
+
+        self.circles = []  #(x, y, radius)
+        self.polygons = []  #lists of (x, y)
+
+        #set by build - samples at every multiple of cell_size from (origin_x, origin_y), or no field when there are no obstacles
+        self.cell_size = cell_size
+        self.origin_x = 0
+        self.origin_y = 0
+        self.num_x = 0
+        self.num_y = 0
+        self.field = None  #(num_y, num_x, 3) of the distance and its x and y gradient at each sample
+        self.near = None
+
+        #plain list copies for per boid queries from python code, made the first time they are needed
+        self.lists = None
+
+        self.build()
+
+    def add_circle(self, x, y, radius):
+        #call build once every obstacle has been added
+        self.circles.append((x, y, radius))
+
+    def add_polygon(self, points):
+        #call build once every obstacle has been added
+        self.polygons.append([tuple(i) for i in points])
+
+    def get_obstacle_bounds(self):
+        #the box around every obstacle, grown by the distance they push boids from, and cut down to the world
+        xs = [x - radius for x, _, radius in self.circles] + [x + radius for x, _, radius in self.circles]
+        ys = [y - radius for _, y, radius in self.circles] + [y + radius for _, y, radius in self.circles]
+        for points in self.polygons:
+            xs += [x for x, _ in points]
+            ys += [y for _, y in points]
+
+        min_x = max(min(xs) - self.avoid_dist, 0)
+        min_y = max(min(ys) - self.avoid_dist, 0)
+        max_x = min(max(xs) + self.avoid_dist, self.world_width)
+        max_y = min(max(ys) + self.avoid_dist, self.world_height)
+
+        return min_x, min_y, max_x, max_y
+
+    def build(self):
+        self.field = None
+        self.near = None
+        self.lists = None
+
+        if len(self.circles) == 0 and len(self.polygons) == 0:
+            return
+
+        min_x, min_y, max_x, max_y = self.get_obstacle_bounds()
+        if min_x >= max_x or min_y >= max_y:
+            return
+
+        #obstacles spread over a big world are sampled more coarsely, so the field never takes more than MAX_SAMPLES
+        width = max_x - min_x
+        height = max_y - min_y
+        self.cell_size = max(self.min_cell_size, math.sqrt(width * height / MAX_SAMPLES))
+
+        self.origin_x = min_x
+        self.origin_y = min_y
+        self.num_x = math.ceil(width / self.cell_size) + 1
+        self.num_y = math.ceil(height / self.cell_size) + 1
+
+        y, x = np.mgrid[:self.num_y, :self.num_x] * float(self.cell_size)
+        x += self.origin_x
+        y += self.origin_y
+
+        dist = np.full(x.shape, np.inf)
+
+        for circle_x, circle_y, radius in self.circles:
+            dist = np.minimum(dist, np.hypot(x - circle_x, y - circle_y) - radius)
+
+        for points in self.polygons:
+            dist = np.minimum(dist, get_polygon_dist(x, y, points))
+
+        #an empty field is open water everywhere
+        dist = np.minimum(dist, 2 * self.avoid_dist)
+
+        grad_y, grad_x = np.gradient(dist, self.cell_size)
+        self.field = np.stack([dist, grad_x, grad_y], axis=-1)
+
+        #a cell whose corners are all far from obstacles can be skipped, as the interpolated distance is never below its corners
+        corners = np.minimum(np.minimum(dist[:-1, :-1], dist[:-1, 1:]), np.minimum(dist[1:, :-1], dist[1:, 1:]))
+        self.near = corners < self.avoid_dist
+
+    def get_lists(self):
+        #dist, grad_x, grad_y and near as nested lists, for get_acc
+        if self.lists is None:
+            self.lists = [self.field[:, :, 0].tolist(), self.field[:, :, 1].tolist(), self.field[:, :, 2].tolist(), self.near.tolist()]
+
+        return self.lists
+
+    def get_wall_acc(self, x, y):
+        #push away from the side and the top or bottom the boid is near, added together
+        acc_x = 0
+        dist_left = max(x, EPSILON)
+        dist_right = max(self.world_width - x, EPSILON)
+        if dist_left < self.wall_dist_x:
+            acc_x = AVOID_CONST / dist_left
+        elif dist_right < self.wall_dist_x:
+            acc_x = -AVOID_CONST / dist_right
+
+        acc_y = 0
+        dist_up = max(y, EPSILON)
+        dist_down = max(self.world_height - y, EPSILON)
+        if dist_up < self.wall_dist_y:
+            acc_y = AVOID_CONST / dist_up
+        elif dist_down < self.wall_dist_y:
+            acc_y = -AVOID_CONST / dist_down
+
+        return acc_x, acc_y
+
+    def get_wall_accs(self, positions):
+        #array version of get_wall_acc, for an (n, 2) array of boid positions
+        acc = np.zeros_like(positions)
+
+        for axis, wall_dist, size in ((0, self.wall_dist_x, self.world_width), (1, self.wall_dist_y, self.world_height)):
+            dist_low = np.maximum(positions[:, axis], EPSILON)
+            dist_high = np.maximum(size - positions[:, axis], EPSILON)
+
+            near_high = dist_high < wall_dist
+            acc[near_high, axis] = -AVOID_CONST / dist_high[near_high]
+
+            near_low = dist_low < wall_dist
+            acc[near_low, axis] = AVOID_CONST / dist_low[near_low]
+
+        return acc
+
+    def get_cell(self, x, y):
+        #cell of the field containing (x, y) and how far across it the point is, or None when (x, y) is outside the field
+        #points outside the world are clamped onto its edge first
+        fx = (min(max(x, 0), self.world_width) - self.origin_x) / self.cell_size
+        fy = (min(max(y, 0), self.world_height) - self.origin_y) / self.cell_size
+        if not (0 <= fx <= self.num_x - 1 and 0 <= fy <= self.num_y - 1):
+            return None
+
+        cell_x = min(int(fx), self.num_x - 2)
+        cell_y = min(int(fy), self.num_y - 2)
+
+        return cell_x, cell_y, fx - cell_x, fy - cell_y
+
+    def get_field_dist(self, x, y):
+        #interpolated distance to the nearest obstacle and its gradient, or None when no obstacle is near (x, y)
+        if self.field is None:
+            return None
+
+        cell = self.get_cell(x, y)
+        if cell is None:
+            return None
+
+        cell_x, cell_y, tx, ty = cell
+        dist_list, grad_x_list, grad_y_list, near_list = self.get_lists()
+        if not near_list[cell_y][cell_x]:
+            return None
+
+        w00 = (1 - tx) * (1 - ty)
+        w10 = tx * (1 - ty)
+        w01 = (1 - tx) * ty
+        w11 = tx * ty
+
+        values = []
+        for grid in (dist_list, grad_x_list, grad_y_list):
+            row = grid[cell_y]
+            next_row = grid[cell_y + 1]
+            values.append(row[cell_x] * w00 + row[cell_x + 1] * w10 + next_row[cell_x] * w01 + next_row[cell_x + 1] * w11)
+
+        return values
+
+    def get_acc(self, x, y, acc):
+        #push away from the walls and the nearest obstacle on a boid at (x, y), written into the vector acc
+        acc_x, acc_y = 0, 0
+        if self.walls:
+            acc_x, acc_y = self.get_wall_acc(x, y)
+
+        field_dist = self.get_field_dist(x, y)
+        if field_dist is not None and field_dist[0] < self.avoid_dist:
+            dist, grad_x, grad_y = field_dist
+
+            grad_mag = max(math.sqrt(grad_x * grad_x + grad_y * grad_y), EPSILON)
+            mult = AVOID_CONST / (max(dist, EPSILON) * grad_mag)
+
+            acc_x += grad_x * mult
+            acc_y += grad_y * mult
+
+        return acc.set(acc_x, acc_y)
+
+    def get_field_dists(self, positions):
+        #array version of get_field_dist, giving the rows of positions near an obstacle with their (n,) distances and (n, 2) gradients
+        if self.field is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros((0, 2))
+
+        fx = (np.clip(positions[:, 0], 0, self.world_width) - self.origin_x) / self.cell_size
+        fy = (np.clip(positions[:, 1], 0, self.world_height) - self.origin_y) / self.cell_size
+
+        inside = np.nonzero((fx >= 0) & (fx <= self.num_x - 1) & (fy >= 0) & (fy <= self.num_y - 1))[0]
+        cell_x = np.minimum(fx[inside].astype(np.int64), self.num_x - 2)
+        cell_y = np.minimum(fy[inside].astype(np.int64), self.num_y - 2)
+
+        near = np.nonzero(self.near[cell_y, cell_x])[0]
+
+        rows = inside[near]
+        cell_x = cell_x[near]
+        cell_y = cell_y[near]
+        tx = (fx[rows] - cell_x)[:, None]
+        ty = (fy[rows] - cell_y)[:, None]
+
+        field = self.field
+        values = (field[cell_y, cell_x] * (1 - tx) * (1 - ty) + field[cell_y, cell_x + 1] * tx * (1 - ty)
+                  + field[cell_y + 1, cell_x] * (1 - tx) * ty + field[cell_y + 1, cell_x + 1] * tx * ty)
+
+        return rows, values[:, 0], values[:, 1:]
+
+    def get_accs(self, positions):
+        #array version of get_acc, for an (n, 2) array of boid positions
+        acc = self.get_wall_accs(positions) if self.walls else np.zeros_like(positions)
+
+        rows, dist, grad = self.get_field_dists(positions)
+
+        near = dist < self.avoid_dist
+        rows = rows[near]
+        dist = dist[near]
+        grad = grad[near]
+
+        grad_mag = np.maximum(np.sqrt(np.einsum("ij,ij->i", grad, grad)), EPSILON)
+        mult = AVOID_CONST / (np.maximum(dist, EPSILON) * grad_mag)
+
+        acc[rows] += grad * mult[:, None]
+
+        return acc
+
+    def draw(self, window, origin=(0, 0)):
+        #origin is the world position drawn at the top left of the window
+        origin_x, origin_y = origin
+
+        for x, y, radius in self.circles:
+            pygame.draw.circle(window, COLOUR, (int(x - origin_x), int(y - origin_y)), int(radius))
+
+        for points in self.polygons:
+            pygame.draw.polygon(window, COLOUR, [(x - origin_x, y - origin_y) for x, y in points])
+
+
+def load_obstacles(filename, world_width, world_height):
+    #the file has a list of "circles", each {"pos": [x, y], "radius": r}, and a list of "polygons", each a list of [x, y] points
+    config = loads(read_file(filename))
+    if not isinstance(config, dict):
+        raise ValueError(f"{filename}: expected an object with \"circles\" and \"polygons\"")
+
+    field = ObstacleField(world_width, world_height)
+
+    for circle in config.get("circles", []):
+        if not isinstance(circle, dict) or len(circle.get("pos", [])) != 2 or not isinstance(circle.get("radius"), (int, float)):
+            raise ValueError(f"{filename}: circle should be {{\"pos\": [x, y], \"radius\": r}}, got {circle}")
+
+        field.add_circle(circle["pos"][0], circle["pos"][1], circle["radius"])
+
+    for points in config.get("polygons", []):
+        if not isinstance(points, list) or len(points) < 3 or not all(isinstance(i, list) and len(i) == 2 for i in points):
+            raise ValueError(f"{filename}: polygon should be a list of at least 3 [x, y] points, got {points}")
+
+        field.add_polygon(points)
+
+    field.build()
+
+    return field
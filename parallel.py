@@ -0,0 +1,291 @@
+import chain
+import flock
+import agents
+
+import math
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+
+TILES_PER_WORKER = 4  #more tiles than workers evens out uneven densities
+MIN_TILE_CELLS = 2
+
+worker_state = {}  #filled in by init_worker in each worker process
+
+
+def create_shared_array(array):
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+
+    return shm, shared
+
+
+def attach_shared_array(name, shape, dtype):
+    shm = SharedMemory(name=name)
+
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def init_worker(specs, config):
+    #attach to every shared array and set up the engines used to run tasks
+    worker_state["shm"] = []
+    for key, (name, shape, dtype) in specs.items():
+        shm, array = attach_shared_array(name, shape, dtype)
+        worker_state["shm"].append(shm)
+        worker_state[key] = array
+
+    if "flock" in config:
+        width, height, bounds_policy, obstacle_field = config["flock"]
+        agent_field = agents.AgentField(width, height, bounds_policy)
+
+        worker_state["flock"] = flock.Flock(width, height, agent_field, bounds_policy, obstacle_field)
+
+
+def get_tile_mask(cells, start, size, num_cells, wrap, halo):
+    #cells in [start, start + size), grown by halo cells on both sides
+    if wrap:
+        if size + 2 * halo >= num_cells:
+            return np.ones(len(cells), dtype=bool)
+
+        return (cells - (start - halo)) % num_cells < size + 2 * halo
+    else:
+        return (cells >= start - halo) & (cells < start + size + halo)
+
+
+def get_axis_ranges(start, size, num_cells, wrap, halo):
+    #cells [start, start + size) along one axis grown by halo cells on both sides, as (first, end) ranges covering each cell once
+    first = start - halo
+    end = start + size + halo
+
+    if not wrap:
+        first = max(first, 0)
+        end = min(end, num_cells)
+
+        return [(first, end)] if first < end else []
+
+    if end - first >= num_cells:
+        return [(0, num_cells)]
+    elif first < 0:
+        return [(first + num_cells, num_cells), (0, end)]
+    elif end > num_cells:
+        return [(first, num_cells), (0, end - num_cells)]
+    else:
+        return [(first, end)]
+
+
+def get_tile_ranges(grid, tile_x, tile_y, tile_cells, halo):
+    #(start, end) ranges of grid.order holding the boids in a tile grown by halo cells
+    #cells are numbered down each column, so every column of the tile is one range for each run of rows
+    ranges = [np.zeros((0, 2), dtype=np.int64)]
+
+    for first_x, end_x in get_axis_ranges(tile_x * tile_cells, tile_cells, grid.num_cells_x, grid.wrap, halo):
+        columns = np.arange(first_x, end_x) * grid.num_cells_y
+
+        for first_y, end_y in get_axis_ranges(tile_y * tile_cells, tile_cells, grid.num_cells_y, grid.wrap, halo):
+            first_cells = columns + first_y
+            last_cells = columns + end_y - 1
+
+            starts = grid.cell_starts[first_cells]
+            ends = grid.cell_starts[last_cells] + grid.cell_counts[last_cells]
+            ranges.append(np.stack([starts, ends], axis=1))
+
+    return np.concatenate(ranges)
+
+
+def update_tile_vels(task):
+    #new velocities for the boids owned by one tile, using the tile and a one cell halo around it
+    #ranges are the parts of the shared cell order holding the tile and its halo, so only those boids are looked at
+    tile_x, tile_y, tile_cells, ranges, agent_pos, agent_types, current, num_active = task
+
+    local = worker_state["flock"]
+    grid = local.grid
+    order = worker_state["flock_order"][:num_active]
+    pos = worker_state["flock_pos"][:num_active]
+    vel = worker_state[f"flock_vel_{current}"][:num_active]
+    new_vel = worker_state[f"flock_vel_{1 - current}"][:num_active]
+
+    #every cell lists its boids in global order, the same as a single process would
+    subset = np.concatenate([order[start:end] for start, end in ranges.tolist()])
+    local.pos = pos[subset]
+    local.vel = vel[subset]
+
+    cell_x, cell_y = grid.get_cell_coords(local.pos)
+    owned = get_tile_mask(cell_x, tile_x * tile_cells, tile_cells, grid.num_cells_x, grid.wrap, 0)
+    owned &= get_tile_mask(cell_y, tile_y * tile_cells, tile_cells, grid.num_cells_y, grid.wrap, 0)
+
+    local.grid.rebuild(local.pos)
+    local.agent_field.set_agents(agent_pos, agent_types)
+
+    query = np.nonzero(owned)[0]
+    new_vel[subset[query]] = local.get_new_vels(query)
+
+
+def update_chain_range(task):
+    start, end, wrap_size = task
+
+    solver = chain.ChainSolver(wrap_size)
+    solver.use_arrays(worker_state["chain_points"][start:end], worker_state["chain_link_lengths"][start:end], worker_state["chain_joint_angles"][start:end])
+    solver.update(worker_state["chain_head_pos"][start:end])
+
+
+def split_range(num_items, num_parts):
+    bounds = [num_items * i // num_parts for i in range(num_parts + 1)]
+
+    return [(bounds[i], bounds[i + 1]) for i in range(num_parts) if bounds[i] < bounds[i + 1]]
+
+
+class WorkerPool:
+    #process pool plus the shared memory blocks its workers attach to
+
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.num_tasks = num_workers * TILES_PER_WORKER
+
+        self.shared = {}  #key -> (SharedMemory, array)
+        self.config = {}
+
+        self.pool = None  #started on first use, once every shared array exists
+
+    def share(self, key, array):
+        #returns a copy of the array in shared memory
+        shm, shared = create_shared_array(np.ascontiguousarray(array))
+        self.shared[key] = (shm, shared)
+
+        return shared
+
+    def start(self):
+        specs = {key: (shm.name, array.shape, array.dtype) for key, (shm, array) in self.shared.items()}
+        self.pool = Pool(self.num_workers, initializer=init_worker, initargs=(specs, self.config))
+
+    def map(self, func, tasks):
+        if self.pool is None:
+            self.start()
+
+        self.pool.map(func, tasks, chunksize=1)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+        for shm, _ in self.shared.values():
+            shm.close()
+            shm.unlink()
+
+        self.shared = {}
+
+
+class ParallelFlock(flock.Flock):
+    #flock.Flock with velocity updates split into spatial tiles and run in a worker pool
+
+    def __init__(self, world_width, world_height, agent_field, worker_pool, bounds_policy=None, obstacle_field=None):
+        super().__init__(world_width, world_height, agent_field, bounds_policy, obstacle_field)
+
+        #the obstacles never change, so each worker is given its own copy once
+        self.worker_pool = worker_pool
+        self.worker_pool.config["flock"] = (world_width, world_height, bounds_policy, self.obstacle_field)
+
+        self.vel_buffers = []
+        self.current = 0
+
+        #the main grid's order, so the workers can find the boids in their tiles without looking at every boid
+        self.all_order = np.zeros(0, dtype=np.int64)
+
+        self.tile_cells = 0
+        self.tiles = []
+
+    def get_tiles(self):
+        #square blocks of cells, sized to give a few tiles per worker
+        cells_per_tile = self.grid.num_cells / self.worker_pool.num_tasks
+        tile_cells = max(MIN_TILE_CELLS, int(math.sqrt(cells_per_tile)))
+
+        tiles_x = math.ceil(self.grid.num_cells_x / tile_cells)
+        tiles_y = math.ceil(self.grid.num_cells_y / tile_cells)
+
+        return tile_cells, [(x, y) for x in range(tiles_x) for y in range(tiles_y)]
+
+    def init_arrays(self):
+        super().init_arrays()
+
+        #every slot is shared, and the number in use is sent with each task
+        self.all_pos = self.worker_pool.share("flock_pos", self.all_pos)
+        self.vel_buffers = [self.worker_pool.share("flock_vel_0", self.all_vel), self.worker_pool.share("flock_vel_1", self.all_vel)]
+        self.all_vel = self.vel_buffers[0]
+        self.all_new_vel = self.vel_buffers[1]
+        self.all_order = self.worker_pool.share("flock_order", np.zeros(len(self.all_pos), dtype=np.int64))
+        self.set_views()
+
+        self.tile_cells, self.tiles = self.get_tiles()
+
+    def rebuild_grid(self):
+        #the workers are always used with the chain solver, which takes the heads straight from pos, so no pos_list is kept
+        self.grid.rebuild(self.pos)
+
+    def update_new_vel(self):
+        #the boids were sorted into cells when the grid was last rebuilt, so each tile is sent the parts of that order it covers
+        self.all_order[:self.num_active] = self.grid.order
+
+        #the agents are few, so are sent with every task rather than kept in shared memory
+        agent_pos = self.agent_field.pos
+        agent_types = self.agent_field.types
+
+        tasks = []
+        for x, y in self.tiles:
+            owned = get_tile_ranges(self.grid, x, y, self.tile_cells, 0)
+            if np.sum(owned[:, 1] - owned[:, 0]) == 0:
+                continue
+
+            ranges = get_tile_ranges(self.grid, x, y, self.tile_cells, 1)
+            tasks.append((x, y, self.tile_cells, ranges, agent_pos, agent_types, self.current, self.num_active))
+
+        self.worker_pool.map(update_tile_vels, tasks)
+
+    def update(self):
+        #swap the double buffer, so the new velocities become the current ones
+        self.current = 1 - self.current
+        self.all_vel = self.vel_buffers[self.current]
+        self.all_new_vel = self.vel_buffers[1 - self.current]
+        self.set_views()
+
+        self.pos += self.vel
+        self.grid.enforce_bounds(self.pos, self.vel)
+
+        #this is the only grid covering every boid, the workers only sort the boids in their own tiles
+        self.rebuild_grid()
+
+
+class ParallelChainSolver(chain.ChainSolver):
+    #chain.ChainSolver with the fish split into ranges and solved in a worker pool
+
+    def __init__(self, worker_pool, wrap_size=None):
+        super().__init__(wrap_size)
+
+        self.worker_pool = worker_pool
+        self.all_head_pos = np.zeros((0, 2))
+        self.head_pos = self.all_head_pos
+        self.ranges = []
+
+    def init_arrays(self):
+        super().init_arrays()
+
+        points = self.worker_pool.share("chain_points", self.all_points)
+        link_lengths = self.worker_pool.share("chain_link_lengths", self.all_link_lengths)
+        joint_angles = self.worker_pool.share("chain_joint_angles", self.all_joint_angles)
+        self.use_arrays(points, link_lengths, joint_angles)
+
+        self.all_head_pos = self.worker_pool.share("chain_head_pos", self.all_points[:, 0])
+        self.set_active_fish(self.all_fish)
+
+    def set_active_fish(self, all_fish):
+        super().set_active_fish(all_fish)
+
+        self.head_pos = self.all_head_pos[:len(all_fish)]
+        self.ranges = split_range(len(all_fish), self.worker_pool.num_tasks)
+
+    def update(self, head_pos):
+        self.head_pos[:] = head_pos
+
+        self.worker_pool.map(update_chain_range, [(start, end, self.wrap_size) for start, end in self.ranges])
\ No newline at end of file
@@ -0,0 +1,121 @@
+import snapshot
+
+import time
+import queue
+import threading
+
+
+class Pipeline:
+    #ticks the school on a thread of its own, so the next ticks are worked out while the last frame is being drawn
+    #the school only ever runs between start and wait, and everything else (events, the camera, the player fish and drawing)
+    #is done on the calling thread outside of that, so the only thing shared is the frame, which is a copy
+    #the player fish is moved on the calling thread right before each frame is drawn, so it follows the mouse with no added lag
+    #the school only sees the player as a predator in the agent field, so the agent positions after each player tick are kept
+    #and the school thread puts them back one tick at a time, reacting to the player where it was on that tick as Simulation.update does
+    #what is left different is that the camera (and so which fish lazy chains keep awake) has already moved for the frame
+
+    def __init__(self, sim):
+        if sim.renderer is None:
+            raise ValueError("A pipelined simulation draws the school from frames, so needs the batch renderer")
+
+        self.sim = sim
+
+        #one batch of ticks is handed over at a time, so the frame drawn is never more than one frame behind the school
+        self.jobs = queue.Queue(maxsize=1)  #ticks to run, or None to stop the thread
+        self.done = queue.Queue(maxsize=1)  #None once the ticks have run, or the exception they raised
+        self.num_running = 0  #ticks handed over and not yet waited for
+
+        self.previous_player_points = None  #where the player fish was before its last tick, for interpolation
+        self.agent_positions = []  #copy of the agent positions after each tick of the last update_player
+
+        #counters for seeing which of the school and drawing holds the other up
+        self.num_waits = 0
+        self.wait_time = 0
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            agent_positions = self.jobs.get()
+            if agent_positions is None:
+                return
+
+            error = None
+            try:
+                self.update_school(agent_positions)
+            except Exception as e:
+                error = e
+
+            self.done.put(error)
+
+    def update_school(self, agent_positions):
+        sim = self.sim
+
+        for agent_pos in agent_positions:
+            #the player fish may be being drawn, so it is not read here
+            if sim.interpolate:
+                sim.previous_points = (self.previous_player_points, sim.get_school_points(sim.awake_fish))
+                sim.previous_inxs = sim.awake_fish
+
+            #the agents as they were after the player's part of this tick, which leaves them as they are now after the last one
+            sim.agents.pos = agent_pos
+            sim.agents.rebuild()
+
+            sim.update_school()
+
+    def update_player(self, num_ticks):
+        #to be called between wait and start, with the same num_ticks as the following start
+        sim = self.sim
+        self.agent_positions = []
+
+        for i in range(num_ticks):
+            if sim.interpolate:
+                self.previous_player_points = snapshot.get_fish_points([sim.player_fish])
+
+            sim.update_player(sim.tick + i)
+            self.agent_positions.append(sim.agents.pos.copy())
+
+    def start(self, num_ticks):
+        #runs the school's part of num_ticks ticks in the background, after the player has done its part with update_player
+        #a frame with no ticks has nothing to hand over
+        if num_ticks == 0:
+            return
+
+        self.num_running = num_ticks
+        self.jobs.put(self.agent_positions)
+
+    def wait(self):
+        #waits for the ticks from the last start to finish, returning how many there were
+        #the simulation can be changed freely from when this returns until the next start
+        if self.num_running == 0:
+            return 0
+
+        start = time.perf_counter()
+        error = self.done.get()
+        self.wait_time += time.perf_counter() - start
+        self.num_waits += 1
+
+        num_ticks = self.num_running
+        self.num_running = 0
+
+        if error is not None:
+            raise error
+
+        return num_ticks
+
+    def get_frame(self, alpha=1):
+        #to be called between wait and start, see Simulation.get_frame
+        return self.sim.get_frame(alpha, self.previous_player_points)
+
+    def close(self):
+        self.wait()
+
+        self.jobs.put(None)
+        self.thread.join()
+
+    def get_stats(self):
+        return {
+            "waits": self.num_waits,
+            "mean_wait_seconds": self.wait_time / max(self.num_waits, 1),
+        }
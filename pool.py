@@ -0,0 +1,131 @@
+import boid
+import vector
+
+import random
+import numpy as np
+
+
+class FishPool:
+    #every non player fish is made up front, so spawning and despawning only move fish between used and free slots
+    #the active fish are always the first num_active slots, so each engine only has to work on the start of its arrays
+
+    def __init__(self, slots, school_flock=None, school_chains=None, lazy_chains=None):
+        self.slots = slots  #fish.NonPlayerFish, made by fish.create_non_player_fish
+        self.school_flock = school_flock
+        self.school_chains = school_chains
+        self.lazy_chains = lazy_chains  #lazy.LazyChains, which keeps state for each slot too
+
+        #without the flock engine, every Boid shares one list of the boids in the grid
+        self.grid_boids = None
+        if self.school_flock is None and len(slots) > 0:
+            self.grid_boids = slots[0].boid.grid_boids
+
+        for inx, i in enumerate(self.slots):
+            i.slot_inx = inx
+
+        self.num_active = len(slots)
+        self.active = list(slots)
+
+    def get_num_free(self):
+        return len(self.slots) - self.num_active
+
+    def set_num_active(self, num):
+        #the grid is rebuilt once here, however many fish were added or removed
+        self.num_active = num
+        self.active = self.slots[:num]
+
+        if self.school_flock is not None:
+            self.school_flock.set_num_active(num)
+        elif self.grid_boids is not None:
+            self.grid_boids[:] = [i.boid for i in self.active]
+
+            #the grid is left alone with no boids, and rebuilt by the next spawn
+            if num > 0:
+                boid.rebuild_grid(self.grid_boids[0].grid, self.grid_boids, self.grid_boids[0].verlet)
+
+        if self.school_chains is not None:
+            self.school_chains.set_active_fish(self.active)
+
+    def swap_slots(self, a, b):
+        #swaps the fish in the slots of lists a and b, along with their rows in the engines
+        if len(a) == 0:
+            return
+
+        for i, j in zip(a, b):
+            self.slots[i], self.slots[j] = self.slots[j], self.slots[i]
+
+        for inx in a + b:
+            fish_obj = self.slots[inx]
+            fish_obj.slot_inx = inx
+
+            if fish_obj.boid is not None:
+                fish_obj.boid.grid_inx = inx
+            else:
+                fish_obj.flock_inx = inx
+
+        if self.school_flock is not None:
+            self.school_flock.swap_slots(np.array(a), np.array(b))
+
+        if self.school_chains is not None:
+            self.school_chains.swap_slots(np.array(a), np.array(b))
+
+        if self.lazy_chains is not None:
+            self.lazy_chains.swap_slots(np.array(a), np.array(b))
+
+    def spawn(self, positions, rng=None):
+        #starts a fish at each (x, y) in positions, heading in a random direction, and returns them
+        if rng is None:
+            rng = random
+
+        num = len(positions)
+        if num > self.get_num_free():
+            raise ValueError(f"Cannot spawn {num} fish with only {self.get_num_free()} free slots")
+
+        inxs = list(range(self.num_active, self.num_active + num))
+        vels = [vector.rand_vec(-1, 1, rng) for _ in range(num)]
+
+        for inx, (x, y), vel in zip(inxs, positions, vels):
+            fish_obj = self.slots[inx]
+            pos = vector.Vec2(x, y)
+
+            if fish_obj.boid is not None:
+                fish_obj.boid.pos.set_vec(pos)
+                fish_obj.boid.vel.set_vec(vel)
+                fish_obj.boid.new_vel.set_vec(vel)
+
+            #the chain solver lays out its own rows, and its fish objects are synced from them
+            if self.school_chains is None:
+                fish_obj.reset(pos, vel)
+            else:
+                fish_obj.head_point.pos.set_vec(pos)
+
+        pos_array = np.array(positions, dtype=float).reshape(-1, 2)
+        vel_array = np.array([(i.x, i.y) for i in vels], dtype=float).reshape(-1, 2)
+
+        if self.school_flock is not None:
+            self.school_flock.reset_slots(inxs, pos_array, vel_array)
+
+        if self.school_chains is not None:
+            self.school_chains.reset_slots(inxs, pos_array, vel_array)
+
+        if self.lazy_chains is not None:
+            self.lazy_chains.reset_slots(inxs)
+
+        self.set_num_active(self.num_active + num)
+
+        return self.slots[inxs[0] : inxs[0] + num] if num > 0 else []
+
+    def despawn(self, fish_objs):
+        #frees the slots of the given active fish, moving the last active fish into any gaps this leaves
+        remove = sorted({i.slot_inx for i in fish_objs})
+        if any(i >= self.num_active for i in remove):
+            raise ValueError("Cannot despawn a fish that is not active")
+
+        new_num = self.num_active - len(remove)
+        removed = set(remove)
+
+        holes = [i for i in remove if i < new_num]
+        fillers = [i for i in range(new_num, self.num_active) if i not in removed]
+
+        self.swap_slots(holes, fillers)
+        self.set_num_active(new_num)
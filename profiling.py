@@ -0,0 +1,207 @@
+import boid
+import fish
+import agents
+import obstacles
+import chain
+import flock
+import render
+import parallel
+import simulation
+import spatial
+import sprites
+import pipeline
+
+import time
+import cProfile
+import numpy as np
+import pygame
+from collections import deque
+
+
+ROLLING_FRAMES = 300  #frames the percentiles are taken over
+PERCENTILES = [50, 95, 99]
+
+OVERLAY_FONT_SIZE = 18
+OVERLAY_COLOUR = (255, 255, 0)
+OVERLAY_BACKGROUND = (0, 0, 0)
+
+
+def get_spans():
+    #(owner, attribute, span name) for everything that is timed while profiling is on
+    return [
+        (simulation.Simulation, "update_player", "sim.player"),
+        (simulation.Simulation, "update_boid_vels", "sim.boid_vel"),
+        (simulation.Simulation, "update_grid", "sim.grid"),
+        (simulation.Simulation, "update_chains", "sim.chains"),
+        (simulation.Simulation, "draw", "sim.draw"),
+        (simulation.Simulation, "get_frame", "sim.get_frame"),
+        (simulation.Simulation, "draw_frame", "sim.draw_frame"),
+        (pipeline.Pipeline, "wait", "pipeline.wait"),
+
+        (boid.Boid, "update_new_vel", "boid.update_new_vel"),
+        (boid.Boid, "get_neighbours", "boid.get_neighbours"),
+        (boid.Boid, "get_fused_flock_acc", "boid.fused_flock_acc"),
+        (boid, "rebuild_grid", "boid.rebuild_grid"),
+        (spatial.VerletList, "rebuild", "verlet.rebuild"),
+
+        (agents.AgentField, "rebuild", "agents.rebuild"),
+        (agents.AgentField, "get_acc", "agents.get_acc"),
+        (agents.AgentField, "get_accs", "agents.get_accs"),
+        (obstacles.ObstacleField, "get_acc", "obstacles.get_acc"),
+        (obstacles.ObstacleField, "get_accs", "obstacles.get_accs"),
+
+        (flock.Flock, "update_new_vel", "flock.update_new_vel"),
+        (flock.Flock, "flock_steering", "flock.steering"),
+        (flock.Flock, "update", "flock.update"),
+        (parallel.ParallelFlock, "update_new_vel", "parallel.update_new_vel"),
+
+        (fish.TrailPointString, "update", "fish.trail_update"),
+        (chain.ChainSolver, "update", "chain.update"),
+        (chain.ChainSolver, "sync_fish", "chain.sync_fish"),
+        (parallel.ParallelChainSolver, "update", "parallel.chain_update"),
+
+        (fish.Fish, "draw_head", "draw.head"),
+        (fish.TailFin, "draw", "draw.tail_fin"),
+        (fish.BodyFin, "draw", "draw.body_fin"),
+        (fish.TrailPointString, "draw", "draw.trail_string"),
+        (fish.DorsalFin, "draw", "draw.dorsal_fin"),
+        (fish.Eyes, "draw", "draw.eyes"),
+        (sprites.SpriteCache, "make_fin_sprite", "sprites.make_fin"),
+        (render.SchoolRenderer, "fill_vertices", "render.fill_vertices"),
+        (render.SchoolRenderer, "draw", "render.draw"),
+    ]
+
+
+class Profiler:
+    #times named spans by swapping timing wrappers in while enabled, so nothing is added when disabled
+
+    def __init__(self):
+        self.enabled = False
+        self.show_overlay = False
+
+        self.span_names = [name for _, _, name in get_spans()] + ["frame"]
+
+        self.frame_totals = {name: [0, 0] for name in self.span_names}  #name -> [seconds, calls] this frame
+        self.history = {name: deque(maxlen=ROLLING_FRAMES) for name in self.span_names}  #seconds per frame
+        self.replaced = []  #(owner, attribute, original or None if it was inherited)
+
+        self.last_frame_end = None
+
+        self.cprofile = None
+        self.cprofile_frames_left = 0
+        self.cprofile_filename = None
+
+        self.font = None
+
+    def wrap(self, func, name):
+        totals = self.frame_totals[name]
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[0] += perf_counter() - start
+                totals[1] += 1
+
+        return timed
+
+    def enable(self):
+        if self.enabled:
+            return
+
+        for owner, attribute, name in get_spans():
+            original = vars(owner).get(attribute)
+            self.replaced.append((owner, attribute, original))
+
+            setattr(owner, attribute, self.wrap(getattr(owner, attribute), name))
+
+        self.enabled = True
+        self.last_frame_end = None
+
+    def disable(self):
+        if not self.enabled:
+            return
+
+        #put everything back in reverse, so a subclass is restored after the class it inherits from
+        for owner, attribute, original in reversed(self.replaced):
+            if original is None:
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, original)
+
+        self.replaced = []
+        self.enabled = False
+
+    def toggle(self):
+        #the overlay is shown whenever profiling is on
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+        self.show_overlay = self.enabled
+
+    def start_cprofile(self, num_frames, filename):
+        #profile every function call for the next num_frames frames, then save the stats for pstats or snakeviz
+        self.cprofile = cProfile.Profile()
+        self.cprofile_frames_left = num_frames
+        self.cprofile_filename = filename
+
+        self.cprofile.enable()
+
+    def end_cprofile(self):
+        self.cprofile.disable()
+        self.cprofile.dump_stats(self.cprofile_filename)
+        self.cprofile = None
+
+        print(f"cProfile stats saved to {self.cprofile_filename}")
+
+    def end_frame(self):
+        #to be called once per frame, after drawing
+        if self.cprofile is not None:
+            self.cprofile_frames_left -= 1
+            if self.cprofile_frames_left <= 0:
+                self.end_cprofile()
+
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        if self.last_frame_end is not None:
+            self.history["frame"].append(now - self.last_frame_end)
+        self.last_frame_end = now
+
+        for name, totals in self.frame_totals.items():
+            if totals[1] > 0:
+                self.history[name].append(totals[0])
+
+            totals[0] = 0
+            totals[1] = 0
+
+    def get_stats(self):
+        #name -> percentiles of the time per frame, in milliseconds, for every span that has run recently
+        stats = {}
+        for name in self.span_names:
+            if len(self.history[name]) > 0:
+                stats[name] = np.percentile(np.array(self.history[name]) * 1000, PERCENTILES).tolist()
+
+        return stats
+
+    def draw_overlay(self, window):
+        if not self.show_overlay:
+            return
+
+        if self.font is None:
+            self.font = pygame.font.Font(None, OVERLAY_FONT_SIZE)
+
+        header = "span" + "".join(f"   p{i}" for i in PERCENTILES) + " (ms)"
+        lines = [header] + [name + "".join(f"   {i:.2f}" for i in values) for name, values in self.get_stats().items()]
+
+        y = 0
+        for line in lines:
+            text = self.font.render(line, True, OVERLAY_COLOUR, OVERLAY_BACKGROUND)
+            window.blit(text, (0, y))
+
+            y += text.get_height()
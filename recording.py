@@ -0,0 +1,129 @@
+import snapshot
+
+import os
+import numpy as np
+
+
+#a recording is a small header followed by one fixed size frame per tick, written through a memory map
+MAGIC = 0x48534946
+VERSION = 2
+
+HEADER_FIELDS = ["magic", "version", "num_frames", "num_fish", "num_points", "world_width", "world_height"]
+HEADER_SIZE = 64  #bytes, with room for more fields
+
+GROW_FRAMES = 600  #the file is grown by this many frames at a time
+
+
+def get_frame_dtype(num_fish, num_points):
+    #float32 halves the size of the file, and is still far more precise than a pixel
+    return np.dtype([
+        ("tick", np.int64),
+        ("num_active", np.int64),  #fish in use, which are the first num_active of the num_fish slots
+        ("player_points", np.float32, (num_points, 2)),
+        ("player_vel", np.float32, (2,)),
+        ("points", np.float32, (num_fish, num_points, 2)),  #head first, see chain.get_chain_points
+        ("vel", np.float32, (num_fish, 2)),
+    ])
+
+
+def open_header(filename, mode):
+    return np.memmap(filename, dtype=np.int64, mode=mode, shape=(len(HEADER_FIELDS),))
+
+
+def open_frames(filename, mode, frame_dtype, num_frames):
+    return np.memmap(filename, dtype=frame_dtype, mode=mode, offset=HEADER_SIZE, shape=(num_frames,))
+
+
+class Recorder:
+    #streams the state of a simulation into a recording, one frame per call to record
+    #the school is copied straight from the arrays of the batched engines, so recording needs both of them
+
+    def __init__(self, filename, sim):
+        if sim.school_chains is None or sim.school_flock is None:
+            raise ValueError("Recording needs the chain solver and flock engine, so the school can be copied from their arrays every tick")
+
+        self.filename = filename
+
+        self.num_fish = len(sim.fish_pool.slots)
+        self.num_points = len(snapshot.get_fish_points([sim.player_fish])[0])
+        self.frame_dtype = get_frame_dtype(self.num_fish, self.num_points)
+
+        self.num_frames = 0
+        self.capacity = 0
+        self.frames = None
+
+        with open(filename, "wb") as file:
+            file.truncate(HEADER_SIZE)
+
+        self.header = open_header(filename, "r+")
+        self.header[:] = [MAGIC, VERSION, 0, self.num_fish, self.num_points, sim.world_width, sim.world_height]
+
+        self.grow()
+
+    def grow(self):
+        if self.frames is not None:
+            self.frames.flush()
+
+        self.capacity += GROW_FRAMES
+
+        #the new space is not written until it is used, so on most file systems it takes no disk space until then
+        with open(self.filename, "r+b") as file:
+            file.truncate(HEADER_SIZE + self.capacity * self.frame_dtype.itemsize)
+
+        self.frames = open_frames(self.filename, "r+", self.frame_dtype, self.capacity)
+
+    def record(self, sim):
+        if self.num_frames == self.capacity:
+            self.grow()
+
+        frame = self.frames[self.num_frames]
+        frame["tick"] = sim.tick
+
+        player = sim.player_fish
+        frame["player_points"] = snapshot.get_fish_points([player])[0]
+        frame["player_vel"] = (player.head_step.x, player.head_step.y)
+
+        num_active = len(sim.non_player_fish)
+        frame["num_active"] = num_active
+
+        frame["points"][:num_active] = sim.school_chains.points
+        frame["vel"][:num_active] = sim.school_flock.vel
+
+        self.num_frames += 1
+        self.header[HEADER_FIELDS.index("num_frames")] = self.num_frames
+
+    def close(self):
+        self.frames.flush()
+        self.header.flush()
+        self.frames = None
+        self.header = None
+
+        with open(self.filename, "r+b") as file:
+            file.truncate(HEADER_SIZE + self.num_frames * self.frame_dtype.itemsize)
+
+
+class Recording:
+    #read only view of a recording, frames are only read from disk when they are used
+
+    def __init__(self, filename):
+        header = open_header(filename, "r")
+        self.info = dict(zip(HEADER_FIELDS, header.tolist()))
+
+        if self.info["magic"] != MAGIC or self.info["version"] != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} fish recording")
+
+        self.num_fish = self.info["num_fish"]
+        self.num_points = self.info["num_points"]
+        self.world_size = (self.info["world_width"], self.info["world_height"])
+
+        #a recording that was not closed properly can be longer than its frame count
+        frame_dtype = get_frame_dtype(self.num_fish, self.num_points)
+        max_frames = (os.path.getsize(filename) - HEADER_SIZE) // frame_dtype.itemsize
+        self.num_frames = min(self.info["num_frames"], max_frames)
+        if self.num_frames == 0:
+            raise ValueError(f"{filename} has no frames")
+
+        self.frames = open_frames(filename, "r", frame_dtype, self.num_frames)
+
+    def get_frame(self, inx):
+        return self.frames[inx]
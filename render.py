@@ -0,0 +1,305 @@
+import fish
+import chain
+import species
+
+import math
+import numpy as np
+import pygame
+
+
+#where each part of a fish is in its chain of points (see chain.get_chain_points)
+BODY_START = 1
+TAIL_START = BODY_START + len(fish.Fish.SIZES)
+
+BODY_FIN_ANCHOR = BODY_START + fish.Fish.BODY_FIN_ANCHOR_INX
+DORSAL_FIN_START = BODY_START + fish.Fish.DORSAL_FIN_START_INX
+DORSAL_FIN_MID = BODY_START + fish.Fish.DORSAL_FIN_MID_INX
+DORSAL_FIN_END = BODY_START + fish.Fish.DORSAL_FIN_END_INX
+
+
+def set_mag(vecs, mag):
+    #same as Vec2.set_mag for each vector, mag can be one value or one per vector
+    mags = np.sqrt(vecs[..., 0] * vecs[..., 0] + vecs[..., 1] * vecs[..., 1])
+
+    return vecs * (mag / mags)[..., None]
+
+
+def rot90(vecs, positive):
+    if positive:
+        return np.stack([-vecs[..., 1], vecs[..., 0]], axis=-1)
+    else:
+        return np.stack([vecs[..., 1], -vecs[..., 0]], axis=-1)
+
+
+def rot(vecs, c, s):
+    #rotate by the angle with cos c and sin s, which broadcast against the vectors
+    x = vecs[..., 0] * c - vecs[..., 1] * s
+    y = vecs[..., 0] * s + vecs[..., 1] * c
+
+    return np.stack([x, y], axis=-1)
+
+
+class SchoolRenderer:
+    #draws every non player fish from one array of chain points, instead of each fish building its own polygons
+
+    def __init__(self, window, all_fish, school_chains=None, capacity=None, sprite_cache=None):
+        self.window = window
+        self.school_chains = school_chains  #points are read straight from the solver when there is one
+        self.sprite_cache = sprite_cache  #sprites.SpriteCache the fins, heads and eyes are blitted from, if given
+
+        self.body_sizes = np.array(fish.Fish.SIZES, dtype=float)
+        self.tail_sizes = np.array(fish.TailFin.SIZES, dtype=float)
+        self.ellipse_points = np.array([(i.x, i.y) for i in fish.BodyFin.ELLIPSE_POINTS])
+
+        #vertex buffers, sized once for the most fish there can be (e.g. every slot of a pool.FishPool)
+        num_fish = len(all_fish) if capacity is None else capacity
+        self.buffers = {
+            "body": np.zeros((num_fish, 2 * len(fish.Fish.SIZES) + 2, 2), dtype=np.int64),
+            "tail": np.zeros((num_fish, 2 * len(fish.TailFin.SIZES) + 2, 2), dtype=np.int64),
+            "left_fin": np.zeros((num_fish, fish.BodyFin.NUM_T_STEPS, 2), dtype=np.int64),
+            "right_fin": np.zeros((num_fish, fish.BodyFin.NUM_T_STEPS, 2), dtype=np.int64),
+            "dorsal_fin": np.zeros((num_fish, DORSAL_FIN_END - DORSAL_FIN_START + 1 + fish.DorsalFin.NUM_BEZIER_STEPS, 2), dtype=np.int64),
+            "head": np.zeros((num_fish, 2), dtype=np.int64),
+            "eye": np.zeros((num_fish, 2, 2), dtype=np.int64),
+            "outline": np.zeros((num_fish, 4, 2), dtype=np.int64),
+        }
+
+        #where each body fin is anchored and the angle it is turned to, for blitting from the sprite cache
+        self.fin_anchors = [None, None]
+        self.fin_angles = [None, None]
+
+        self.all_fish = []
+        self.colours = []
+        self.set_fish(all_fish)
+
+    def set_fish(self, all_fish):
+        #to be called when fish are spawned or despawned
+        self.all_fish = all_fish
+        self.refresh_colours()
+
+        self.set_views(len(all_fish))
+
+    def set_views(self, num_fish):
+        #the vertex arrays are views of the start of each buffer, one row for each fish being drawn
+        self.body_vertices = self.buffers["body"][:num_fish]
+        self.tail_vertices = self.buffers["tail"][:num_fish]
+        self.left_fin_vertices = self.buffers["left_fin"][:num_fish]
+        self.right_fin_vertices = self.buffers["right_fin"][:num_fish]
+        self.dorsal_fin_vertices = self.buffers["dorsal_fin"][:num_fish]
+        self.head_vertices = self.buffers["head"][:num_fish]
+        self.eye_vertices = self.buffers["eye"][:num_fish]
+        self.outline_vertices = self.buffers["outline"][:num_fish]
+
+    def refresh_colours(self):
+        #to be called after a fish changes species, e.g. when its config is reloaded
+        self.colours = [[i.species.colours[name] for name in species.COLOUR_NAMES] for i in self.all_fish]
+
+    def get_points(self):
+        if self.school_chains is not None:
+            return self.school_chains.points
+
+        chains = [chain.get_chain_points(i) for i in self.all_fish]
+
+        return np.array([[(p.pos.x, p.pos.y) for p in c] for c in chains], dtype=float).reshape(len(chains), chain.NUM_POINTS, 2)
+
+    def fill_trail_string(self, vertices, head_pos, trail_pos, parent_pos, sizes):
+        #same polygon as TrailPointString.draw - clockwise side down the string, then back up the anticlockwise side
+        scaled = set_mag(parent_pos - trail_pos, sizes)
+        cw = trail_pos + rot90(scaled, False)
+        acw = trail_pos + rot90(scaled, True)
+
+        num_points = trail_pos.shape[1]
+
+        #astype truncates towards zero, the same as get_int_pos
+        vertices[:, 0] = head_pos + rot90(scaled[:, 0], False)
+        vertices[:, 1 : num_points + 1] = cw
+        vertices[:, num_points + 1 : 2 * num_points + 1] = acw[:, ::-1]
+        vertices[:, 2 * num_points + 1] = head_pos + rot90(scaled[:, 0], True)
+
+    def fill_body_fin(self, vertices, dirs, points, positive_rot):
+        #same polygon as BodyFin.draw, returning the anchor positions and angles of the fins
+        anchor_size = fish.Fish.SIZES[fish.Fish.BODY_FIN_ANCHOR_INX]
+        anchor_pos = points[:, BODY_FIN_ANCHOR] + rot90(set_mag(dirs[:, BODY_FIN_ANCHOR], anchor_size), positive_rot)
+
+        rot_dir = dirs[:, BODY_FIN_ANCHOR - 1]
+        rot_point_angle = np.arctan2(rot_dir[:, 1], rot_dir[:, 0])
+
+        if not positive_rot:
+            rot_angle = rot_point_angle + fish.BodyFin.ANGLE_OFFSET
+        else:
+            rot_angle = rot_point_angle - fish.BodyFin.ANGLE_OFFSET
+
+        c = np.cos(rot_angle)[:, None]
+        s = np.sin(rot_angle)[:, None]
+
+        vertices[:] = rot(self.ellipse_points[None, :, :], c, s) + anchor_pos[:, None, :]
+
+        return anchor_pos, rot_angle
+
+    def get_dorsal_fin_angles(self, inxs=None):
+        #joint angles of the dorsal fin points, found when the chains were last updated, for the fish in inxs or every fish
+        if self.school_chains is not None:
+            angles = self.school_chains.joint_angles[:, DORSAL_FIN_START + 1 : DORSAL_FIN_END + 1]
+
+            return angles if inxs is None else angles[inxs]
+
+        start = fish.Fish.DORSAL_FIN_START_INX + 1
+        end = fish.Fish.DORSAL_FIN_END_INX + 1
+
+        all_fish = self.all_fish if inxs is None else [self.all_fish[i] for i in inxs.tolist()]
+
+        return np.array([[p.joint_angle for p in i.body.trail_points[start:end]] for i in all_fish], dtype=float).reshape(len(all_fish), end - start)
+
+    def fill_dorsal_fin(self, vertices, dirs, points, inxs=None, joint_angles=None):
+        #same polygon as DorsalFin.draw, with the joint angles of every chain point given as the rows of points or read from the fish
+        if joint_angles is None:
+            angles = self.get_dorsal_fin_angles(inxs)
+        else:
+            angles = joint_angles[:, DORSAL_FIN_START + 1 : DORSAL_FIN_END + 1]
+
+        #summed one column at a time to add in the same order as DorsalFin.get_total_curvature
+        total_angle = 0
+        for k in range(angles.shape[1]):
+            total_angle = total_angle + angles[:, k]
+
+        curvature = total_angle / angles.shape[1] / math.pi
+
+        mult = np.minimum(np.abs(curvature) * fish.DorsalFin.CONST_PROPORTIONALITY, fish.DorsalFin.MAX_MULT)
+
+        mid_pos = points[:, DORSAL_FIN_MID]
+        scaled = set_mag(dirs[:, DORSAL_FIN_MID], fish.Fish.SIZES[fish.Fish.DORSAL_FIN_MID_INX])
+        perp = np.where((curvature > 0)[:, None], rot90(scaled, True), rot90(scaled, False))
+
+        outside_pos = mid_pos + perp
+        apex = mid_pos + (outside_pos - mid_pos) * mult[:, None]
+
+        start_pos = points[:, DORSAL_FIN_START]
+        end_pos = points[:, DORSAL_FIN_END]
+
+        num_body_points = DORSAL_FIN_END - DORSAL_FIN_START + 1
+        vertices[:, :num_body_points] = points[:, DORSAL_FIN_START : DORSAL_FIN_END + 1]
+
+        #the outside points go in backwards, so the polygon comes back along the curve
+        for i, (w0, w1, w2) in enumerate(fish.DorsalFin.BEZIER_WEIGHTS):
+            vertices[:, len(vertices[0]) - 1 - i] = w0 * start_pos + w1 * apex + w2 * end_pos
+
+    def fill_eyes(self, dirs, points):
+        #same positions as Eyes.get_pos
+        scaled = set_mag(dirs[:, BODY_START], fish.Fish.SIZES[0] * fish.Eyes.LENGTH_RATIO)
+
+        for i, angle in enumerate([fish.Eyes.ANGLE, -fish.Eyes.ANGLE]):
+            self.eye_vertices[:, i] = points[:, 0] + rot(scaled, math.cos(angle), math.sin(angle))
+
+    def fill_vertices(self, points, inxs=None, joint_angles=None):
+        #dirs[:, k] is the direction chain point k is pointing in (towards its parent)
+        dirs = np.zeros_like(points)
+        dirs[:, 1:] = points[:, :-1] - points[:, 1:]
+
+        self.head_vertices[:] = points[:, 0]
+
+        self.fill_trail_string(self.body_vertices, points[:, 0], points[:, BODY_START:TAIL_START], points[:, : TAIL_START - 1], self.body_sizes)
+        self.fill_trail_string(self.tail_vertices, points[:, TAIL_START - 1], points[:, TAIL_START:], points[:, TAIL_START - 1 : -1], self.tail_sizes)
+
+        self.fin_anchors[0], self.fin_angles[0] = self.fill_body_fin(self.left_fin_vertices, dirs, points, False)
+        self.fin_anchors[1], self.fin_angles[1] = self.fill_body_fin(self.right_fin_vertices, dirs, points, True)
+
+        self.fill_dorsal_fin(self.dorsal_fin_vertices, dirs, points, inxs, joint_angles)
+
+        if fish.Fish.SHOW_EYES:
+            self.fill_eyes(dirs, points)
+
+        self.fill_outline(points)
+
+    def fill_outline(self, points):
+        #same polygon as Fish.draw_outline, reusing the sides of the body polygon
+        widest = fish.Fish.OUTLINE_WIDEST_INX
+        num_body_points = len(fish.Fish.SIZES)
+
+        self.outline_vertices[:, 0] = self.head_vertices
+        self.outline_vertices[:, 1] = self.body_vertices[:, 1 + widest]
+        self.outline_vertices[:, 2] = points[:, -1]
+        self.outline_vertices[:, 3] = self.body_vertices[:, 2 * num_body_points - widest]
+
+    def draw(self, lod_selector=None, points=None, inxs=None, scale=1, joint_angles=None):
+        #points can be given to draw the fish somewhere other than where they are, e.g. between two ticks or relative to a camera
+        #inxs picks out the fish to draw (e.g. the ones a camera can see), and then points only has their rows
+        #scale is screen pixels per unit of the points, for picking the level of detail
+        #joint_angles can be given with the points (with the same rows) so nothing is read from the school while it is being updated
+        if len(self.all_fish) == 0:
+            return
+
+        if points is None:
+            points = self.get_points()
+
+            if inxs is not None:
+                points = points[inxs]
+
+        colours = self.colours if inxs is None else [self.colours[i] for i in inxs.tolist()]
+
+        self.set_views(len(points))
+        self.fill_vertices(points, inxs, joint_angles)
+
+        if lod_selector is None:
+            tiers = [fish.LOD_FULL] * len(points)
+        else:
+            tiers = lod_selector.select(points[:, 0] * scale, scale).tolist()
+
+        heads = self.head_vertices.tolist()
+        bodies = self.body_vertices.tolist()
+        tails = self.tail_vertices.tolist()
+        left_fins = self.left_fin_vertices.tolist()
+        right_fins = self.right_fin_vertices.tolist()
+        dorsal_fins = self.dorsal_fin_vertices.tolist()
+        eyes = self.eye_vertices.tolist()
+        outlines = self.outline_vertices.tolist()
+
+        window = self.window
+        head_radius = fish.Fish.SIZES[0]
+        point_radius = fish.Fish.POINT_RADIUS
+        show_eyes = fish.Fish.SHOW_EYES
+
+        draw_polygon = pygame.draw.polygon
+        draw_circle = pygame.draw.circle
+
+        sprite_cache = self.sprite_cache
+        if sprite_cache is not None:
+            fin_anchors = [i.tolist() for i in self.fin_anchors]
+            fin_steps = [sprite_cache.get_angle_steps(i).tolist() for i in self.fin_angles]
+
+        #fish are drawn one after another, in the same order as Fish.draw, so overlapping fish look the same
+        for i in range(len(heads)):
+            body_colour, tail_fin_colour, body_fin_colour, dorsal_fin_colour, eye_colour = colours[i]
+            tier = tiers[i]
+
+            if tier == fish.LOD_POINT:
+                draw_circle(window, body_colour, heads[i], point_radius)
+                continue
+            elif tier == fish.LOD_OUTLINE:
+                draw_polygon(window, body_colour, outlines[i])
+                continue
+
+            if sprite_cache is not None:
+                sprite_cache.blit(window, sprite_cache.get_circle(body_colour, head_radius), *heads[i])
+            else:
+                draw_circle(window, body_colour, heads[i], head_radius)
+
+            draw_polygon(window, tail_fin_colour, tails[i])
+
+            if tier == fish.LOD_FULL and sprite_cache is not None:
+                sprite_cache.blit(window, sprite_cache.get_fin(body_fin_colour, fin_steps[0][i]), *fin_anchors[0][i])
+                sprite_cache.blit(window, sprite_cache.get_fin(body_fin_colour, fin_steps[1][i]), *fin_anchors[1][i])
+            elif tier == fish.LOD_FULL:
+                draw_polygon(window, body_fin_colour, left_fins[i])
+                draw_polygon(window, body_fin_colour, right_fins[i])
+
+            draw_polygon(window, body_colour, bodies[i])
+
+            if tier == fish.LOD_FULL:
+                draw_polygon(window, dorsal_fin_colour, dorsal_fins[i])
+
+                if show_eyes and sprite_cache is not None:
+                    sprite_cache.blit(window, sprite_cache.get_circle(eye_colour, fish.Eyes.RADIUS), *eyes[i][0])
+                    sprite_cache.blit(window, sprite_cache.get_circle(eye_colour, fish.Eyes.RADIUS), *eyes[i][1])
+                elif show_eyes:
+                    draw_circle(window, eye_colour, eyes[i][0], fish.Eyes.RADIUS)
+                    draw_circle(window, eye_colour, eyes[i][1], fish.Eyes.RADIUS)
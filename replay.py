@@ -0,0 +1,178 @@
+import fish
+import chain
+import camera
+import render
+import vector
+import snapshot
+import recording
+
+import sys
+import numpy as np
+import pygame
+
+
+FPS = 60
+
+#the window is never bigger than this, with a camera showing part of the world when it is bigger
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 800
+FOLLOW_PLAYER = True  #keep the player fish in view, otherwise W, A, S and D move the camera
+
+SEEK_SECONDS = 5  #how far the arrow keys jump
+SEEK_FRAMES = SEEK_SECONDS * FPS
+
+BACKGROUND_COLOUR = (0, 0, 0)
+
+USE_BATCH_RENDER = True  #draw the school with render.py rather than Fish.draw
+
+
+class Replay:
+    #draws the frames of a recording, with no simulation running
+
+    def __init__(self, window, recorded, use_batch_render=False):
+        self.window = window
+        self.recording = recorded  #a recording.Recording
+
+        world_size = self.recording.world_size
+        start = vector.Vec2(world_size[0] / 2, world_size[1] / 2)
+
+        #everything is drawn onto the camera's view surface, as in Simulation.draw_view
+        self.camera = camera.Camera(window, *world_size)
+        draw_window = self.camera.view_surface
+
+        #the fish are only used to draw, so their starting shape does not matter
+        self.player_fish = fish.Fish(draw_window, start.copy(), fish.PlayerFish.CONFIG_FILENAME, world_size)
+        self.all_fish = [fish.Fish(draw_window, start.copy(), fish.NonPlayerFish.CONFIG_FILENAME, world_size) for _ in range(self.recording.num_fish)]
+
+        #the recorded points are loaded into a solver, which is never updated but gives the renderer its arrays
+        num_points = self.recording.num_points
+        self.school_chains = chain.ChainSolver()
+        self.school_chains.all_fish = self.all_fish
+        self.school_chains.use_arrays(np.zeros((len(self.all_fish), num_points, 2)), np.zeros((len(self.all_fish), num_points - 1)), np.zeros((len(self.all_fish), num_points)))
+
+        self.player_chain = chain.ChainSolver()
+        self.player_chain.all_fish = [self.player_fish]
+        self.player_chain.use_arrays(np.zeros((1, num_points, 2)), np.zeros((1, num_points - 1)), np.zeros((1, num_points)))
+
+        self.renderer = None
+        if use_batch_render:
+            self.renderer = render.SchoolRenderer(draw_window, self.all_fish, self.school_chains)
+
+        self.frame_inx = 0
+        self.paused = False
+
+    def seek(self, frame_inx):
+        self.frame_inx = min(max(frame_inx, 0), self.recording.num_frames - 1)
+
+    def step(self):
+        if not self.paused:
+            self.seek(self.frame_inx + 1)
+
+    def set_num_active(self, num_active):
+        #only the first num_active fish were in use when the frame was recorded
+        active_fish = self.all_fish[:num_active]
+
+        self.school_chains.set_active_fish(active_fish)
+        if self.renderer is not None:
+            self.renderer.set_fish(active_fish)
+
+    def load_frame(self):
+        frame = self.recording.get_frame(self.frame_inx)
+
+        self.player_chain.points[0] = frame["player_points"]
+        self.player_chain.find_joint_angles()
+
+        num_active = int(frame["num_active"])
+        if num_active != len(self.school_chains.points):
+            self.set_num_active(num_active)
+
+        self.school_chains.points[:] = frame["points"][:num_active]
+        self.school_chains.find_joint_angles()
+
+        return int(frame["tick"])
+
+    def update_camera(self):
+        if FOLLOW_PLAYER:
+            head_x, head_y = self.player_chain.points[0, 0].tolist()
+            self.camera.follow(head_x, head_y)
+        else:
+            keys = pygame.key.get_pressed()
+            dx = (keys[pygame.K_d] - keys[pygame.K_a]) * camera.PAN_SPEED
+            dy = (keys[pygame.K_s] - keys[pygame.K_w]) * camera.PAN_SPEED
+
+            self.camera.pan(dx, dy)
+
+    def draw(self):
+        #draws what the camera can see, so only the fish near the view are ever touched
+        self.load_frame()
+
+        view = self.camera
+        visible = np.flatnonzero(view.is_visible(self.school_chains.points[:, 0]))
+
+        player_points = view.world_to_view(self.player_chain.points)
+        school_points = view.world_to_view(self.school_chains.points[visible])
+
+        view.begin_frame(BACKGROUND_COLOUR)
+
+        if self.renderer is not None:
+            self.renderer.draw(None, school_points, visible, view.zoom)
+        else:
+            visible_fish = [self.all_fish[i] for i in visible.tolist()]
+            snapshot.set_fish_points(visible_fish, school_points, self.school_chains.joint_angles[visible])
+
+            for i in visible_fish:
+                i.draw()
+
+        snapshot.set_fish_points([self.player_fish], player_points, self.player_chain.joint_angles)
+        self.player_fish.draw()
+
+        view.end_frame()
+
+
+def handle_key(replay, key):
+    if key == pygame.K_SPACE:
+        replay.paused = not replay.paused
+    elif key == pygame.K_LEFT:
+        replay.seek(replay.frame_inx - SEEK_FRAMES)
+    elif key == pygame.K_RIGHT:
+        replay.seek(replay.frame_inx + SEEK_FRAMES)
+    elif key == pygame.K_HOME:
+        replay.seek(0)
+    elif key == pygame.K_END:
+        replay.seek(replay.recording.num_frames - 1)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("usage: python replay.py <recording file>")
+        return
+
+    pygame.init()
+
+    recorded = recording.Recording(sys.argv[1])
+    world_width, world_height = recorded.world_size
+    window = pygame.display.set_mode((min(world_width, SCREEN_WIDTH), min(world_height, SCREEN_HEIGHT)))
+
+    replay = Replay(window, recorded, USE_BATCH_RENDER)
+
+    clock = pygame.time.Clock()
+    while True:
+        clock.tick(FPS)
+
+        replay.update_camera()
+        replay.draw()
+        pygame.display.update()
+
+        replay.step()
+
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                quit()
+            elif e.type == pygame.KEYDOWN:
+                handle_key(replay, e.key)
+            elif e.type == pygame.MOUSEWHEEL:
+                replay.camera.zoom_at(camera.ZOOM_STEP**e.y, *pygame.mouse.get_pos())
+
+
+if __name__ == "__main__":
+    main()
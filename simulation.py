@@ -0,0 +1,490 @@
+import fish
+import chain
+import agents
+import obstacles
+import flock
+import vector
+import spatial
+import species
+import render
+import lod
+import snapshot
+import parallel
+import pool
+import camera
+import lazy
+import sprites
+
+import math
+import random
+import numpy as np
+
+
+class Simulation:
+    #owns the player fish and the school, and can be stepped without a display
+
+    PLAYER_PATH_RATIO = 0.35  #radius of the scripted player path as a fraction of the smaller world dimension
+    PLAYER_PATH_PERIOD = 1200  #ticks per lap of the scripted player path
+
+    BACKGROUND_COLOUR = (0, 0, 0)  #drawn behind the part of the world a camera can see
+
+    def __init__(self, world_width, world_height, num_fish, window=None, use_flock_engine=False, use_chain_solver=False, follow_mouse=True, bounds_policy=None, num_workers=0, use_batch_render=False, use_lod=False, seed=None, interpolate=False, obstacles_filename=None, verlet_skin=None, max_fish=None, use_camera=False, lazy_chains=False, sprite_angle_steps=None):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.window = window  #None when headless
+        self.follow_mouse = follow_mouse
+
+        self.tick = 0
+
+        #with a camera the world can be any size, and only the part of it in view is drawn (onto the camera's view surface)
+        self.camera = None
+        draw_window = window
+        if use_camera and window is not None:
+            self.camera = camera.Camera(window, world_width, world_height)
+            draw_window = self.camera.view_surface
+
+        self.rng = random.Random(seed)  #every random choice comes from here, so a seed gives a reproducible run
+
+        #the walls, plus any rocks or reef in the obstacles file
+        if obstacles_filename is None:
+            self.obstacles = obstacles.ObstacleField(world_width, world_height)
+        else:
+            self.obstacles = obstacles.load_obstacles(obstacles_filename, world_width, world_height)
+
+        #predators, attractors and obstacles the school reacts to, including the player fish
+        self.agents = agents.AgentField(world_width, world_height, bounds_policy)
+
+        self.player_fish = fish.PlayerFish(draw_window, vector.Vec2(world_width // 2, world_height // 2), (world_width, world_height), self.rng, self.agents)
+        self.player_fish.camera = self.camera
+
+        wrap_size = (world_width, world_height) if bounds_policy == spatial.WRAP else None
+        self.wrap_size = wrap_size
+
+        #workers run both the flock and the chains, so they imply both batched engines
+        #NOTE: the workers search their tiles every tick, so verlet_skin only applies without them
+        self.worker_pool = None
+        if num_workers > 0:
+            self.worker_pool = parallel.WorkerPool(num_workers)
+
+        self.school_flock = None
+        if self.worker_pool is not None:
+            self.school_flock = parallel.ParallelFlock(world_width, world_height, self.agents, self.worker_pool, bounds_policy, self.obstacles)
+        elif use_flock_engine:
+            self.school_flock = flock.Flock(world_width, world_height, self.agents, bounds_policy, self.obstacles, verlet_skin)
+
+        self.school_chains = None
+        if self.worker_pool is not None:
+            self.school_chains = parallel.ParallelChainSolver(self.worker_pool, wrap_size)
+        elif use_chain_solver:
+            self.school_chains = chain.ChainSolver(wrap_size)
+
+        #a slot is made for the most fish there will ever be, so fish can be spawned later without making any
+        capacity = num_fish if max_fish is None else max(num_fish, max_fish)
+        slots = fish.create_non_player_fish(draw_window, capacity, self.player_fish, self.school_flock, self.school_chains, bounds_policy, self.rng, self.obstacles, verlet_skin)
+
+        #fish the camera cannot see can skip their chains, which only matter for drawing
+        #NOTE: the workers solve fixed ranges of chains, so this only applies without them
+        self.lazy_chains = None
+        if lazy_chains and self.camera is not None and self.worker_pool is None:
+            self.lazy_chains = lazy.LazyChains(capacity, wrap_size)
+
+        self.awake_fish = None  #index array of the fish whose chains were solved last tick, None for all of them
+
+        self.fish_pool = pool.FishPool(slots, self.school_flock, self.school_chains, self.lazy_chains)
+        self.fish_pool.set_num_active(num_fish)
+        self.non_player_fish = self.fish_pool.active
+
+        #the fins, heads and eyes can be blitted from sprites drawn at this many angles, instead of being drawn every frame
+        self.sprite_cache = None
+        if sprite_angle_steps is not None and window is not None:
+            self.sprite_cache = sprites.SpriteCache(sprite_angle_steps)
+
+            for i in [self.player_fish] + slots:
+                i.set_sprite_cache(self.sprite_cache)
+
+        self.renderer = None
+        if use_batch_render and window is not None:
+            self.renderer = render.SchoolRenderer(draw_window, self.non_player_fish, self.school_chains, capacity, self.sprite_cache)
+
+        self.lod_selector = None
+        if use_lod and window is not None:
+            self.lod_selector = lod.LodSelector(window.get_width(), window.get_height())
+
+        #chain points from before the last tick, so drawing can be done part way between ticks
+        #with lazy chains only the fish that were awake are kept, and previous_inxs holds which they are
+        self.interpolate = interpolate
+        self.previous_points = None
+        self.previous_inxs = None
+
+    def get_scripted_target(self, tick):
+        #a slow loop around the centre, used instead of the mouse when there is nobody to move it
+        angle = 2 * math.pi * tick / Simulation.PLAYER_PATH_PERIOD
+        radius = min(self.world_width, self.world_height) * Simulation.PLAYER_PATH_RATIO
+
+        x = self.world_width / 2 + radius * math.cos(angle)
+        y = self.world_height / 2 + radius * math.sin(2 * angle) / 2
+
+        return vector.Vec2(x, y)
+
+    def update_player(self, tick=None):
+        #tick is the one the player is moving on, when the school has not caught up to it yet (see pipeline.py)
+        if not self.follow_mouse:
+            self.player_fish.target_pos = self.get_scripted_target(self.tick if tick is None else tick)
+
+        self.player_fish.update()
+        self.agents.rebuild()
+
+    def update_boid_vels(self):
+        fish.update_non_player_vels(self.non_player_fish, self.school_flock)
+
+    def update_grid(self):
+        fish.move_non_player_fish(self.non_player_fish, self.school_flock)
+
+    def update_chains(self):
+        #the fish objects are only read to draw them, and the batch renderer reads the solver arrays directly
+        sync_objects = self.window is not None and self.renderer is None
+
+        if self.lazy_chains is not None:
+            self.awake_fish = self.get_awake_fish()
+
+        fish.update_non_player_chains(self.non_player_fish, self.school_flock, self.school_chains, sync_objects, self.awake_fish)
+
+    def get_school_vels(self, inxs):
+        if self.school_flock is not None:
+            return self.school_flock.vel[inxs]
+        else:
+            return np.array([(self.non_player_fish[i].boid.vel.x, self.non_player_fish[i].boid.vel.y) for i in inxs.tolist()], dtype=float).reshape(-1, 2)
+
+    def wake_fish(self, inxs, head_pos):
+        #lays the chains of sleeping fish back down behind their heads at head_pos
+        points = self.lazy_chains.settle(inxs, head_pos, self.get_link_lengths(inxs), -self.get_school_vels(inxs))
+
+        if self.school_chains is not None:
+            self.school_chains.points[inxs] = points
+        else:
+            snapshot.set_fish_points([self.non_player_fish[i] for i in inxs.tolist()], points)
+
+    def get_link_lengths(self, inxs):
+        if self.school_chains is not None:
+            return self.school_chains.link_lengths[inxs]
+
+        #every fish is the same shape, so any one will do
+        chain_points = chain.get_chain_points(self.player_fish)[1:]
+
+        return np.tile([p.parent.radius for p in chain_points], (len(inxs), 1))
+
+    def wake_visible_fish(self, visible):
+        #fish can come into view without passing through the wake margin, e.g. when zooming out
+        asleep = visible[~self.lazy_chains.awake[visible]]
+        if len(asleep) > 0:
+            self.wake_fish(asleep, self.get_school_grid().positions[asleep])
+            self.lazy_chains.awake[asleep] = True
+
+    def get_awake_fish(self):
+        #the fish near enough to the view to solve their chains this tick, waking up any that were asleep
+        grid = self.get_school_grid()
+        if grid is None:
+            return None
+
+        #the grid has just been rebuilt, so holds the new head positions
+        head_pos = grid.positions
+        self.lazy_chains.record(head_pos)
+
+        awake = self.camera.get_visible(grid, lazy.WAKE_RADIUS)
+        woken = self.lazy_chains.set_awake(awake, len(self.non_player_fish))
+        if len(woken) > 0:
+            self.wake_fish(woken, head_pos[woken])
+
+        return awake
+
+    def update_school(self):
+        #the rest of a tick once the player has moved, which pipeline.py runs on a thread of its own
+        self.update_boid_vels()
+        self.update_grid()
+        self.update_chains()
+
+        self.tick += 1
+
+    def update(self):
+        if self.interpolate:
+            self.previous_points = self.get_points(self.awake_fish)
+            self.previous_inxs = self.awake_fish
+
+        self.update_player()
+        self.update_school()
+
+    def refresh_school(self):
+        #to be called after the fish pool has changed
+        self.non_player_fish = self.fish_pool.active
+
+        if self.renderer is not None:
+            self.renderer.set_fish(self.non_player_fish)
+
+        #there is nothing to interpolate a new fish from
+        self.previous_points = None
+        self.awake_fish = None
+
+    def spawn_fish(self, num, positions=None):
+        #positions default to random points in the world, returns the new fish
+        if positions is None:
+            positions = [(self.rng.uniform(0, self.world_width), self.rng.uniform(0, self.world_height)) for _ in range(num)]
+
+        spawned = self.fish_pool.spawn(positions, self.rng)
+        self.refresh_school()
+
+        return spawned
+
+    def despawn_fish(self, fish_objs):
+        self.fish_pool.despawn(fish_objs)
+        self.refresh_school()
+
+    def set_num_fish(self, num):
+        #spawns fish at random points, or despawns the fish in the last slots, to end up with num
+        num_active = len(self.non_player_fish)
+        if num > num_active:
+            self.spawn_fish(num - num_active)
+        elif num < num_active:
+            self.despawn_fish(self.non_player_fish[num:])
+
+    def reload_species(self):
+        #picks up any fish config files that changed on disk, returning their filenames
+        changed = species.reload_changed()
+        if len(changed) == 0:
+            return changed
+
+        #free slots are recoloured too, so fish spawned later match
+        for i in [self.player_fish] + self.fish_pool.slots:
+            if i.species.filename in changed:
+                i.set_species(species.get_species(i.species.filename))
+
+        if self.renderer is not None:
+            self.renderer.refresh_colours()
+
+        return changed
+
+    def close(self):
+        #stops the worker processes and frees their shared memory
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+
+    def get_verlet_stats(self):
+        #how often the neighbour candidates were rebuilt, or None when they are not kept between ticks
+        if self.school_flock is not None:
+            verlet = self.school_flock.verlet
+        elif len(self.non_player_fish) > 0:
+            verlet = self.non_player_fish[0].boid.verlet
+        else:
+            verlet = None
+
+        return None if verlet is None else verlet.get_stats()
+
+    def get_lod_tiers(self, head_pos=None, scale=1):
+        #head_pos defaults to the head of every school fish, scale is screen pixels per unit of head_pos
+        if head_pos is None:
+            head_pos = np.array([(i.head_point.pos.x, i.head_point.pos.y) for i in self.non_player_fish], dtype=float).reshape(-1, 2)
+
+        return self.lod_selector.select(head_pos * scale, scale).tolist()
+
+    def get_school_grid(self):
+        #the spatial hash of the school's head positions, rebuilt every tick, or None when there is no school to hash
+        if self.school_flock is not None:
+            return self.school_flock.grid
+        elif len(self.non_player_fish) > 0:
+            return self.non_player_fish[0].boid.grid
+        else:
+            return None
+
+    def get_visible_fish(self):
+        #indices of the school fish the camera could see any part of
+        grid = self.get_school_grid()
+        if grid is None:
+            return np.zeros(0, dtype=np.int64)
+
+        return self.camera.get_visible(grid)
+
+    def get_school_points(self, inxs=None):
+        #chain points of the school (or just the school fish in the index array inxs) as a (num_fish, num_points, 2) array
+        if self.school_chains is not None:
+            return self.school_chains.points.copy() if inxs is None else self.school_chains.points[inxs]
+
+        all_fish = self.non_player_fish if inxs is None else [self.non_player_fish[i] for i in inxs.tolist()]
+
+        return snapshot.get_fish_points(all_fish)
+
+    def get_points(self, inxs=None):
+        #chain points of the player and of the school, with the player as a (1, num_points, 2) array
+        return snapshot.get_fish_points([self.player_fish]), self.get_school_points(inxs)
+
+    def get_previous_school_points(self, current_school_points, inxs=None):
+        #previous points of the school fish in inxs (or all of them), with fish that have none staying where they are
+        previous = self.previous_points[1]
+        if self.previous_inxs is None:
+            return previous if inxs is None else previous[inxs]
+
+        rows = np.minimum(np.searchsorted(self.previous_inxs, inxs), max(len(self.previous_inxs) - 1, 0))
+        found = np.nonzero(self.previous_inxs[rows] == inxs)[0] if len(self.previous_inxs) > 0 else []
+
+        school_points = current_school_points.copy()
+        school_points[found] = previous[rows[found]]
+
+        return school_points
+
+    def get_interpolated_points(self, current_points, alpha, inxs=None):
+        #current_points only has the school fish in inxs when it is given
+        previous_points = [self.previous_points[0], self.get_previous_school_points(current_points[1], inxs)]
+
+        return [self.interpolate_points(previous, current, alpha) for previous, current in zip(previous_points, current_points)]
+
+    def interpolate_points(self, previous, current, alpha):
+        step = current - previous
+
+        if self.wrap_size is not None:
+            #a fish that wrapped around the world should move the short way, not across the whole screen
+            world_size = np.array(self.wrap_size, dtype=float)
+            step -= world_size * np.round(step / world_size)
+
+        return previous + step * alpha
+
+    def set_object_points(self, player_points, school_points, school_fish=None):
+        #school_fish are the fish with rows in school_points, defaulting to the whole school
+        snapshot.set_fish_points([self.player_fish], player_points)
+
+        #the batch renderer is given the school points directly
+        if self.renderer is None:
+            snapshot.set_fish_points(self.non_player_fish if school_fish is None else school_fish, school_points)
+
+    def draw_fish(self, school_points=None):
+        self.obstacles.draw(self.window)
+        self.agents.draw(self.window)
+
+        if self.renderer is not None:
+            self.renderer.draw(self.lod_selector, school_points)
+        elif self.lod_selector is not None:
+            for i, tier in zip(self.non_player_fish, self.get_lod_tiers()):
+                i.draw(tier)
+        else:
+            for i in self.non_player_fish:
+                i.draw()
+
+        self.player_fish.draw()
+
+    def draw(self, alpha=1):
+        #with alpha below 1, the fish are drawn that far from their previous positions to their current ones
+        if self.camera is not None:
+            self.draw_view(alpha)
+            return
+
+        if alpha >= 1 or self.previous_points is None:
+            self.draw_fish()
+            return
+
+        current_points = self.get_points()
+        player_points, school_points = self.get_interpolated_points(current_points, alpha)
+
+        self.set_object_points(player_points, school_points)
+        self.draw_fish(school_points)
+        self.set_object_points(*current_points)
+
+    def draw_view(self, alpha=1):
+        #draws what the camera can see, so only the school fish near the view are ever touched
+        view = self.camera
+        visible = self.get_visible_fish()
+        visible_fish = [self.non_player_fish[i] for i in visible.tolist()]
+
+        if self.lazy_chains is not None:
+            self.wake_visible_fish(visible)
+
+        current_points = self.get_points(visible)
+        if alpha >= 1 or self.previous_points is None:
+            player_points, school_points = current_points
+        else:
+            player_points, school_points = self.get_interpolated_points(current_points, alpha, visible)
+
+        #the fish are moved onto the view surface to be drawn, then put back
+        player_points = view.world_to_view(player_points)
+        school_points = view.world_to_view(school_points)
+        self.set_object_points(player_points, school_points, visible_fish)
+
+        view.begin_frame(Simulation.BACKGROUND_COLOUR)
+
+        surface = view.view_surface
+        origin = (view.x, view.y)
+        self.obstacles.draw(surface, origin)
+        self.agents.draw(surface, origin)
+
+        if self.renderer is not None:
+            self.renderer.draw(self.lod_selector, school_points, visible, view.zoom)
+        elif self.lod_selector is not None:
+            for i, tier in zip(visible_fish, self.get_lod_tiers(school_points[:, 0], view.zoom)):
+                i.draw(tier)
+        else:
+            for i in visible_fish:
+                i.draw()
+
+        self.player_fish.draw()
+
+        view.end_frame()
+
+        self.set_object_points(*current_points, visible_fish)
+
+    def get_frame(self, alpha=1, previous_player_points=None):
+        #copies of the chain points to draw with draw_frame, part way between the last two ticks when alpha is below 1
+        #nothing in a frame is changed by update_school, so it can be drawn while the next tick runs (see pipeline.py)
+        #previous_player_points are where the player was before its last tick, when it has moved since the school did
+        if self.lazy_chains is not None:
+            self.wake_visible_fish(self.get_visible_fish())
+
+        player_points, school_points = self.get_points()
+
+        if self.school_chains is not None:
+            joint_angles = self.school_chains.joint_angles.copy()
+        else:
+            joint_angles = snapshot.get_fish_joint_angles(self.non_player_fish)
+
+        if alpha < 1 and self.previous_points is not None:
+            previous_player = self.previous_points[0] if previous_player_points is None else previous_player_points
+            previous_school = self.get_previous_school_points(school_points, np.arange(len(school_points)))
+
+            player_points = self.interpolate_points(previous_player, player_points, alpha)
+            school_points = self.interpolate_points(previous_school, school_points, alpha)
+
+        return {"tick": self.tick, "player_points": player_points, "points": school_points, "joint_angles": joint_angles}
+
+    def draw_frame(self, frame):
+        #draws a frame from get_frame with the batch renderer, reading nothing that update_school changes
+        player_points = frame["player_points"]
+        school_points = frame["points"]
+        joint_angles = frame["joint_angles"]
+
+        view = self.camera
+        visible = None
+        surface = self.window
+        origin = (0, 0)
+        scale = 1
+
+        if view is not None:
+            #the school's grid is being rebuilt by the next tick, so the fish in view are found from the frame
+            visible = np.nonzero(view.is_visible(school_points[:, 0]))[0]
+
+            player_points = view.world_to_view(player_points)
+            school_points = view.world_to_view(school_points[visible])
+            joint_angles = joint_angles[visible]
+
+            view.begin_frame(Simulation.BACKGROUND_COLOUR)
+
+            surface = view.view_surface
+            origin = (view.x, view.y)
+            scale = view.zoom
+
+        self.obstacles.draw(surface, origin)
+        self.agents.draw(surface, origin)
+        self.renderer.draw(self.lod_selector, school_points, visible, scale, joint_angles)
+
+        #only the thread drawing moves the player fish, so it is drawn from its own objects and put back
+        current_player_points = snapshot.get_fish_points([self.player_fish])
+        snapshot.set_fish_points([self.player_fish], player_points)
+        self.player_fish.draw()
+        snapshot.set_fish_points([self.player_fish], current_player_points)
+
+        if view is not None:
+            view.end_frame()
@@ -0,0 +1,155 @@
+import boid
+import chain
+
+import numpy as np
+
+
+#everything needed to carry on a simulation is kept in a few packed arrays, saved uncompressed with numpy
+#chain points are (num_fish, num_points, 2) with the head first, boid state is (num_fish, 2)
+
+
+def get_fish_points(all_fish):
+    chains = [chain.get_chain_points(i) for i in all_fish]
+
+    return np.array([[(p.pos.x, p.pos.y) for p in c] for c in chains], dtype=float).reshape(len(chains), chain.NUM_POINTS, 2)
+
+
+def get_fish_joint_angles(all_fish):
+    chains = [chain.get_chain_points(i)[1:] for i in all_fish]
+
+    #the head has no joint, so is stored as 0 like in chain.ChainSolver
+    return np.array([[0] + [p.joint_angle for p in c] for c in chains], dtype=float).reshape(len(chains), chain.NUM_POINTS)
+
+
+def set_fish_points(all_fish, points, joint_angles=None):
+    #joint angles are left as they are when not given
+    for inx, (fish_obj, fish_points) in enumerate(zip(all_fish, points.tolist())):
+        chain_points = chain.get_chain_points(fish_obj)
+        for i in range(len(chain_points)):
+            chain_points[i].pos.set(*fish_points[i])
+
+        if joint_angles is not None:
+            for i, angle in enumerate(joint_angles[inx].tolist()[1:]):
+                chain_points[i + 1].joint_angle = angle
+
+
+def get_boid_state(all_boids):
+    pos = np.array([(i.pos.x, i.pos.y) for i in all_boids], dtype=float).reshape(-1, 2)
+    vel = np.array([(i.vel.x, i.vel.y) for i in all_boids], dtype=float).reshape(-1, 2)
+
+    return pos, vel
+
+
+def set_boid_state(all_boids, pos, vel):
+    for i, p, v in zip(all_boids, pos.tolist(), vel.tolist()):
+        i.pos.set(*p)
+        i.vel.set(*v)
+
+
+def get_school_arrays(sim):
+    if sim.school_chains is not None:
+        points = sim.school_chains.points.copy()
+        joint_angles = sim.school_chains.joint_angles.copy()
+    else:
+        points = get_fish_points(sim.non_player_fish)
+        joint_angles = get_fish_joint_angles(sim.non_player_fish)
+
+    if sim.school_flock is not None:
+        boid_pos = sim.school_flock.pos.copy()
+        boid_vel = sim.school_flock.vel.copy()
+    else:
+        boid_pos, boid_vel = get_boid_state([i.boid for i in sim.non_player_fish])
+
+    return points, joint_angles, boid_pos, boid_vel
+
+
+def set_school_arrays(sim, points, joint_angles, boid_pos, boid_vel):
+    #arrays are copied in place, so engines sharing them with worker processes see the restored state
+    set_fish_points(sim.non_player_fish, points, joint_angles)
+
+    if sim.school_chains is not None:
+        sim.school_chains.points[:] = points
+        sim.school_chains.joint_angles[:] = joint_angles
+
+    if sim.school_flock is not None:
+        school_flock = sim.school_flock
+        school_flock.pos[:] = boid_pos
+        school_flock.vel[:] = boid_vel
+        school_flock.rebuild_grid()
+    else:
+        boids = [i.boid for i in sim.non_player_fish]
+        set_boid_state(boids, boid_pos, boid_vel)
+
+        if len(boids) > 0:
+            boid.rebuild_grid(boids[0].grid, boids[0].grid_boids, boids[0].verlet)
+
+
+def get_rng_state(rng):
+    version, internal_state, gauss_next = rng.getstate()
+
+    return np.array([version] + list(internal_state), dtype=np.int64), np.array([np.nan if gauss_next is None else gauss_next])
+
+
+def set_rng_state(rng, state, gauss_next):
+    state = state.tolist()
+    gauss_next = None if np.isnan(gauss_next[0]) else float(gauss_next[0])
+
+    rng.setstate((state[0], tuple(state[1:]), gauss_next))
+
+
+def save_snapshot(sim, filename):
+    points, joint_angles, boid_pos, boid_vel = get_school_arrays(sim)
+    rng_state, rng_gauss_next = get_rng_state(sim.rng)
+
+    player = sim.player_fish
+
+    np.savez(
+        filename,
+        tick=np.array([sim.tick]),
+        points=points,
+        joint_angles=joint_angles,
+        boid_pos=boid_pos,
+        boid_vel=boid_vel,
+        player_points=get_fish_points([player]),
+        player_joint_angles=get_fish_joint_angles([player]),
+        agent_pos=sim.agents.pos,
+        agent_types=sim.agents.types,
+        agent_visible=sim.agents.visible,
+        rng_state=rng_state,
+        rng_gauss_next=rng_gauss_next,
+    )
+
+
+def load_snapshot(sim, filename):
+    #the simulation must have the same number of fish (or enough free slots) as the one that was saved, but can use different engines
+    with np.load(filename) as data:
+        snapshot = {key: data[key] for key in data.files}
+
+    #a pooled simulation grows or shrinks its school to match, if it has the slots
+    num_fish = len(snapshot["points"])
+    if num_fish != len(sim.non_player_fish) and num_fish <= len(sim.fish_pool.slots):
+        sim.set_num_fish(num_fish)
+
+    points, _, _, _ = get_school_arrays(sim)
+    if snapshot["points"].shape != points.shape:
+        raise ValueError(f"{filename} holds a school of shape {snapshot['points'].shape}, expected {points.shape}")
+
+    player = sim.player_fish
+    set_fish_points([player], snapshot["player_points"], snapshot["player_joint_angles"])
+
+    #the agents include the player fish, so this also moves it to where it was saved
+    sim.agents.pos = snapshot["agent_pos"]
+    sim.agents.types = snapshot["agent_types"]
+    sim.agents.visible = snapshot["agent_visible"]
+    sim.agents.rebuild()
+
+    set_school_arrays(sim, snapshot["points"], snapshot["joint_angles"], snapshot["boid_pos"], snapshot["boid_vel"])
+
+    #every chain is up to date again, so any sleeping fish are woken
+    if sim.lazy_chains is not None:
+        sim.lazy_chains.clear()
+        sim.awake_fish = None
+
+    set_rng_state(sim.rng, snapshot["rng_state"], snapshot["rng_gauss_next"])
+
+    sim.tick = int(snapshot["tick"][0])
@@ -0,0 +1,383 @@
+import math
+import numpy as np
+
+
+PAIR_CHUNK_SIZE = 2**20  #max number of candidate pairs generated at once
+
+SORT_KEY_BITS = 16  #bits of the cell ids sorted in each counting sort pass
+SORT_KEY_MASK = 2**SORT_KEY_BITS - 1
+
+#what happens to items that leave the world - None leaves them where they are, in the edge cells
+CLAMP = "clamp"
+WRAP = "wrap"
+REFLECT = "reflect"
+BOUNDS_POLICIES = [None, CLAMP, WRAP, REFLECT]
+
+
+def get_cell_offsets(num_cells, wrap):
+    #with fewer than 3 cells a wrapped 3 cell window would visit the same cell twice
+    if wrap and num_cells < 3:
+        return list(range(num_cells))
+    else:
+        return [-1, 0, 1]
+
+
+class SpatialHash:
+    #uniform grid rebuilt each tick with a counting sort, so moving between cells costs nothing extra
+
+    def __init__(self, world_width, world_height, cell_size, bounds_policy=None):
+        if bounds_policy not in BOUNDS_POLICIES:
+            raise ValueError(f"Unknown bounds policy {bounds_policy}, expected one of {BOUNDS_POLICIES}")
+
+        self.world_width = world_width
+        self.world_height = world_height
+        self.bounds_policy = bounds_policy
+        self.wrap = bounds_policy == WRAP
+
+        if self.wrap:
+            #cells must tile the world exactly (and be at least cell_size wide) for the wrapped window to work
+            self.num_cells_x = max(1, int(world_width // cell_size))
+            self.num_cells_y = max(1, int(world_height // cell_size))
+            self.cell_width = world_width / self.num_cells_x
+            self.cell_height = world_height / self.num_cells_y
+        else:
+            self.num_cells_x = int(world_width // cell_size) + 1
+            self.num_cells_y = int(world_height // cell_size) + 1
+            self.cell_width = cell_size
+            self.cell_height = cell_size
+
+        self.num_cells = self.num_cells_x * self.num_cells_y
+
+        offsets_x = get_cell_offsets(self.num_cells_x, self.wrap)
+        offsets_y = get_cell_offsets(self.num_cells_y, self.wrap)
+        self.neighbour_offsets = [(dx, dy) for dx in offsets_x for dy in offsets_y]
+
+        #numpy sorts 16 bit keys with a radix (counting) sort, so bigger cell ids are sorted 16 bits at a time
+        self.num_sort_passes = max(math.ceil(math.log2(max(self.num_cells, 2)) / SORT_KEY_BITS), 1)
+
+        self.positions = np.zeros((0, 2))
+        self.cell_ids = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)  #item indices sorted by cell
+        self.cell_starts = np.zeros(self.num_cells, dtype=np.int64)
+        self.cell_counts = np.zeros(self.num_cells, dtype=np.int64)
+
+        #plain list copies for per item queries from python code
+        self.order_list = []
+        self.cell_starts_list = []
+        self.cell_counts_list = []
+
+    def enforce_bounds(self, positions, velocities=None):
+        #applies the bounds policy in place and returns a mask of the items that were moved
+        x = positions[:, 0]
+        y = positions[:, 1]
+        outside = (x < 0) | (x > self.world_width) | (y < 0) | (y > self.world_height)
+
+        if self.bounds_policy is None or not np.any(outside):
+            return np.zeros(len(positions), dtype=bool)
+
+        if self.bounds_policy == CLAMP:
+            np.clip(x, 0, self.world_width, out=x)
+            np.clip(y, 0, self.world_height, out=y)
+        elif self.bounds_policy == WRAP:
+            np.mod(x, self.world_width, out=x)
+            np.mod(y, self.world_height, out=y)
+        elif self.bounds_policy == REFLECT:
+            for axis, size in enumerate([self.world_width, self.world_height]):
+                coords = positions[:, axis]
+                below = coords < 0
+                above = coords > size
+
+                coords[below] = -coords[below]
+                coords[above] = 2 * size - coords[above]
+
+                if velocities is not None:
+                    velocities[below | above, axis] *= -1
+
+        return outside
+
+    def wrap_offset(self, dx, dy):
+        #shortest offset between two points, taking the wrapped edges into account
+        if self.wrap:
+            dx -= self.world_width * round(dx / self.world_width)
+            dy -= self.world_height * round(dy / self.world_height)
+
+        return dx, dy
+
+    def wrap_offsets(self, offsets):
+        #array version of wrap_offset, done in place
+        if self.wrap:
+            offsets[:, 0] -= self.world_width * np.round(offsets[:, 0] / self.world_width)
+            offsets[:, 1] -= self.world_height * np.round(offsets[:, 1] / self.world_height)
+
+        return offsets
+
+    def fit_cells(self, cell_x, cell_y):
+        if self.wrap:
+            np.mod(cell_x, self.num_cells_x, out=cell_x)
+            np.mod(cell_y, self.num_cells_y, out=cell_y)
+        else:
+            #anything outside the world is kept in the edge cells
+            np.clip(cell_x, 0, self.num_cells_x - 1, out=cell_x)
+            np.clip(cell_y, 0, self.num_cells_y - 1, out=cell_y)
+
+    def get_cell_coords(self, positions):
+        cell_x = np.floor(positions[:, 0] / self.cell_width).astype(np.int64)
+        cell_y = np.floor(positions[:, 1] / self.cell_height).astype(np.int64)
+
+        self.fit_cells(cell_x, cell_y)
+
+        return cell_x, cell_y
+
+    def get_cell_coord(self, x, y):
+        cell_x = int(x // self.cell_width)
+        cell_y = int(y // self.cell_height)
+
+        if self.wrap:
+            return cell_x % self.num_cells_x, cell_y % self.num_cells_y
+        else:
+            return min(max(cell_x, 0), self.num_cells_x - 1), min(max(cell_y, 0), self.num_cells_y - 1)
+
+    def rebuild(self, positions):
+        self.positions = positions
+
+        cell_x, cell_y = self.get_cell_coords(positions)
+        self.cell_ids = cell_x * self.num_cells_y + cell_y
+
+        self.cell_counts = np.bincount(self.cell_ids, minlength=self.num_cells)
+        self.cell_starts = np.cumsum(self.cell_counts) - self.cell_counts
+        self.order = self.sort_by_cell(self.cell_ids)
+
+        self.order_list = self.order.tolist()
+        self.cell_starts_list = self.cell_starts.tolist()
+        self.cell_counts_list = self.cell_counts.tolist()
+
+    def sort_by_cell(self, cell_ids):
+        #item indices in order of cell id, keeping items in the same cell in order
+        #each pass is a stable counting sort on the next 16 bits, starting from the lowest (an LSD radix sort)
+        order = np.argsort((cell_ids & SORT_KEY_MASK).astype(np.uint16), kind="stable")
+
+        for k in range(1, self.num_sort_passes):
+            digits = ((cell_ids[order] >> (k * SORT_KEY_BITS)) & SORT_KEY_MASK).astype(np.uint16)
+            order = order[np.argsort(digits, kind="stable")]
+
+        return order
+
+    def get_nearby_items(self, x, y, nearby=None):
+        #indices of every item in the 3x3 block of cells around (x, y), optionally filling an existing list
+        cell_x, cell_y = self.get_cell_coord(x, y)
+
+        if nearby is None:
+            nearby = []
+        else:
+            nearby.clear()
+
+        for dx, dy in self.neighbour_offsets:
+            nx = cell_x + dx
+            ny = cell_y + dy
+
+            if self.wrap:
+                nx %= self.num_cells_x
+                ny %= self.num_cells_y
+            elif not (0 <= nx < self.num_cells_x and 0 <= ny < self.num_cells_y):
+                continue
+
+            cell = nx * self.num_cells_y + ny
+            start = self.cell_starts_list[cell]
+            nearby += self.order_list[start : start + self.cell_counts_list[cell]]
+
+        return nearby
+
+    def get_block_cells(self, cell_x, cell_y, dx, dy):
+        #returns the query indices with a valid cell at the given offset, and that cell's id
+        nx = cell_x + dx
+        ny = cell_y + dy
+
+        if self.wrap:
+            self.fit_cells(nx, ny)
+            src = np.arange(len(nx))
+        else:
+            valid = (nx >= 0) & (nx < self.num_cells_x) & (ny >= 0) & (ny < self.num_cells_y)
+            src = np.nonzero(valid)[0]
+
+        return src, nx[src] * self.num_cells_y + ny[src]
+
+    def get_chunks(self, cell_x, cell_y):
+        #split the queries so each chunk generates roughly PAIR_CHUNK_SIZE candidate pairs
+        num_candidates = np.zeros(len(cell_x), dtype=np.int64)
+        for dx, dy in self.neighbour_offsets:
+            src, cells = self.get_block_cells(cell_x, cell_y, dx, dy)
+            num_candidates[src] += self.cell_counts[cells]
+
+        chunk_ids = np.cumsum(num_candidates) // PAIR_CHUNK_SIZE
+        bounds = np.searchsorted(chunk_ids, np.arange(chunk_ids[-1] + 2)) if len(chunk_ids) > 0 else [0]
+
+        return [(bounds[k], bounds[k + 1]) for k in range(len(bounds) - 1) if bounds[k] < bounds[k + 1]]
+
+    def get_candidates(self, cell_x, cell_y):
+        all_i = []
+        all_j = []
+        for dx, dy in self.neighbour_offsets:
+            src, cells = self.get_block_cells(cell_x, cell_y, dx, dy)
+            counts = self.cell_counts[cells]
+            total = counts.sum()
+            if total == 0:
+                continue
+
+            #expand each query into one entry per item in the cell
+            run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+            within_cell = np.arange(total) - run_starts
+
+            all_i.append(np.repeat(src, counts))
+            all_j.append(self.order[np.repeat(self.cell_starts[cells], counts) + within_cell])
+
+        if len(all_i) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        return np.concatenate(all_i), np.concatenate(all_j)
+
+    def iter_pairs(self, query_positions, radius_sq, exclude_self=False):
+        #yields (i, j) chunks where indexed item j is within the radius of query i
+        cell_x, cell_y = self.get_cell_coords(query_positions)
+
+        for start, end in self.get_chunks(cell_x, cell_y):
+            i, j = self.get_candidates(cell_x[start:end], cell_y[start:end])
+            i += start
+
+            offsets = self.wrap_offsets(self.positions[j] - query_positions[i])
+            close = np.einsum("ij,ij->i", offsets, offsets) < radius_sq
+            if exclude_self:
+                close &= i != j
+
+            yield i[close], j[close]
+
+    def get_items_in_rect(self, min_x, min_y, max_x, max_y):
+        #indices of every item inside the rectangle, only looking in the cells it covers
+        #NOTE: the rectangle is not wrapped, so with the wrap policy only the part of it inside the world is found
+        cell_x0 = min(max(int(min_x // self.cell_width), 0), self.num_cells_x - 1)
+        cell_y0 = min(max(int(min_y // self.cell_height), 0), self.num_cells_y - 1)
+        cell_x1 = min(max(int(max_x // self.cell_width), 0), self.num_cells_x - 1)
+        cell_y1 = min(max(int(max_y // self.cell_height), 0), self.num_cells_y - 1)
+
+        #cell ids go down each column, so the items of a column of cells are next to each other in order
+        first = np.arange(cell_x0, cell_x1 + 1) * self.num_cells_y + cell_y0
+        last = first + cell_y1 - cell_y0
+        starts = self.cell_starts[first]
+        ends = self.cell_starts[last] + self.cell_counts[last]
+
+        candidates = np.concatenate([self.order[start:end] for start, end in zip(starts.tolist(), ends.tolist())])
+
+        pos = self.positions[candidates]
+        inside = (pos[:, 0] >= min_x) & (pos[:, 0] <= max_x) & (pos[:, 1] >= min_y) & (pos[:, 1] <= max_y)
+
+        return np.sort(candidates[inside])
+
+
+class VerletList:
+    #candidate pairs within radius + skin, reused until some item has moved more than skin / 2 since they were found
+    #any pair that is within radius now must then have been within radius + skin at the last rebuild
+
+    def __init__(self, world_width, world_height, radius, skin, bounds_policy=None):
+        self.radius = radius
+        self.skin = skin
+        self.max_move_sq = (skin / 2) ** 2
+
+        self.grid = SpatialHash(world_width, world_height, radius + skin, bounds_policy)
+
+        self.rebuild_positions = None  #positions at the last rebuild
+
+        #candidate j of item i, sorted by i
+        self.pair_i = np.zeros(0, dtype=np.int64)
+        self.pair_j = np.zeros(0, dtype=np.int64)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+        self.candidate_lists = None  #per item lists for python code, made when first asked for after a rebuild
+
+        #how often the lists are rebuilt, for tuning the skin
+        self.num_updates = 0
+        self.num_rebuilds = 0
+        self.total_candidates = 0  #summed over rebuilds
+
+    def needs_rebuild(self, positions):
+        if self.rebuild_positions is None or len(positions) != len(self.rebuild_positions):
+            return True
+
+        moved = self.grid.wrap_offsets(positions - self.rebuild_positions)
+
+        return len(moved) > 0 and np.einsum("ij,ij->i", moved, moved).max() > self.max_move_sq
+
+    def update(self, positions):
+        #to be called whenever the items have moved, returns whether the lists were rebuilt
+        self.num_updates += 1
+
+        if not self.needs_rebuild(positions):
+            return False
+
+        self.rebuild(positions)
+
+        return True
+
+    def rebuild(self, positions):
+        self.rebuild_positions = positions.copy()
+        self.grid.rebuild(self.rebuild_positions)
+
+        all_i = [np.zeros(0, dtype=np.int64)]
+        all_j = [np.zeros(0, dtype=np.int64)]
+        for i, j in self.grid.iter_pairs(self.rebuild_positions, (self.radius + self.skin) ** 2, True):
+            all_i.append(i)
+            all_j.append(j)
+
+        pair_i = np.concatenate(all_i)
+        order = np.argsort(pair_i, kind="stable")
+
+        self.pair_i = pair_i[order]
+        self.pair_j = np.concatenate(all_j)[order]
+        self.counts = np.bincount(self.pair_i, minlength=len(positions))
+        self.starts = np.cumsum(self.counts) - self.counts
+
+        self.candidate_lists = None
+
+        self.num_rebuilds += 1
+        self.total_candidates += len(self.pair_i)
+
+    def get_candidates(self, inx):
+        #indices of every item that could be within radius of item inx
+        if self.candidate_lists is None:
+            pair_j = self.pair_j.tolist()
+            self.candidate_lists = [pair_j[start : start + count] for start, count in zip(self.starts.tolist(), self.counts.tolist())]
+
+        return self.candidate_lists[inx]
+
+    def iter_candidates(self, query):
+        #yields (q, j) chunks where item j could be within radius of item query[q]
+        counts = self.counts[query]
+
+        chunk_ids = np.cumsum(counts) // PAIR_CHUNK_SIZE
+        bounds = np.searchsorted(chunk_ids, np.arange(chunk_ids[-1] + 2)) if len(chunk_ids) > 0 else [0]
+
+        for k in range(len(bounds) - 1):
+            start, end = bounds[k], bounds[k + 1]
+            if start == end:
+                continue
+
+            chunk_counts = counts[start:end]
+            total = chunk_counts.sum()
+
+            run_starts = np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            within_item = np.arange(total) - run_starts
+
+            q = np.repeat(np.arange(start, end), chunk_counts)
+            j = self.pair_j[np.repeat(self.starts[query[start:end]], chunk_counts) + within_item]
+
+            yield q, j
+
+    def get_stats(self):
+        mean_candidates = self.total_candidates / max(self.num_rebuilds, 1) / max(len(self.counts), 1)
+
+        return {
+            "skin": self.skin,
+            "updates": self.num_updates,
+            "rebuilds": self.num_rebuilds,
+            "rebuild_fraction": self.num_rebuilds / max(self.num_updates, 1),
+            "mean_candidates_per_item": mean_candidates,
+        }
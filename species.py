@@ -0,0 +1,70 @@
+import os
+from json import loads
+
+
+COLOUR_NAMES = ["body", "tail_fin", "body_fin", "dorsal_fin", "eyes"]
+
+loaded_species = {}  #config filename -> Species, so each file is only read and parsed once
+
+
+def read_file(filename):
+    with open(filename, "r") as file:
+        data = file.read()
+
+    return data
+
+
+def validate_colour(filename, name, colour):
+    if not isinstance(colour, list) or len(colour) != 3 or not all(isinstance(i, int) and 0 <= i <= 255 for i in colour):
+        raise ValueError(f"{filename}: colour {name} should be a list of 3 ints from 0 to 255, got {colour}")
+
+
+def validate_config(filename, config):
+    colours = config.get("colours") if isinstance(config, dict) else None
+    if not isinstance(colours, dict):
+        raise ValueError(f"{filename}: expected a \"colours\" object")
+
+    for name in COLOUR_NAMES:
+        if name not in colours:
+            raise ValueError(f"{filename}: missing colour {name}")
+
+        validate_colour(filename, name, colours[name])
+
+
+class Species:
+    #parsed config shared by every fish of the species - it is never changed, a reload makes a new Species
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.mtime = os.path.getmtime(filename)
+
+        self.config = loads(read_file(filename))
+        validate_config(filename, self.config)
+
+        self.colours = {name: tuple(self.config["colours"][name]) for name in COLOUR_NAMES}
+
+
+def get_species(filename):
+    if filename not in loaded_species:
+        loaded_species[filename] = Species(filename)
+
+    return loaded_species[filename]
+
+
+def invalidate(filename=None):
+    #forget a cached config (or all of them), so the next get_species reads the file again
+    if filename is None:
+        loaded_species.clear()
+    else:
+        loaded_species.pop(filename, None)
+
+
+def reload_changed():
+    #reloads every cached config whose file has changed, and returns their filenames
+    changed = [name for name, i in loaded_species.items() if os.path.getmtime(name) != i.mtime]
+
+    for name in changed:
+        #a file that fails to load or validate raises before its old config is replaced
+        loaded_species[name] = Species(name)
+
+    return changed
@@ -0,0 +1,123 @@
+import fish
+
+import math
+import numpy as np
+import pygame
+from collections import OrderedDict
+
+
+ANGLE_STEPS = 64  #orientations each rotated part is drawn at, more is closer to drawing it exactly but takes more memory
+MEMORY_BUDGET = 4 * 2**20  #bytes of sprites kept, the least recently used are dropped past this
+
+BYTES_PER_PIXEL = 4
+
+
+class SpriteCache:
+    #the rigid parts of a fish (body fins, head and eyes) drawn once per colour and orientation onto small surfaces
+    #so drawing one is a single blit instead of rasterising the same shape again every frame
+
+    def __init__(self, angle_steps=ANGLE_STEPS, memory_budget=MEMORY_BUDGET):
+        self.angle_steps = angle_steps
+        self.memory_budget = memory_budget
+
+        self.sprites = OrderedDict()  #key -> (surface, x offset, y offset), least recently used first
+        self.memory_used = 0
+
+        #counters for tuning the budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_angle_step(self, angle):
+        return round(angle * self.angle_steps / (2 * math.pi)) % self.angle_steps
+
+    def get_angle_steps(self, angles):
+        #array version of get_angle_step
+        return np.round(angles * (self.angle_steps / (2 * math.pi))).astype(np.int64) % self.angle_steps
+
+    def add(self, key, sprite):
+        surface = sprite[0]
+        self.sprites[key] = sprite
+        self.memory_used += surface.get_width() * surface.get_height() * BYTES_PER_PIXEL
+
+        #the sprite just added is never dropped, however small the budget
+        while self.memory_used > self.memory_budget and len(self.sprites) > 1:
+            _, (old_surface, _, _) = self.sprites.popitem(last=False)
+            self.memory_used -= old_surface.get_width() * old_surface.get_height() * BYTES_PER_PIXEL
+            self.evictions += 1
+
+    def get(self, key, make_sprite):
+        #make_sprite() makes the (surface, x offset, y offset) for the key when it is not cached
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+
+            sprite = make_sprite()
+            self.add(key, sprite)
+        else:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+
+        return sprite
+
+    def make_polygon_sprite(self, colour, points):
+        #points are relative to the position the sprite is blitted at
+        #drawing truncates each point to a whole pixel, which for a position half way across a pixel is the same as rounding
+        points = [(round(x), round(y)) for x, y in points]
+
+        min_x = min(x for x, _ in points)
+        min_y = min(y for _, y in points)
+        max_x = max(x for x, _ in points)
+        max_y = max(y for _, y in points)
+
+        surface = pygame.Surface((max_x - min_x + 1, max_y - min_y + 1), pygame.SRCALPHA)
+        pygame.draw.polygon(surface, colour, [(x - min_x, y - min_y) for x, y in points])
+
+        return surface, min_x, min_y
+
+    def make_circle_sprite(self, colour, radius):
+        size = 2 * radius + 1
+
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(surface, colour, (radius, radius), radius)
+
+        return surface, -radius, -radius
+
+    def make_fin_sprite(self, colour, angle_step):
+        #same polygon as BodyFin.draw, around an anchor at (0, 0)
+        angle = 2 * math.pi * angle_step / self.angle_steps
+        points = [i.rot(angle) for i in fish.BodyFin.ELLIPSE_POINTS]
+
+        return self.make_polygon_sprite(colour, [(i.x, i.y) for i in points])
+
+    def get_fin(self, colour, angle_step):
+        colour = tuple(colour)
+
+        return self.get(("fin", colour, angle_step), lambda: self.make_fin_sprite(colour, angle_step))
+
+    def get_circle(self, colour, radius):
+        colour = tuple(colour)
+        radius = int(radius)
+
+        return self.get(("circle", colour, radius), lambda: self.make_circle_sprite(colour, radius))
+
+    def blit(self, window, sprite, x, y):
+        #x and y are truncated to whole pixels, the same as Vec2.get_int_pos
+        surface, offset_x, offset_y = sprite
+        window.blit(surface, (int(x) + offset_x, int(y) + offset_y))
+
+    def draw_fin(self, window, colour, anchor_x, anchor_y, angle):
+        self.blit(window, self.get_fin(colour, self.get_angle_step(angle)), anchor_x, anchor_y)
+
+    def draw_circle(self, window, colour, x, y, radius):
+        self.blit(window, self.get_circle(colour, radius), x, y)
+
+    def get_stats(self):
+        return {
+            "angle_steps": self.angle_steps,
+            "sprites": len(self.sprites),
+            "memory_used": self.memory_used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,130 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import simulation
+import snapshot
+
+import pytest
+import pygame
+import numpy as np
+
+
+WORLD_WIDTH = 1000
+WORLD_HEIGHT = 800
+
+NUM_FISH = 60
+NUM_TICKS = 100
+
+#the engines add their forces up in different orders, so only agree to within rounding
+TOLERANCE = 1e-6
+
+#object boids and chains, then each batched engine on its own, then all of the school in worker processes
+ENGINES = {
+    "objects": {},
+    "flock": {"use_flock_engine": True},
+    "chain": {"use_chain_solver": True},
+    "flock_and_chain": {"use_flock_engine": True, "use_chain_solver": True},
+    "workers": {"num_workers": 2},
+}
+
+
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    #the fish configs are loaded relative to the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_sim(num_fish, window=None, **kwargs):
+    return simulation.Simulation(WORLD_WIDTH, WORLD_HEIGHT, num_fish, window, follow_mouse=False, seed=1, **kwargs)
+
+
+def run(num_ticks, **kwargs):
+    #the chain points, joint angles, boid positions and boid velocities of the school after num_ticks ticks
+    sim = make_sim(NUM_FISH, **kwargs)
+
+    try:
+        for _ in range(num_ticks):
+            sim.update()
+
+        return snapshot.get_school_arrays(sim)
+    finally:
+        sim.close()
+
+
+def assert_same_school(arrays, other_arrays):
+    for i, j in zip(arrays, other_arrays):
+        np.testing.assert_allclose(i, j, rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("bounds_policy", [None, "clamp", "wrap", "reflect"])
+def test_engines_agree(bounds_policy):
+    expected = run(NUM_TICKS, bounds_policy=bounds_policy)
+
+    for name, engines in ENGINES.items():
+        if name != "objects":
+            assert_same_school(run(NUM_TICKS, bounds_policy=bounds_policy, **engines), expected)
+
+
+def test_engines_agree_with_obstacles():
+    expected = run(NUM_TICKS, obstacles_filename="reef.json")
+
+    for engines in [ENGINES["flock_and_chain"], ENGINES["workers"]]:
+        assert_same_school(run(NUM_TICKS, obstacles_filename="reef.json", **engines), expected)
+
+
+@pytest.mark.parametrize("engines", [ENGINES["objects"], ENGINES["flock_and_chain"]])
+def test_snapshot_round_trip(engines, tmp_path):
+    filename = str(tmp_path / "school.npz")
+
+    sim = make_sim(NUM_FISH, **engines)
+    for _ in range(NUM_TICKS // 2):
+        sim.update()
+
+    snapshot.save_snapshot(sim, filename)
+    saved = snapshot.get_school_arrays(sim)
+
+    for _ in range(NUM_TICKS // 2):
+        sim.update()
+
+    #a snapshot can be loaded into a simulation using the other engines
+    other_engines = ENGINES["flock_and_chain"] if engines == ENGINES["objects"] else ENGINES["objects"]
+    loaded = make_sim(NUM_FISH, **other_engines)
+    snapshot.load_snapshot(loaded, filename)
+    assert loaded.tick == NUM_TICKS // 2
+
+    for i, j in zip(snapshot.get_school_arrays(loaded), saved):
+        np.testing.assert_array_equal(i, j)
+
+    for _ in range(NUM_TICKS // 2):
+        loaded.update()
+
+    assert_same_school(snapshot.get_school_arrays(loaded), snapshot.get_school_arrays(sim))
+
+
+@pytest.mark.parametrize("engines", [{}, {"use_flock_engine": True, "use_chain_solver": True}])
+def test_empty_school_tick(engines):
+    window = pygame.Surface((WORLD_WIDTH, WORLD_HEIGHT))
+    sim = make_sim(0, window, interpolate=True, use_batch_render=True, **engines)
+
+    for _ in range(3):
+        sim.update()
+        sim.draw(0.5)
+
+    player_points, school_points = sim.get_points()
+    assert school_points.shape == (0, player_points.shape[1], 2)
+
+
+def test_despawn_to_empty(tmp_path):
+    sim = make_sim(10, interpolate=True, max_fish=20)
+    sim.update()
+
+    sim.set_num_fish(0)
+    sim.update()
+
+    filename = str(tmp_path / "empty.npz")
+    snapshot.save_snapshot(sim, filename)
+    snapshot.load_snapshot(sim, filename)
+
+    sim.set_num_fish(5)
+    sim.update()
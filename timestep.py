@@ -0,0 +1,29 @@
+class FixedTimestep:
+    #decides how many fixed length simulation ticks to run for each drawn frame, so the simulation does not depend on the frame rate
+
+    def __init__(self, tick_rate, max_catch_up_ticks, time_scale=1):
+        self.tick_time = 1 / tick_rate
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.time_scale = time_scale  #simulated seconds per real second
+
+        self.accumulator = 0  #simulated time not yet ticked
+        self.dropped_time = 0  #simulated time skipped because the simulation could not keep up
+
+    def advance(self, frame_seconds):
+        #returns the number of ticks to run for a frame that took frame_seconds
+        self.accumulator += frame_seconds * self.time_scale
+
+        num_ticks = min(int(self.accumulator // self.tick_time), self.max_catch_up_ticks)
+        self.accumulator -= num_ticks * self.tick_time
+
+        if self.accumulator >= self.tick_time:
+            #too far behind - drop the backlog instead of falling further behind every frame
+            backlog = self.accumulator - self.accumulator % self.tick_time
+            self.dropped_time += backlog
+            self.accumulator -= backlog
+
+        return num_ticks
+
+    def get_alpha(self):
+        #how far between the last two ticks the current frame is, from 0 to 1
+        return min(self.accumulator / self.tick_time, 1)
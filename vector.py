@@ -1,11 +1,13 @@
 import math
-from random import uniform
+import random
 
 
 EPSILON = 0.001
 
 
 class Vec2:
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -13,6 +15,9 @@ class Vec2:
     def __repr__(self):
         return f"<{self.x}, {self.y}>"
 
+    def copy(self):
+        return Vec2(self.x, self.y)
+
     def __add__(self, other_vec):
         return Vec2(self.x + other_vec.x, self.y + other_vec.y)
     
@@ -30,6 +35,16 @@ class Vec2:
     
     def dot(self, other_vec):
         return self.x * other_vec.x + self.y * other_vec.y
+
+    def normalized_dot(self, other_vec):
+        #cos of the angle between the vectors
+        return self.dot(other_vec) / (self.mag() * other_vec.mag())
+
+    def dist_sq_to(self, other_vec):
+        dx = other_vec.x - self.x
+        dy = other_vec.y - self.y
+
+        return dx * dx + dy * dy
     
     def get_int_pos(self):
         return (int(self.x), int(self.y))
@@ -56,7 +71,7 @@ class Vec2:
         return math.atan2(self.y, self.x)
     
     def get_angle_to(self, other_vec):
-        cos_angle = self.dot(other_vec) / (self.mag() * other_vec.mag())
+        cos_angle = self.normalized_dot(other_vec)
 
         #floating point imprecision can lead to cos being outside the correct range
         cos_angle = max(-1, cos_angle)
@@ -67,9 +82,9 @@ class Vec2:
     def get_signed_angle_to(self, other_vec):
         #anticlockwise is positive and clockwise is negative
         abs_angle = self.get_angle_to(other_vec)
-        perp_vec = self.rot90(False)
+        perp_dot = self.y * other_vec.x - self.x * other_vec.y  #same as self.rot90(False).dot(other_vec)
 
-        if perp_vec.dot(other_vec) > 0:
+        if perp_dot > 0:
             mult = 1
         else:
             mult = -1
@@ -95,10 +110,71 @@ class Vec2:
         new_y = self.x * s + self.y * c
 
         return Vec2(new_x, new_y)
+
+    #the methods below change the vector in place and return it, so they can be chained without allocating
+
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+
+        return self
+
+    def set_vec(self, other_vec):
+        self.x = other_vec.x
+        self.y = other_vec.y
+
+        return self
+
+    def iadd(self, other_vec):
+        self.x += other_vec.x
+        self.y += other_vec.y
+
+        return self
+
+    def isub(self, other_vec):
+        self.x -= other_vec.x
+        self.y -= other_vec.y
+
+        return self
+
+    def iscale(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+
+        return self
+
+    def idiv(self, scalar):
+        self.x /= scalar
+        self.y /= scalar
+
+        return self
+
+    def set_mag_inplace(self, desired_mag):
+        return self.iscale(desired_mag / self.mag())
+
+    def limit_mag_inplace(self, limit):
+        if self.mag() > limit:
+            self.set_mag_inplace(limit)
+
+        return self
+
+    def rotate_inplace(self, angle):
+        c = math.cos(angle)
+        s = math.sin(angle)
+
+        x = self.x
+        self.x = x * c - self.y * s
+        self.y = x * s + self.y * c
+
+        return self
     
 
-def rand_vec(min, max):
-    x = uniform(min, max)
-    y = uniform(min, max)
+def rand_vec(min, max, rng=None):
+    #rng is a random.Random to draw from, the global one is used when not given
+    if rng is None:
+        rng = random
+
+    x = rng.uniform(min, max)
+    y = rng.uniform(min, max)
 
     return Vec2(x, y)
\ No newline at end of file